@@ -9,9 +9,13 @@ API文档: https://api.aa1.cn/doc/json.html
 import requests
 import json
 import os
+import uuid
 from typing import Optional, Dict, Any
 import logging
-from myAPI import count_files_in_directory, get_image_format_from_url, download_and_set_wallpaper
+from myAPI import count_files_in_directory, fetch_image, clear_image, set_wallpaper
+from resilience import resilient_get
+from wallpaper_store import get_store
+from catalog import get_catalog
 
 # 配置日志
 try:
@@ -44,7 +48,7 @@ class AnimeWallpaperAPI:
         """
         try:
             logger.info("正在获取随机动漫壁纸...")
-            response = requests.get(self.base_url, timeout=10)
+            response = resilient_get(self.base_url, timeout=10)
             response.raise_for_status()
             
             # 解析JSON响应
@@ -90,17 +94,22 @@ class AnimeWallpaperAPI:
                 logger.error("未获取到图片链接")
                 return False
             
-            # 生成保存路径
             if save_path is None:
-                img_num = count_files_in_directory('images')
-                img_format = get_image_format_from_url(image_url)
-                save_path = f"images/anime_wallpaper_{img_num + 1}.{img_format}"
-            
-            # 确保images目录存在
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            
-            # 下载并设置壁纸
-            success = download_and_set_wallpaper(image_url, save_path)
+                # 未指定路径时存入壁纸库，重复的图片不会再保存一份；
+                # 临时文件名每次不同，预取与手动下载同时进行时不会互相覆盖
+                temp_path = fetch_image(image_url, f"images/temp_anime_download_{uuid.uuid4().hex}", timeout=30)
+                try:
+                    save_path = get_store().add_processed(
+                        temp_path, "anime_wallpaper", clear_image, "clear_image",
+                        metadata={"source_api": "anime", "url": image_url}).path
+                finally:
+                    os.remove(temp_path)
+            else:
+                # 单次请求下载图片（扩展名根据实际内容确定），再清晰化处理
+                save_path = fetch_image(image_url, save_path, timeout=30)
+                clear_image(save_path)
+                get_catalog().add(save_path, source_api="anime", url=image_url)
+            success = set_wallpaper(save_path)
             
             if success:
                 logger.info(f"动漫壁纸已保存到: {save_path}")
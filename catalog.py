@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体目录 - 用SQLite(WAL)记录所有已保存的图片和视频
+计数、列表和编号分配都是索引查询，不再每次遍历目录；
+reconcile 用一次 os.scandir 将目录与文件系统重新同步
+
+文件名分配使用数据库中的持久计数器（BEGIN IMMEDIATE 跨进程互斥），
+并以 O_EXCL 创建占位文件预留路径，多个标签页/进程同时保存也不会互相覆盖
+"""
+
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("catalog")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("catalog")
+    logger.propagate = False
+
+
+DATA_DIR = Path(__file__).parent / "data"
+CATALOG_FILE = DATA_DIR / "catalog.db"
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm')
+
+# 形如 anime_wallpaper_12.jpg 的文件名，拆出前缀和编号
+_NUMBERED_NAME = re.compile(r"^(.+)_(\d+)\.[^.]+$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    prefix TEXT,
+    number INTEGER,
+    source_api TEXT,
+    category TEXT,
+    width INTEGER,
+    height INTEGER,
+    size INTEGER,
+    sha256 TEXT,
+    url TEXT,
+    created_at REAL,
+    last_set_at REAL,
+    UNIQUE (directory, name)
+);
+CREATE INDEX IF NOT EXISTS idx_media_kind ON media (directory, kind);
+CREATE INDEX IF NOT EXISTS idx_media_number ON media (directory, prefix, number);
+CREATE INDEX IF NOT EXISTS idx_media_sha256 ON media (sha256);
+CREATE TABLE IF NOT EXISTS name_counters (
+    directory TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    next_number INTEGER NOT NULL,
+    PRIMARY KEY (directory, prefix)
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    directory TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at REAL,
+    PRIMARY KEY (directory, key)
+);
+"""
+
+
+def media_kind(name: str) -> Optional[str]:
+    """根据扩展名判断媒体类型，不是图片或视频时返回None"""
+    lower = name.lower()
+    if lower.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    if lower.endswith(VIDEO_EXTENSIONS):
+        return "video"
+    return None
+
+
+def _is_tracked_name(name: str) -> bool:
+    """临时文件、隐藏文件不计入目录"""
+    return not name.startswith(("temp_", ".")) and media_kind(name) is not None
+
+
+def _split_name(name: str):
+    match = _NUMBERED_NAME.match(name)
+    if not match:
+        return None, None
+    return match.group(1), int(match.group(2))
+
+
+def _image_size(path: str):
+    try:
+        from PIL import Image
+        with Image.open(path) as img:  # 只读取文件头
+            return img.size
+    except Exception:
+        return None, None
+
+
+class Catalog:
+    """媒体目录"""
+
+    def __init__(self, path: Path = CATALOG_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._reconciled = set()
+
+    @staticmethod
+    def _key(path: str):
+        directory, name = os.path.split(os.path.abspath(path))
+        return os.path.normcase(directory), name
+
+    @staticmethod
+    def _dir_key(directory: str) -> str:
+        return os.path.normcase(os.path.abspath(directory))
+
+    def _ensure_reconciled(self, directory: str):
+        """每个目录在本进程内首次查询前同步一次，之后只走索引"""
+        key = self._dir_key(directory)
+        if key not in self._reconciled:
+            self.reconcile(directory)
+
+    def add(self, path: str, kind: Optional[str] = None, source_api: Optional[str] = None,
+            category: Optional[str] = None, url: Optional[str] = None, sha256: Optional[str] = None,
+            width: Optional[int] = None, height: Optional[int] = None):
+        """
+        记录一个已保存的文件，已存在时更新其元数据
+
+        Args:
+            path: 文件路径
+            kind: image / video，None时按扩展名判断
+            source_api: 来源API
+            category: 分类
+            url: 原始地址
+            sha256: 内容哈希
+            width, height: 图片尺寸，None时读取图片文件头
+        """
+        directory, name = self._key(path)
+        kind = kind or media_kind(name) or "image"
+        prefix, number = _split_name(name)
+        size = os.path.getsize(path)
+        if kind == "image" and (width is None or height is None):
+            width, height = _image_size(path)
+
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO media (kind, directory, name, prefix, number, source_api, category,
+                                      width, height, size, sha256, url, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (directory, name) DO UPDATE SET
+                       kind = excluded.kind, size = excluded.size,
+                       source_api = COALESCE(excluded.source_api, source_api),
+                       category = COALESCE(excluded.category, category),
+                       width = COALESCE(excluded.width, width),
+                       height = COALESCE(excluded.height, height),
+                       sha256 = COALESCE(excluded.sha256, sha256),
+                       url = COALESCE(excluded.url, url)""",
+                (kind, directory, name, prefix, number, source_api, category,
+                 width, height, size, sha256, url, time.time()))
+            # 文件已保存完成，释放对应的预留
+            self._conn.execute("DELETE FROM reservations WHERE directory = ? AND name = ?", (directory, name))
+
+    def remove(self, path: str):
+        directory, name = self._key(path)
+        with self._lock:
+            self._conn.execute("DELETE FROM media WHERE directory = ? AND name = ?", (directory, name))
+
+    def mark_set(self, path: str):
+        """记录文件被设置为壁纸的时间"""
+        directory, name = self._key(path)
+        with self._lock:
+            self._conn.execute("UPDATE media SET last_set_at = ? WHERE directory = ? AND name = ?",
+                               (time.time(), directory, name))
+
+    def count(self, directory: str, kind: str = "image") -> int:
+        """统计目录中的图片/视频数量"""
+        self._ensure_reconciled(directory)
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM media WHERE directory = ? AND kind = ?",
+                                     (self._dir_key(directory), kind)).fetchone()
+        return row[0]
+
+    def list(self, directory: str, kind: Optional[str] = None, limit: int = 100,
+             order_by: str = "created_at") -> List[Dict[str, Any]]:
+        """列出目录中的文件，按 created_at / last_set_at / size 倒序"""
+        if order_by not in ("created_at", "last_set_at", "size"):
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        self._ensure_reconciled(directory)
+        sql = "SELECT * FROM media WHERE directory = ?"
+        params: List[Any] = [self._dir_key(directory)]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += f" ORDER BY {order_by} DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def find_by_sha256(self, sha256: str) -> List[str]:
+        """按内容哈希查找文件路径"""
+        with self._lock:
+            rows = self._conn.execute("SELECT directory, name FROM media WHERE sha256 = ?", (sha256,))
+            return [os.path.join(row["directory"], row["name"]) for row in rows]
+
+    def next_number(self, directory: str, prefix: str) -> int:
+        """下一个可用编号（该前缀已用的最大编号 + 1）"""
+        self._ensure_reconciled(directory)
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(number) FROM media WHERE directory = ? AND prefix = ?",
+                                     (self._dir_key(directory), prefix)).fetchone()
+        return (row[0] or 0) + 1
+
+    def allocate_path(self, directory: str, prefix: str, extension: str,
+                      key: Optional[str] = None) -> str:
+        """
+        分配一个不会与其他保存冲突的文件路径，如 images/wallpaper_12.jpg
+
+        计数器在 BEGIN IMMEDIATE 事务中递增，跨线程、跨进程都是原子的；
+        路径本身再用 O_EXCL 创建一个空的占位文件，保证即使有绕过计数器的写入也不会覆盖。
+        调用方应以原子替换(os.replace)的方式把内容写到该路径，失败时调用 release_path。
+
+        Args:
+            directory: 目录
+            prefix: 文件名前缀
+            extension: 扩展名（不含点），如 jpg
+            key: 预留键（如视频URL），同一个键在保存完成前重复分配会得到同一路径，
+                 用于中断后续传
+
+        Returns:
+            文件路径
+        """
+        self._ensure_reconciled(directory)
+        dir_key = self._dir_key(directory)
+        os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if key is not None:
+                    row = self._conn.execute("SELECT name FROM reservations WHERE directory = ? AND key = ?",
+                                             (dir_key, key)).fetchone()
+                    if row is not None:
+                        self._conn.execute("COMMIT")
+                        return os.path.join(directory, row["name"])
+
+                row = self._conn.execute("SELECT next_number FROM name_counters WHERE directory = ? AND prefix = ?",
+                                         (dir_key, prefix)).fetchone()
+                used = self._conn.execute("SELECT MAX(number) FROM media WHERE directory = ? AND prefix = ?",
+                                          (dir_key, prefix)).fetchone()[0] or 0
+                number = max(row["next_number"] if row else 1, used + 1)
+
+                while True:
+                    name = f"{prefix}_{number}.{extension}"
+                    path = os.path.join(directory, name)
+                    if self._reserve(path):
+                        break
+                    number += 1
+
+                self._conn.execute(
+                    """INSERT INTO name_counters (directory, prefix, next_number) VALUES (?, ?, ?)
+                       ON CONFLICT (directory, prefix) DO UPDATE SET next_number = excluded.next_number""",
+                    (dir_key, prefix, number + 1))
+                if key is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO reservations (directory, key, name, created_at) VALUES (?, ?, ?, ?)",
+                        (dir_key, key, name, time.time()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return path
+
+    @staticmethod
+    def _reserve(path: str) -> bool:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def release_path(self, path: str):
+        """保存失败时删除占位文件并释放预留"""
+        directory, name = self._key(path)
+        try:
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._conn.execute("DELETE FROM reservations WHERE directory = ? AND name = ?", (directory, name))
+
+    def reconcile(self, directory: str) -> Dict[str, int]:
+        """
+        用一次 os.scandir 将目录中的记录与文件系统同步
+
+        Returns:
+            {"added": 新增记录数, "removed": 删除记录数, "updated": 大小变化的记录数}
+        """
+        key = self._dir_key(directory)
+        on_disk = {}
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if _is_tracked_name(entry.name) and entry.is_file():
+                        size = entry.stat().st_size
+                        if size > 0:  # 空文件是尚未写入的占位文件
+                            on_disk[entry.name] = size
+
+        stats = {"added": 0, "removed": 0, "updated": 0}
+        with self._lock:
+            known = {row["name"]: row["size"] for row in
+                     self._conn.execute("SELECT name, size FROM media WHERE directory = ?", (key,))}
+            self._conn.execute("BEGIN")
+            try:
+                for name in known.keys() - on_disk.keys():
+                    self._conn.execute("DELETE FROM media WHERE directory = ? AND name = ?", (key, name))
+                    stats["removed"] += 1
+                for name, size in on_disk.items():
+                    if name not in known:
+                        prefix, number = _split_name(name)
+                        self._conn.execute(
+                            """INSERT INTO media (kind, directory, name, prefix, number, size, created_at)
+                               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                            (media_kind(name), key, name, prefix, number, size,
+                             os.path.getmtime(os.path.join(directory, name))))
+                        stats["added"] += 1
+                    elif known[name] != size:
+                        self._conn.execute("UPDATE media SET size = ? WHERE directory = ? AND name = ?",
+                                           (size, key, name))
+                        stats["updated"] += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._reconciled.add(key)
+
+        if any(stats.values()):
+            logger.info(f"目录已同步: {directory} {stats}")
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 全局共享目录
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """获取全局媒体目录（首次调用时打开数据库）"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog()
+        return _catalog
+
+
+def _stress_worker(db_path: str, directory: str, saves: int, threads: int, tag: str):
+    """压力测试：多个线程同时分配路径并写入带唯一标记的内容"""
+    catalog = Catalog(db_path)
+
+    def save(index: int):
+        path = catalog.allocate_path(directory, "wallpaper", "jpg")
+        tmp_path = f"{path}.{tag}-{index}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"{tag}-{index}")
+        os.replace(tmp_path, path)
+        catalog.add(path, kind="image", width=0, height=0)
+
+    workers = [threading.Thread(target=lambda t=t: [save(t * saves + i) for i in range(saves)])
+               for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    catalog.close()
+
+
+def stress_test(processes: int = 4, threads: int = 8, saves: int = 10):
+    """多进程 x 多线程同时保存，检查没有任何文件被覆盖"""
+    import tempfile
+    with tempfile.TemporaryDirectory() as root:
+        db_path = os.path.join(root, "catalog.db")
+        directory = os.path.join(root, "images")
+        Catalog(db_path).close()
+
+        start = time.perf_counter()
+        jobs = [multiprocessing.Process(target=_stress_worker,
+                                        args=(db_path, directory, saves, threads, f"p{p}"))
+                for p in range(processes)]
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join()
+        elapsed = time.perf_counter() - start
+
+        expected = processes * threads * saves
+        contents = set()
+        for entry in os.scandir(directory):
+            with open(entry.path, encoding="utf-8") as f:
+                contents.add(f.read())
+        catalog = Catalog(db_path)
+        counted = catalog.count(directory, "image")
+        catalog.close()
+
+        print(f"{processes} 个进程 x {threads} 个线程，共 {expected} 次保存，耗时 {elapsed:.2f}s")
+        print(f"磁盘上不同内容的文件: {len(contents)}，目录记录: {counted}")
+        ok = len(contents) == expected == counted
+        print("结果: " + ("没有文件被覆盖" if ok else "存在覆盖或丢失！"))
+        return ok
+
+
+def main():
+    """命令行: python catalog.py reconcile [目录...] | stats [目录...] | stress [进程数] [线程数] [每线程保存次数]"""
+    args = sys.argv[1:]
+    command = args[0] if args else "stats"
+    directories = args[1:] or ["images", "videos"]
+    catalog = get_catalog() if command != "stress" else None
+
+    if command == "reconcile":
+        for directory in directories:
+            start = time.perf_counter()
+            stats = catalog.reconcile(directory)
+            print(f"{directory}: {stats} ({(time.perf_counter() - start) * 1000:.1f}ms)")
+    elif command == "stress":
+        numbers = [int(a) for a in args[1:4]]
+        sys.exit(0 if stress_test(*numbers) else 1)
+    elif command == "stats":
+        for directory in directories:
+            print(f"{directory}: 图片 {catalog.count(directory, 'image')} 张，"
+                  f"视频 {catalog.count(directory, 'video')} 个")
+    else:
+        print(main.__doc__)
+
+
+if __name__ == "__main__":
+    main()
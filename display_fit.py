@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按显示器分辨率适配壁纸 - 设为壁纸前生成恰好等于屏幕分辨率的版本
+- 分辨率可自动检测（Windows 按各显示器当前显示模式的物理像素，Linux 读取 xrandr），也可由调用方指定
+- cover 模式等比放大到铺满后居中裁剪（与系统"填充"一致），contain 模式等比缩放后补黑边
+- 适配结果按 (内容哈希, 分辨率, 模式) 缓存在 images/.display，重复设置同一张壁纸无需再次解码和编码
+- 不比屏幕大的图片直接使用原图，由系统自行缩放
+"""
+
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from PIL import Image
+
+from encode_profiles import save_options
+from image_ingest import file_sha256
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("displayFit")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("displayFit")
+    logger.propagate = False
+
+
+DEFAULT_CACHE_DIR = os.path.join("images", ".display")
+DEFAULT_BUDGET = 256 * 1024 * 1024  # 适配结果占用的磁盘上限（字节）
+FIT_MODES = ("cover", "contain")
+
+_resolutions: Optional[List[Tuple[int, int]]] = None
+_resolutions_lock = threading.Lock()
+
+
+def _detect_windows() -> List[Tuple[int, int]]:
+    import ctypes
+    from ctypes import wintypes
+
+    class MONITORINFOEXW(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.DWORD), ("rcMonitor", wintypes.RECT), ("rcWork", wintypes.RECT),
+                    ("dwFlags", wintypes.DWORD), ("szDevice", wintypes.WCHAR * 32)]
+
+    class DEVMODEW(ctypes.Structure):
+        _fields_ = [("dmDeviceName", wintypes.WCHAR * 32), ("dmSpecVersion", wintypes.WORD),
+                    ("dmDriverVersion", wintypes.WORD), ("dmSize", wintypes.WORD),
+                    ("dmDriverExtra", wintypes.WORD), ("dmFields", wintypes.DWORD),
+                    ("dmPosition", wintypes.POINTL), ("dmDisplayOrientation", wintypes.DWORD),
+                    ("dmDisplayFixedOutput", wintypes.DWORD), ("dmColor", ctypes.c_short),
+                    ("dmDuplex", ctypes.c_short), ("dmYResolution", ctypes.c_short),
+                    ("dmTTOption", ctypes.c_short), ("dmCollate", ctypes.c_short),
+                    ("dmFormName", wintypes.WCHAR * 32), ("dmLogPixels", wintypes.WORD),
+                    ("dmBitsPerPel", wintypes.DWORD), ("dmPelsWidth", wintypes.DWORD),
+                    ("dmPelsHeight", wintypes.DWORD), ("dmDisplayFlags", wintypes.DWORD),
+                    ("dmDisplayFrequency", wintypes.DWORD), ("dmICMMethod", wintypes.DWORD),
+                    ("dmICMIntent", wintypes.DWORD), ("dmMediaType", wintypes.DWORD),
+                    ("dmDitherType", wintypes.DWORD), ("dmReserved1", wintypes.DWORD),
+                    ("dmReserved2", wintypes.DWORD), ("dmPanningWidth", wintypes.DWORD),
+                    ("dmPanningHeight", wintypes.DWORD)]
+
+    ENUM_CURRENT_SETTINGS = -1
+    user32 = ctypes.windll.user32
+    resolutions = []
+    callback_type = ctypes.WINFUNCTYPE(ctypes.c_int, wintypes.HMONITOR, wintypes.HDC,
+                                       ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+
+    def callback(monitor, dc, rect, data):
+        # 按显示器的当前显示模式读取物理像素，不调用 SetProcessDPIAware，
+        # 避免在界面已创建后改变整个进程的DPI模式
+        info = MONITORINFOEXW()
+        info.cbSize = ctypes.sizeof(MONITORINFOEXW)
+        mode = DEVMODEW()
+        mode.dmSize = ctypes.sizeof(DEVMODEW)
+        if user32.GetMonitorInfoW(monitor, ctypes.byref(info)) and \
+                user32.EnumDisplaySettingsW(info.szDevice, ENUM_CURRENT_SETTINGS, ctypes.byref(mode)):
+            resolutions.append((mode.dmPelsWidth, mode.dmPelsHeight))
+        else:
+            r = rect.contents
+            resolutions.append((r.right - r.left, r.bottom - r.top))
+        return 1
+
+    user32.EnumDisplayMonitors(None, None, callback_type(callback), 0)
+    if not resolutions:
+        resolutions.append((user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)))
+    return resolutions
+
+
+def _detect_xrandr() -> List[Tuple[int, int]]:
+    try:
+        output = subprocess.run(["xrandr", "--current"], capture_output=True, text=True, timeout=5).stdout
+    except FileNotFoundError:
+        return []
+    return [(int(w), int(h)) for w, h in re.findall(r" connected (?:primary )?(\d+)x(\d+)\+", output)]
+
+
+def detect_display_resolutions() -> List[Tuple[int, int]]:
+    """检测各显示器的分辨率，无法检测时返回空列表"""
+    try:
+        if os.name == "nt":
+            found = _detect_windows()
+        elif sys.platform.startswith("linux"):
+            found = _detect_xrandr()
+        else:
+            found = []
+    except Exception as e:
+        logger.error(f"检测显示器分辨率失败: {e}")
+        found = []
+    # 去重并保持顺序，第一个为主显示器
+    return list(dict.fromkeys((w, h) for w, h in found if w > 0 and h > 0))
+
+
+def set_display_resolutions(resolutions: List[Tuple[int, int]]):
+    """指定目标分辨率（覆盖自动检测的结果）"""
+    global _resolutions
+    with _resolutions_lock:
+        _resolutions = [tuple(r) for r in resolutions]
+
+
+def get_display_resolutions() -> List[Tuple[int, int]]:
+    """获取目标分辨率，首次调用时自动检测"""
+    global _resolutions
+    with _resolutions_lock:
+        if _resolutions is None:
+            _resolutions = detect_display_resolutions()
+            if _resolutions:
+                logger.info(f"检测到显示器分辨率: {', '.join(f'{w}x{h}' for w, h in _resolutions)}")
+        return list(_resolutions)
+
+
+def fit_image(image: Image.Image, resolution: Tuple[int, int], mode: str = "cover") -> Image.Image:
+    """
+    将已解码的图片适配到恰好为 resolution 的尺寸
+
+    Args:
+        image: 输入图片
+        resolution: 目标 (宽, 高)
+        mode: cover 铺满后居中裁剪 / contain 完整显示并补黑边
+    """
+    width, height = resolution
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if mode == "cover":
+        scale = max(width / image.width, height / image.height)
+    else:
+        scale = min(width / image.width, height / image.height)
+    scaled = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+
+    factor = min(image.width // scaled[0], image.height // scaled[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    image = image.resize(scaled, Image.Resampling.LANCZOS)
+
+    left = (scaled[0] - width) // 2
+    top = (scaled[1] - height) // 2
+    if mode == "cover":
+        return image.crop((left, top, left + width, top + height))
+    canvas = Image.new(image.mode, (width, height))
+    canvas.paste(image, (-left, -top))
+    return canvas
+
+
+class DisplayFitCache:
+    """按分辨率缓存的壁纸适配结果"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, budget: int = DEFAULT_BUDGET):
+        """
+        Args:
+            cache_dir: 适配结果存放目录
+            budget: 缓存总字节上限，超出时删除最久未使用的结果
+        """
+        self.cache_dir = cache_dir
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "fitted": 0, "original": 0, "bytes_saved": 0}
+
+    def fit(self, image_path: str, resolution: Optional[Tuple[int, int]] = None, mode: str = "cover") -> str:
+        """
+        获取适配到目标分辨率的壁纸文件
+
+        Args:
+            image_path: 原图路径
+            resolution: 目标分辨率，None表示使用主显示器分辨率
+            mode: cover / contain
+
+        Returns:
+            适配后的文件路径；无法检测分辨率或原图不比屏幕大时返回原图路径
+        """
+        if mode not in FIT_MODES:
+            raise ValueError(f"未知的适配模式: {mode}")
+        if resolution is None:
+            resolutions = get_display_resolutions()
+            if not resolutions:
+                return image_path
+            resolution = resolutions[0]
+        width, height = resolution
+
+        name = f"{file_sha256(image_path)}_{width}x{height}_{mode}.jpg"
+        path = os.path.join(self.cache_dir, name)
+        if os.path.exists(path):
+            os.utime(path)
+            with self._lock:
+                self._stats["hits"] += 1
+            return path
+
+        with Image.open(image_path) as image:
+            if image.width <= width and image.height <= height:
+                with self._lock:
+                    self._stats["original"] += 1
+                return image_path
+            if image.format == "JPEG":
+                # 按DCT缩放解码，得到不小于目标尺寸的最小 1/2^n 图像
+                scale = max(width / image.width, height / image.height) if mode == "cover" \
+                    else min(width / image.width, height / image.height)
+                image.draft("RGB", (int(image.width * scale), int(image.height * scale)))
+            image.load()
+            fitted = fit_image(image, resolution, mode)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+        try:
+            fitted.save(tmp_path, format="JPEG", **save_options("JPEG", "desktop"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        saved = os.path.getsize(image_path) - os.path.getsize(path)
+        with self._lock:
+            self._stats["fitted"] += 1
+            self._stats["bytes_saved"] += max(0, saved)
+        logger.info(f"壁纸已适配到 {width}x{height} ({mode}): {name}")
+        self._evict(keep=name)
+        return path
+
+    def _evict(self, keep: str):
+        """超出预算时按最近使用时间删除旧结果，刚生成的结果（当前壁纸）始终保留"""
+        with self._lock:
+            try:
+                entries = [(e.stat().st_mtime, e.name, e.stat().st_size)
+                           for e in os.scandir(self.cache_dir) if e.is_file() and e.name.endswith(".jpg")]
+            except OSError:
+                return
+            total = sum(size for _, _, size in entries)
+            for _, name, size in sorted(entries):
+                if total <= self.budget:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    total -= size
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取适配统计信息"""
+        with self._lock:
+            return dict(self._stats)
+
+
+# 全局共享缓存
+_cache: Optional[DisplayFitCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_display_fit_cache() -> DisplayFitCache:
+    """获取全局壁纸适配缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DisplayFitCache()
+        return _cache
+
+
+def fit_to_display(image_path: str, resolution: Optional[Tuple[int, int]] = None, mode: str = "cover") -> str:
+    """将壁纸适配到显示器分辨率，返回交给桌面使用的文件路径"""
+    return get_display_fit_cache().fit(image_path, resolution, mode)
+
+
+def main():
+    """
+    命令行: python display_fit.py 图片路径 [宽x高] [cover|contain]
+    未指定分辨率时自动检测，输出适配前后的尺寸、字节数和耗时
+    """
+    args = sys.argv[1:]
+    if not args:
+        print(main.__doc__)
+        print(f"检测到的分辨率: {detect_display_resolutions() or '无'}")
+        return
+    resolution = tuple(int(v) for v in args[1].lower().split("x")) if len(args) > 1 else None
+    mode = args[2] if len(args) > 2 else "cover"
+
+    cache = DisplayFitCache()
+    start = time.perf_counter()
+    path = cache.fit(args[0], resolution, mode)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    cache.fit(args[0], resolution, mode)
+    cached = time.perf_counter() - start
+
+    with Image.open(args[0]) as src, Image.open(path) as dst:
+        print(f"原图: {src.size[0]}x{src.size[1]}, {os.path.getsize(args[0]) / 1024:.0f}KB")
+        print(f"适配: {dst.size[0]}x{dst.size[1]}, {os.path.getsize(path) / 1024:.0f}KB -> {path}")
+    print(f"首次适配 {elapsed * 1000:.0f}ms，缓存命中 {cached * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大文件下载器 - 支持HTTP Range断点续传与多连接分段下载的视频下载
+下载过程中写入 .part 文件，并在 .part.json 中记录已下载字节数与 ETag/Last-Modified，
+中断后重试时使用 Range 请求从断点继续，完成后原子重命名为目标文件；
+分段模式下将文件切分为多个字节区间，通过连接池并发下载并直接写入预分配文件的对应偏移
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import logging
+
+import requests
+
+from resilience import resilient_get, default_retry_policy, current_deadline, DeadlineExceeded
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("downloader")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("downloader")
+    logger.propagate = False
+
+
+CHUNK_SIZE = 64 * 1024
+META_FLUSH_BYTES = 1024 * 1024  # 每写入多少字节更新一次断点信息
+
+# progress_callback(已下载字节数, 总字节数或0)
+ProgressCallback = Callable[[int, int], None]
+
+
+class DownloadValidationError(Exception):
+    """续传内容与已下载部分不一致"""
+
+
+def _meta_path(part_path: str) -> str:
+    return part_path + ".json"
+
+
+def _load_meta(part_path: str) -> Dict[str, Any]:
+    try:
+        with open(_meta_path(part_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(part_path: str, meta: Dict[str, Any]):
+    tmp_path = _meta_path(part_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(part_path))
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _parse_content_range(value: str) -> Optional[Dict[str, int]]:
+    """解析 'bytes start-end/total'，total 未知时为0"""
+    try:
+        unit, spec = value.strip().split(" ", 1)
+        if unit.lower() != "bytes":
+            return None
+        range_part, total_part = spec.split("/", 1)
+        start, end = range_part.split("-", 1)
+        return {"start": int(start), "end": int(end),
+                "total": 0 if total_part.strip() == "*" else int(total_part)}
+    except ValueError:
+        return None
+
+
+def _validator_changed(meta: Dict[str, Any], response: requests.Response) -> bool:
+    """服务器返回的 ETag/Last-Modified 与断点记录不一致时说明文件已变化"""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if meta.get("etag") and etag and meta["etag"] != etag:
+        return True
+    if meta.get("last_modified") and last_modified and meta["last_modified"] != last_modified:
+        return True
+    return False
+
+
+def _download_once(url: str, part_path: str, meta: Dict[str, Any], timeout: float,
+                   progress_callback: Optional[ProgressCallback]) -> bool:
+    """
+    发起一次（可能是续传的）请求并写入 .part 文件
+
+    Returns:
+        下载是否已完整结束
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and (meta.get("url") != url or meta.get("mode") == "segmented"):
+        logger.info("断点记录与当前URL不一致，重新下载")
+        offset = 0
+
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        validator = meta.get("etag") or meta.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+    response = resilient_get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        if response.status_code == 416 and offset and meta.get("total_size") == offset:
+            # 已经下载完整
+            return True
+
+        response.raise_for_status()
+
+        if offset and response.status_code == 206:
+            content_range = _parse_content_range(response.headers.get("Content-Range", ""))
+            if content_range is None or content_range["start"] != offset:
+                raise DownloadValidationError(f"Content-Range 与断点不一致: {response.headers.get('Content-Range')}")
+            if _validator_changed(meta, response):
+                raise DownloadValidationError("远程文件已变化（ETag/Last-Modified 不一致）")
+            total_size = content_range["total"] or meta.get("total_size", 0)
+            mode = "ab"
+            logger.info(f"从 {offset} 字节处续传: {url}")
+        else:
+            # 服务器不支持Range（或文件已变化）时返回200，从头开始下载
+            if offset:
+                logger.info("服务器未返回206，回退为完整下载")
+            offset = 0
+            total_size = int(response.headers.get("Content-Length", 0) or 0)
+            mode = "wb"
+
+        meta.clear()
+        meta.update({
+            "url": url,
+            "bytes_done": offset,
+            "total_size": total_size,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "accept_ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                             or response.status_code == 206,
+        })
+        _save_meta(part_path, meta)
+
+        deadline = current_deadline()
+        downloaded = offset
+        unflushed = 0
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                downloaded += len(chunk)
+                unflushed += len(chunk)
+                if unflushed >= META_FLUSH_BYTES:
+                    f.flush()
+                    meta["bytes_done"] = downloaded
+                    _save_meta(part_path, meta)
+                    unflushed = 0
+                if progress_callback:
+                    progress_callback(downloaded, total_size)
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded(f"下载超时: {url}")
+            f.flush()
+            os.fsync(f.fileno())
+
+        meta["bytes_done"] = downloaded
+        _save_meta(part_path, meta)
+        if total_size and downloaded != total_size:
+            raise requests.exceptions.ChunkedEncodingError(
+                f"连接提前关闭: 已下载 {downloaded}/{total_size} 字节")
+        return True
+    finally:
+        response.close()
+
+
+def download_resumable(url: str, save_path: str, timeout: float = 60,
+                       max_resumes: int = 5,
+                       progress_callback: Optional[ProgressCallback] = None) -> bool:
+    """
+    断点续传下载文件
+
+    Args:
+        url: 文件地址
+        save_path: 最终保存路径（下载中使用 save_path + '.part'）
+        timeout: 单次请求的超时时间（秒）
+        max_resumes: 连接中断后最多续传次数
+        progress_callback: 进度回调 (已下载字节数, 总字节数)
+
+    Returns:
+        是否下载成功
+    """
+    part_path = save_path + ".part"
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    meta = _load_meta(part_path)
+    for attempt in range(max_resumes + 1):
+        try:
+            if _download_once(url, part_path, meta, timeout, progress_callback):
+                os.replace(part_path, save_path)
+                _remove_quietly(_meta_path(part_path))
+                logger.info(f"下载完成: {save_path}")
+                return True
+        except DownloadValidationError as e:
+            logger.error(f"续传校验失败，丢弃已下载部分: {e}")
+            _remove_quietly(part_path)
+            _remove_quietly(_meta_path(part_path))
+            meta = {}
+        except DeadlineExceeded as e:
+            logger.error(f"下载超时，保留断点以便下次续传: {e}")
+            return False
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == max_resumes:
+                logger.error(f"下载失败，已保留断点: {e}")
+                return False
+            logger.info(f"下载中断，准备续传({attempt + 1}/{max_resumes}): {e}")
+            time.sleep(default_retry_policy.backoff(attempt))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"下载失败: {e}")
+            return False
+        except OSError as e:
+            logger.error(f"保存文件失败: {e}")
+            return False
+    return False
+
+
+def probe_download(url: str, timeout: float = 15) -> Dict[str, Any]:
+    """
+    探测文件大小与Range支持情况（使用 Range: bytes=0-0 的GET请求，比HEAD更可靠）
+
+    Returns:
+        {"size": 字节数或0, "accept_ranges": bool, "etag": ..., "last_modified": ...}
+    """
+    response = resilient_get(url, headers={"Range": "bytes=0-0"}, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        content_range = _parse_content_range(response.headers.get("Content-Range", ""))
+        if response.status_code == 206 and content_range and content_range["total"]:
+            size, accept_ranges = content_range["total"], True
+        else:
+            size, accept_ranges = int(response.headers.get("Content-Length", 0) or 0), False
+        return {
+            "size": size,
+            "accept_ranges": accept_ranges,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+    finally:
+        response.close()
+
+
+class SegmentedDownload:
+    """
+    多连接分段下载
+
+    文件被切分为若干等长单元，由工作线程从共享队列中领取并通过Range请求下载，
+    写入预分配 .part 文件的对应偏移。并发连接数从 initial_segments 开始，
+    只要总吞吐量仍有明显提升就继续增加，直到 max_segments。
+    """
+
+    def __init__(self, url: str, save_path: str, info: Dict[str, Any], timeout: float = 60,
+                 max_segments: int = 8, initial_segments: int = 2,
+                 min_segment_size: int = 1024 * 1024,
+                 progress_callback: Optional[ProgressCallback] = None):
+        self.url = url
+        self.save_path = save_path
+        self.part_path = save_path + ".part"
+        self.size = info["size"]
+        self.info = info
+        self.timeout = timeout
+        self.max_segments = max(1, max_segments)
+        self.initial_segments = max(1, min(initial_segments, self.max_segments))
+        self.progress_callback = progress_callback
+        # 单元数量为最大连接数的4倍，便于快连接多领取、慢连接少领取
+        self.unit_size = max(min_segment_size, math.ceil(self.size / (self.max_segments * 4)))
+        self.unit_count = math.ceil(self.size / self.unit_size)
+
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._done_units: set = set()
+        self._downloaded = 0
+        self._errors: list = []
+        self._stop = threading.Event()
+        self.meta: Dict[str, Any] = {}
+
+    def _unit_range(self, index: int):
+        start = index * self.unit_size
+        return start, min(self.size, start + self.unit_size) - 1
+
+    def _prepare(self):
+        """加载可续传的分段记录，或预分配新的 .part 文件"""
+        meta = _load_meta(self.part_path)
+        resumable = (meta.get("mode") == "segmented" and meta.get("url") == self.url
+                     and meta.get("total_size") == self.size and meta.get("unit_size") == self.unit_size
+                     and meta.get("etag") == self.info.get("etag")
+                     and meta.get("last_modified") == self.info.get("last_modified")
+                     and os.path.exists(self.part_path)
+                     and os.path.getsize(self.part_path) == self.size)
+        if resumable:
+            self._done_units = set(meta.get("done_units", []))
+            logger.info(f"续传分段下载: 已完成 {len(self._done_units)}/{self.unit_count} 个分段")
+        else:
+            with open(self.part_path, "wb") as f:
+                f.truncate(self.size)
+            self._done_units = set()
+
+        self.meta = {
+            "mode": "segmented",
+            "url": self.url,
+            "total_size": self.size,
+            "unit_size": self.unit_size,
+            "etag": self.info.get("etag"),
+            "last_modified": self.info.get("last_modified"),
+            "done_units": sorted(self._done_units),
+        }
+        _save_meta(self.part_path, self.meta)
+
+        for index in range(self.unit_count):
+            if index in self._done_units:
+                start, end = self._unit_range(index)
+                self._downloaded += end - start + 1
+            else:
+                self._queue.append(index)
+
+    def _fetch_unit(self, f, index: int):
+        start, end = self._unit_range(index)
+        headers = {"Range": f"bytes={start}-{end}"}
+        validator = self.info.get("etag") or self.info.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+        response = resilient_get(self.url, headers=headers, timeout=self.timeout, stream=True)
+        written = 0
+        try:
+            response.raise_for_status()
+            content_range = _parse_content_range(response.headers.get("Content-Range", ""))
+            if response.status_code != 206 or content_range is None or content_range["start"] != start:
+                raise DownloadValidationError("服务器未按请求返回分段（文件可能已变化）")
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if self._stop.is_set():
+                    raise DeadlineExceeded("分段下载已停止")
+                if not chunk:
+                    continue
+                chunk = chunk[:end - start + 1 - written]
+                f.write(chunk)
+                written += len(chunk)
+                with self._lock:
+                    self._downloaded += len(chunk)
+            if written != end - start + 1:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"分段 {index} 不完整: {written}/{end - start + 1} 字节")
+        except BaseException:
+            with self._lock:
+                self._downloaded -= written
+            raise
+        finally:
+            response.close()
+
+    def _worker(self):
+        failures = 0
+        with open(self.part_path, "r+b") as f:
+            while not self._stop.is_set():
+                with self._lock:
+                    if not self._queue:
+                        return
+                    index = self._queue.popleft()
+                try:
+                    self._fetch_unit(f, index)
+                except DownloadValidationError as e:
+                    with self._lock:
+                        self._errors.append(e)
+                    self._stop.set()
+                    return
+                except (requests.exceptions.RequestException, OSError) as e:
+                    failures += 1
+                    with self._lock:
+                        self._queue.appendleft(index)
+                        if failures > 3:
+                            self._errors.append(e)
+                            return
+                    time.sleep(default_retry_policy.backoff(failures - 1))
+                    continue
+                f.flush()
+                with self._lock:
+                    self._done_units.add(index)
+                    self.meta["done_units"] = sorted(self._done_units)
+                    _save_meta(self.part_path, self.meta)
+
+    def run(self) -> bool:
+        """执行下载，返回是否完整下载"""
+        self._prepare()
+        deadline = current_deadline()
+        workers = []
+
+        def start_worker():
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            workers.append(thread)
+
+        for _ in range(min(self.initial_segments, len(self._queue))):
+            start_worker()
+
+        # 自适应并发：每个观测窗口比较总吞吐量，仍有明显提升时增加一个连接
+        window = 0.5
+        last_bytes, last_time = self._downloaded, time.perf_counter()
+        best_throughput = 0.0
+        growing = True
+        while any(t.is_alive() for t in workers):
+            time.sleep(window)
+            if deadline is not None and deadline.expired():
+                self._stop.set()
+                break
+            now = time.perf_counter()
+            with self._lock:
+                downloaded = self._downloaded
+                queued = len(self._queue)
+            throughput = (downloaded - last_bytes) / max(1e-6, now - last_time)
+            last_bytes, last_time = downloaded, now
+            if self.progress_callback:
+                self.progress_callback(downloaded, self.size)
+
+            alive = sum(1 for t in workers if t.is_alive())
+            if growing and queued and alive < self.max_segments:
+                if throughput > best_throughput * 1.1:
+                    best_throughput = throughput
+                    start_worker()
+                    logger.info(f"吞吐量 {throughput / 1024:.0f}KB/s，增加并发连接至 {alive + 1}")
+                else:
+                    growing = False
+                    logger.info(f"吞吐量不再提升，保持 {alive} 个并发连接")
+
+        for thread in workers:
+            thread.join()
+
+        if self._errors or len(self._done_units) != self.unit_count:
+            if self._errors:
+                raise self._errors[0]
+            raise DeadlineExceeded("分段下载未完成")
+
+        with open(self.part_path, "r+b") as f:
+            os.fsync(f.fileno())
+        if self.progress_callback:
+            self.progress_callback(self.size, self.size)
+        os.replace(self.part_path, self.save_path)
+        _remove_quietly(_meta_path(self.part_path))
+        logger.info(f"分段下载完成: {self.save_path} ({self.unit_count} 个分段)")
+        return True
+
+
+def download_segmented(url: str, save_path: str, timeout: float = 60,
+                       max_segments: int = 8, initial_segments: int = 2,
+                       min_segment_size: int = 1024 * 1024,
+                       progress_callback: Optional[ProgressCallback] = None) -> bool:
+    """
+    多连接分段下载文件，服务器不支持Range或文件较小时回退为单连接断点续传
+
+    Args:
+        url: 文件地址
+        save_path: 最终保存路径
+        timeout: 单次请求的超时时间（秒）
+        max_segments: 最大并发连接数
+        initial_segments: 初始并发连接数，之后根据吞吐量自适应增加
+        min_segment_size: 单个分段的最小字节数
+        progress_callback: 进度回调 (已下载字节数, 总字节数)
+
+    Returns:
+        是否下载成功
+    """
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    try:
+        info = probe_download(url, timeout=min(timeout, 15))
+    except requests.exceptions.RequestException as e:
+        logger.error(f"探测文件信息失败: {e}")
+        return False
+
+    if not info["accept_ranges"] or info["size"] < 2 * min_segment_size:
+        logger.info("服务器不支持Range或文件较小，使用单连接下载")
+        return download_resumable(url, save_path, timeout=timeout, progress_callback=progress_callback)
+
+    try:
+        return SegmentedDownload(url, save_path, info, timeout=timeout, max_segments=max_segments,
+                                 initial_segments=initial_segments, min_segment_size=min_segment_size,
+                                 progress_callback=progress_callback).run()
+    except DownloadValidationError as e:
+        logger.error(f"分段校验失败，改用单连接下载: {e}")
+        _remove_quietly(save_path + ".part")
+        _remove_quietly(_meta_path(save_path + ".part"))
+        return download_resumable(url, save_path, timeout=timeout, progress_callback=progress_callback)
+    except DeadlineExceeded as e:
+        logger.error(f"分段下载超时，保留已完成的分段以便续传: {e}")
+        return False
+    except (requests.exceptions.RequestException, OSError) as e:
+        logger.error(f"分段下载失败，保留已完成的分段以便续传: {e}")
+        return False
+
+
+def _run_local_selftest():
+    """启动本地支持Range的测试服务器，模拟连接中断并验证续传结果"""
+    import hashlib
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    payload = os.urandom(3 * 1024 * 1024 + 123)
+    state = {"requests": [], "drop_next": True}
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, len(payload) - 1
+            range_header = self.headers.get("Range")
+            ranged = self.path.startswith("/range") and range_header
+            if ranged:
+                start = int(range_header.split("=")[1].split("-")[0])
+            state["requests"].append(range_header)
+            body = payload[start:end + 1]
+            self.send_response(206 if ranged else 200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Content-Type", "video/mp4")
+            if self.path.startswith("/range"):
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", '"selftest"')
+            if ranged:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+            self.end_headers()
+            if state["drop_next"]:
+                # 只发送一部分数据后断开连接，模拟网络中断
+                state["drop_next"] = False
+                self.wfile.write(body[:len(body) // 3])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    expected = hashlib.sha256(payload).hexdigest()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for path, label in (("/range", "支持Range"), ("/plain", "不支持Range")):
+            state["requests"].clear()
+            state["drop_next"] = True
+            target = os.path.join(tmp, path.strip("/") + ".mp4")
+            ok = download_resumable(base + path, target, timeout=10)
+            with open(target, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest() if ok else ""
+            print(f"{label}: 下载{'成功' if ok else '失败'}, 校验{'通过' if digest == expected else '失败'}, "
+                  f"请求的Range头: {state['requests']}")
+    server.shutdown()
+
+
+def _run_local_benchmark(size_mb: int = 8, per_connection_kbps: int = 1024):
+    """在本地限速服务器上对比单连接与分段下载的耗时"""
+    import hashlib
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    payload = os.urandom(size_mb * 1024 * 1024)
+    bytes_per_tick = per_connection_kbps * 1024 // 20  # 每50ms发送的字节数
+
+    class ThrottledHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, len(payload) - 1
+            range_header = self.headers.get("Range")
+            if range_header:
+                spec = range_header.split("=")[1]
+                start_text, end_text = spec.split("-")
+                start = int(start_text)
+                end = int(end_text) if end_text else end
+            body = payload[start:end + 1]
+            self.send_response(206 if range_header else 200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", '"bench"')
+            if range_header:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+            self.end_headers()
+            # 每个连接单独限速，模拟受限于单连接带宽的远程服务器
+            for offset in range(0, len(body), bytes_per_tick):
+                self.wfile.write(body[offset:offset + bytes_per_tick])
+                time.sleep(0.05)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+
+    print(f"文件大小: {size_mb}MB, 单连接限速: {per_connection_kbps}KB/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, func in (("单连接下载", download_resumable), ("分段下载", download_segmented)):
+            target = os.path.join(tmp, label + ".mp4")
+            start = time.perf_counter()
+            ok = func(url, target, timeout=30)
+            elapsed = time.perf_counter() - start
+            with open(target, "rb") as f:
+                valid = ok and hashlib.sha256(f.read()).digest() == hashlib.sha256(payload).digest()
+            print(f"  {label}: {'成功' if ok else '失败'}, 校验{'通过' if valid else '失败'}, "
+                  f"耗时 {elapsed:.2f}s, 平均速度 {size_mb * 1024 / elapsed:.0f}KB/s")
+    server.shutdown()
+
+
+def main():
+    """本地自检：python downloader.py；下载性能对比：python downloader.py bench"""
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        print("=== 单连接 vs 分段下载（本地限速服务器） ===")
+        _run_local_benchmark()
+        return
+
+    print("=== 断点续传下载自检（本地测试服务器） ===")
+    _run_local_selftest()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,10 @@ import json
 import os
 from typing import Optional, Dict, Any
 import logging
-from myAPI import count_files_in_directory
+from catalog import get_catalog
+from http_session import http_head
+from resilience import resilient_get
+from downloader import download_segmented
 
 # 配置日志
 try:
@@ -44,7 +47,7 @@ class DynamicWallpaperAPI:
             logger.info("正在获取随机动态壁纸视频...")
             # 添加return=json参数确保返回JSON格式
             params = {"return": "json"}
-            response = requests.get(self.base_url, params=params, timeout=15)
+            response = resilient_get(self.base_url, params=params, timeout=15)
             response.raise_for_status()
             
             # 解析JSON响应
@@ -92,8 +95,8 @@ class DynamicWallpaperAPI:
             
             # 生成保存路径
             if save_path is None:
-                video_num = count_files_in_directory('videos')
-                save_path = f"videos/dynamic_wallpaper_{video_num + 1}.mp4"
+                # 按视频URL预留路径，中断后再次下载得到同一路径，可从 .part 续传
+                save_path = get_catalog().allocate_path('videos', 'dynamic_wallpaper', 'mp4', key=video_url)
             
             # 确保videos目录存在
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
@@ -102,6 +105,7 @@ class DynamicWallpaperAPI:
             success = self._download_video(video_url, save_path)
             
             if success:
+                get_catalog().add(save_path, kind="video", source_api="dynamic", url=video_url)
                 logger.info(f"动态壁纸视频已保存到: {save_path}")
                 logger.info(f"API信息 - 状态: {result.get('success')}, 消息: {result.get('message')}")
                 return True
@@ -126,30 +130,23 @@ class DynamicWallpaperAPI:
         """
         try:
             logger.info(f"正在下载视频: {video_url}")
-            response = requests.get(video_url, timeout=60, stream=True)
-            response.raise_for_status()
-            
-            # 获取文件大小
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-            
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        
-                        # 显示下载进度
-                        if total_size > 0:
-                            progress = (downloaded_size / total_size) * 100
-                            logger.info(f"下载进度: {progress:.1f}% ({downloaded_size}/{total_size} bytes)")
+            last_logged = [0]
+
+            def log_progress(downloaded_size, total_size):
+                # 每下载约1MB记录一次进度
+                if total_size > 0 and downloaded_size - last_logged[0] >= 1024 * 1024:
+                    last_logged[0] = downloaded_size
+                    progress = (downloaded_size / total_size) * 100
+                    logger.info(f"下载进度: {progress:.1f}% ({downloaded_size}/{total_size} bytes)")
+
+            # 多连接分段下载（服务器不支持Range时回退为单连接），中断后自动从 .part 文件续传
+            if not download_segmented(video_url, save_path, timeout=60, progress_callback=log_progress):
+                logger.error(f"下载视频失败: {video_url}")
+                return False
             
             logger.info(f"视频下载完成: {save_path}")
             return True
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"下载视频失败: {e}")
-            return False
         except Exception as e:
             logger.error(f"保存视频失败: {e}")
             return False
@@ -188,7 +185,7 @@ class DynamicWallpaperAPI:
         """
         try:
             logger.info(f"正在获取视频信息: {video_url}")
-            response = requests.head(video_url, timeout=10)
+            response = http_head(video_url, timeout=10)
             response.raise_for_status()
             
             headers = response.headers
@@ -206,7 +203,7 @@ class DynamicWallpaperAPI:
 
 def count_video_files_in_directory(directory_path: str) -> int:
     """
-    统计指定目录下的视频文件数量
+    统计指定目录下的视频文件数量（查询媒体目录，不遍历文件系统）
     
     Args:
         directory_path: 目录路径
@@ -219,11 +216,7 @@ def count_video_files_in_directory(directory_path: str) -> int:
             logger.info(f"Directory {directory_path} does not exist")
             return 0
             
-        file_count = 0
-        for item in os.listdir(directory_path):
-            item_path = os.path.join(directory_path, item)
-            if os.path.isfile(item_path) and item.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm')):
-                file_count += 1
+        file_count = get_catalog().count(directory_path, "video")
         logger.info(f"Found {file_count} video files in {directory_path}")
         return file_count
     except Exception as e:
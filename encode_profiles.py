@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片编码配置 - 按用途选择编码参数，而不是所有文件都用最慢的 quality=95 + optimize
+- fast / balanced / archival 三档配置，分别给出 JPEG、WebP、PNG 的编码参数
+- 按写入目标选择配置：preview（预览缩略图）、library（壁纸库）、desktop（交给桌面的适配版本）
+- 自带编码性能测试，输出各配置在样本图片上的编码耗时和文件大小，用于确定默认值
+"""
+
+import os
+import sys
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+import logging
+
+from PIL import Image
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("encodeProfiles")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("encodeProfiles")
+    logger.propagate = False
+
+
+# 配置名 -> 格式 -> Image.save 参数
+PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "fast": {
+        "JPEG": {"quality": 85},
+        "WEBP": {"quality": 80, "method": 0},
+        "PNG": {"compress_level": 1},
+    },
+    "balanced": {
+        "JPEG": {"quality": 90, "optimize": True},
+        "WEBP": {"quality": 85, "method": 4},
+        "PNG": {"compress_level": 3},
+    },
+    "archival": {
+        "JPEG": {"quality": 95, "optimize": True, "progressive": True},
+        "WEBP": {"lossless": True, "method": 4},
+        # compress_level=9 比 6 慢约7倍，文件只小约2%
+        "PNG": {"compress_level": 6},
+    },
+}
+
+# 写入目标 -> 默认配置
+DESTINATIONS: Dict[str, str] = {
+    "preview": "fast",       # 预览缩略图：写得最多、只在界面上小尺寸显示
+    "library": "balanced",   # 壁纸库：与原 quality=95+optimize 编码耗时相当，文件小20%~35%
+    "desktop": "balanced",   # 桌面适配版本：已缩到屏幕分辨率，可随时重新生成
+}
+
+_destinations_lock = threading.Lock()
+
+
+def set_destination_profile(destination: str, profile: str):
+    """修改某个写入目标使用的配置"""
+    if destination not in DESTINATIONS:
+        raise ValueError(f"未知的写入目标: {destination}")
+    if profile not in PROFILES:
+        raise ValueError(f"未知的编码配置: {profile}")
+    with _destinations_lock:
+        DESTINATIONS[destination] = profile
+
+
+def save_options(image_format: str, destination: Optional[str] = None,
+                 profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    获取 Image.save 的编码参数
+
+    Args:
+        image_format: PIL 格式名，如 JPEG / PNG / WEBP
+        destination: 写入目标，决定使用哪一档配置
+        profile: 直接指定配置，优先于 destination
+
+    Returns:
+        编码参数；该格式没有配置时返回空字典（使用 PIL 默认值）
+    """
+    if profile is None:
+        with _destinations_lock:
+            profile = DESTINATIONS.get(destination or "library", "balanced")
+    if profile not in PROFILES:
+        raise ValueError(f"未知的编码配置: {profile}")
+    return dict(PROFILES[profile].get((image_format or "").upper(), {}))
+
+
+def _load_corpus(paths: List[str]) -> List[Image.Image]:
+    images = []
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                img.load()
+                images.append(img.convert("RGB"))
+        except Exception as e:
+            print(f"  跳过 {path}: {e}")
+    return images
+
+
+def _encode_all(images: List[Image.Image], image_format: str, options: Dict[str, Any], rounds: int):
+    """编码全部样本，返回 (多轮中最快的耗时, 总字节数)"""
+    best = float("inf")
+    total_bytes = 0
+    for _ in range(rounds):
+        total_bytes = 0
+        start = time.perf_counter()
+        for img in images:
+            buffer = BytesIO()
+            img.save(buffer, format=image_format, **options)
+            total_bytes += buffer.tell()
+        best = min(best, time.perf_counter() - start)
+    return best, total_bytes
+
+
+def benchmark(images: List[Image.Image], formats=("JPEG", "WEBP", "PNG"), rounds: int = 3):
+    """在样本图片上测试各配置、各格式的编码耗时和大小（取多轮中最快的一次）"""
+    pixels = sum(img.width * img.height for img in images)
+    print(f"样本: {len(images)} 张图片, 共 {pixels / 1e6:.1f} 百万像素")
+    print(f"{'格式':<6}{'配置':<10}{'耗时(ms)':>10}{'大小(KB)':>12}{'MP/s':>8}")
+    cases = [(fmt, profile, save_options(fmt, profile=profile)) for fmt in formats for profile in PROFILES]
+    # 对照：原 clear_image 的编码参数
+    cases.append(("JPEG", "旧参数", {"quality": 95, "dpi": (500, 500), "optimize": True}))
+    for image_format, label, options in cases:
+        elapsed, total_bytes = _encode_all(images, image_format, options, rounds)
+        print(f"{image_format:<8}{label:<10}{elapsed * 1000:>10.0f}{total_bytes / 1024:>12.0f}"
+              f"{pixels / 1e6 / elapsed:>8.1f}")
+
+
+def _synthetic_corpus() -> List[Image.Image]:
+    """没有样本图片时生成接近照片统计特性的平滑图片（渐变 + 模糊噪声）"""
+    import numpy as np
+    from PIL import ImageFilter
+
+    rng = np.random.default_rng(1)
+    y, x = np.mgrid[0:1080, 0:1920]
+    base = np.stack([x / 1920 * 255, y / 1080 * 255, (x + y) / 3000 * 255], -1)
+    pixels = np.clip(base + rng.normal(0, 25, base.shape), 0, 255).astype("uint8")
+    return [Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(2))]
+
+
+def main():
+    """编码性能测试: python encode_profiles.py [图片目录或图片路径...]，默认使用 images 目录"""
+    args = sys.argv[1:] or ["images"]
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            paths.extend(entry.path for entry in os.scandir(arg) if entry.is_file()
+                         and entry.name.lower().endswith((".jpg", ".jpeg", ".png", ".webp", ".bmp")))
+        else:
+            paths.append(arg)
+    images = _load_corpus(sorted(paths))
+    if not images:
+        print("没有可用的样本图片，使用生成的 1920x1080 图片")
+        images = _synthetic_corpus()
+    benchmark(images)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片源评分板 - 按图片源记录延迟、吞吐量与失败率的指数加权移动平均(EWMA)
+用于"随机"模式的加权选择以及备用图片源的排序，数据在多次运行之间持久化
+（按间隔合并写入磁盘，退出时写入剩余的改动）
+"""
+
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("endpointScoreboard")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("endpointScoreboard")
+    logger.propagate = False
+
+
+DATA_DIR = Path(__file__).parent / "data"
+SCOREBOARD_FILE = DATA_DIR / "endpoint_scores.json"
+
+
+class EndpointScoreboard:
+    """图片源评分板"""
+
+    def __init__(self, path: Optional[Path] = SCOREBOARD_FILE, alpha: float = 0.3,
+                 min_weight_ratio: float = 0.05, save_interval: float = 5.0):
+        """
+        Args:
+            path: 持久化文件路径，None表示不持久化
+            alpha: EWMA平滑系数，越大越偏向最近的观测
+            min_weight_ratio: 最差图片源相对最优图片源的最小权重比例，保证故障恢复后仍能被探测到
+            save_interval: 两次写入磁盘的最小间隔（秒），期间的改动合并为一次写入
+        """
+        self.path = Path(path) if path else None
+        self.alpha = alpha
+        self.min_weight_ratio = min_weight_ratio
+        self.save_interval = save_interval
+        self._scores: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._save_timer: Optional[threading.Timer] = None
+        self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._scores = json.load(f)
+            logger.info(f"已加载图片源评分: {len(self._scores)} 个")
+        except Exception as e:
+            logger.error(f"加载图片源评分失败: {e}")
+            self._scores = {}
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._scores, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"保存图片源评分失败: {e}")
+
+    def _schedule_save_locked(self):
+        """标记有未保存的改动，距上次写入不足 save_interval 时延后合并写入"""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._save_timer is not None:
+            return
+        delay = max(0.0, self._last_save + self.save_interval - time.monotonic())
+        self._save_timer = threading.Timer(delay, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self):
+        """立即写入尚未保存的改动"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._save_locked()
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+    def _ewma(self, old: Optional[float], value: float) -> float:
+        return value if old is None else self.alpha * value + (1 - self.alpha) * old
+
+    def record_success(self, endpoint: str, latency: float, num_bytes: int = 0):
+        """记录一次成功请求"""
+        with self._lock:
+            item = self._scores.setdefault(endpoint, {"requests": 0, "failures": 0})
+            item["requests"] += 1
+            item["latency"] = self._ewma(item.get("latency"), latency)
+            if num_bytes and latency > 0:
+                item["throughput"] = self._ewma(item.get("throughput"), num_bytes / latency)
+            item["failure_rate"] = self._ewma(item.get("failure_rate"), 0.0)
+            item["last_seen"] = time.time()
+            self._schedule_save_locked()
+
+    def record_failure(self, endpoint: str, latency: Optional[float] = None):
+        """记录一次失败请求"""
+        with self._lock:
+            item = self._scores.setdefault(endpoint, {"requests": 0, "failures": 0})
+            item["requests"] += 1
+            item["failures"] += 1
+            if latency is not None:
+                item["latency"] = self._ewma(item.get("latency"), latency)
+            item["failure_rate"] = self._ewma(item.get("failure_rate"), 1.0)
+            item["last_seen"] = time.time()
+            self._schedule_save_locked()
+
+    def _raw_weight(self, item: Optional[Dict[str, Any]]) -> Optional[float]:
+        if not item or item.get("latency") is None:
+            return None
+        success = 1.0 - item.get("failure_rate", 0.0)
+        return (success * success) / max(0.05, item["latency"])
+
+    def weights(self, endpoints: Iterable[str]) -> Dict[str, float]:
+        """计算各图片源的选择权重（未观测过的图片源使用已知权重的最大值，鼓励探测）"""
+        endpoints = list(endpoints)
+        with self._lock:
+            raw = {e: self._raw_weight(self._scores.get(e)) for e in endpoints}
+        known = [w for w in raw.values() if w is not None]
+        best = max(known) if known else 1.0
+        floor = best * self.min_weight_ratio
+        return {e: max(floor, best if w is None else w) for e, w in raw.items()}
+
+    def choose(self, endpoints: Iterable[str]) -> str:
+        """按权重随机选择一个图片源"""
+        weights = self.weights(endpoints)
+        return random.choices(list(weights.keys()), weights=list(weights.values()), k=1)[0]
+
+    def order(self, endpoints: Iterable[str]) -> List[str]:
+        """按权重进行加权随机排序，作为首选与备用图片源的顺序"""
+        weights = self.weights(endpoints)
+        # Efraimidis-Spirakis 加权随机排列
+        keyed = [(random.random() ** (1.0 / w), e) for e, w in weights.items()]
+        return [e for _, e in sorted(keyed, reverse=True)]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """导出评分数据"""
+        with self._lock:
+            return {e: dict(item) for e, item in self._scores.items()}
+
+    def reset(self):
+        """清空评分数据"""
+        with self._lock:
+            self._scores = {}
+            self._save_locked()
+            self._dirty = False
+
+    def print_scores(self, endpoints: Optional[Iterable[str]] = None):
+        """打印评分表"""
+        snapshot = self.snapshot()
+        endpoints = list(endpoints) if endpoints is not None else list(snapshot.keys())
+        if not endpoints:
+            print("暂无图片源评分数据")
+            return
+        weights = self.weights(endpoints)
+        total = sum(weights.values()) or 1.0
+        print(f"{'图片源':<45} {'请求':>5} {'失败率':>7} {'延迟':>8} {'吞吐量':>11} {'选择概率':>8}")
+        for endpoint in sorted(endpoints, key=lambda e: -weights[e]):
+            item = snapshot.get(endpoint, {})
+            latency = item.get("latency")
+            throughput = item.get("throughput")
+            print(f"{endpoint:<45} {item.get('requests', 0):>5} "
+                  f"{item.get('failure_rate', 0.0):>7.1%} "
+                  f"{(f'{latency:.2f}s' if latency is not None else '-'):>8} "
+                  f"{(f'{throughput / 1024:.0f}KB/s' if throughput else '-'):>11} "
+                  f"{weights[endpoint] / total:>8.1%}")
+
+
+# 全局共享评分板
+_scoreboard: Optional[EndpointScoreboard] = None
+_scoreboard_lock = threading.Lock()
+
+
+def get_scoreboard() -> EndpointScoreboard:
+    """获取全局评分板（首次调用时从磁盘加载）"""
+    global _scoreboard
+    with _scoreboard_lock:
+        if _scoreboard is None:
+            _scoreboard = EndpointScoreboard()
+        return _scoreboard
+
+
+def main():
+    """命令行查看图片源评分: python endpoint_scoreboard.py [--json | --reset]"""
+    scoreboard = get_scoreboard()
+    args = sys.argv[1:]
+
+    if "--reset" in args:
+        scoreboard.reset()
+        print("图片源评分已清空")
+        return
+
+    if "--json" in args:
+        print(json.dumps(scoreboard.snapshot(), ensure_ascii=False, indent=2))
+        return
+
+    print("=== 图片源评分板 ===")
+    print(f"数据文件: {scoreboard.path}")
+    print()
+    try:
+        from myAPI import API_URLS
+        scoreboard.print_scores(API_URLS.values())
+    except ImportError:
+        scoreboard.print_scores()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面帧时间探针 - 在Tk主线程上以固定间隔调度回调，测量实际间隔
+主线程被解码、缩放等工作阻塞时，间隔会明显变长，据此统计界面卡顿
+"""
+
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Dict
+import logging
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("frameProbe")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("frameProbe")
+    logger.propagate = False
+
+
+class FrameTimeProbe:
+    """Tk主线程帧时间探针"""
+
+    def __init__(self, root, interval_ms: int = 16, stall_ms: float = 50.0, history: int = 1000):
+        """
+        Args:
+            root: Tk根窗口
+            interval_ms: 期望的调度间隔（毫秒）
+            stall_ms: 间隔超过该值视为一次卡顿（毫秒）
+            history: 参与分位数统计的最近间隔数
+        """
+        self.root = root
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self._gaps = deque(maxlen=history)
+        self._last = None
+        self._job = None
+        self._stalls = 0
+        self._worst = 0.0
+
+    def start(self):
+        if self._job is None:
+            self._last = time.perf_counter()
+            self._job = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def reset(self):
+        self._gaps.clear()
+        self._stalls = 0
+        self._worst = 0.0
+        self._last = time.perf_counter()
+
+    def _tick(self):
+        now = time.perf_counter()
+        gap = (now - self._last) * 1000
+        self._last = now
+        self._gaps.append(gap)
+        self._worst = max(self._worst, gap)
+        if gap >= self.stall_ms:
+            self._stalls += 1
+        self._job = self.root.after(self.interval_ms, self._tick)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取帧间隔统计（毫秒）"""
+        gaps = sorted(self._gaps)
+        if not gaps:
+            return {"frames": 0}
+
+        def percentile(p):
+            return round(gaps[min(len(gaps) - 1, int(len(gaps) * p))], 1)
+
+        return {
+            "frames": len(gaps),
+            "mean_ms": round(sum(gaps) / len(gaps), 1),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(self._worst, 1),
+            "stalls": self._stalls,
+        }
+
+
+def main():
+    """
+    对比预览在主线程解码与在后台线程解码时的界面卡顿: python frame_probe.py [图片路径]
+    需要图形界面环境
+    """
+    import tkinter as tk
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image, ImageTk
+    from thumbnail_cache import decode_preview
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"无法创建窗口（需要图形界面环境）: {e}")
+        return
+
+    image_path = sys.argv[1] if len(sys.argv) > 1 else None
+    generated = image_path is None
+    if generated:
+        import numpy as np
+        import tempfile
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+            image_path = tmp.name
+        noise = (np.random.default_rng(0).random((2160, 3840, 3)) * 255).astype("uint8")
+        Image.fromarray(noise).save(image_path, quality=90)
+
+    canvas = tk.Canvas(root, width=600, height=300)
+    canvas.pack()
+    probe = FrameTimeProbe(root)
+    executor = ThreadPoolExecutor(max_workers=1)
+    photos = []
+    rounds = 5
+
+    def show(image):
+        photos[:] = [ImageTk.PhotoImage(image)]
+        canvas.delete("all")
+        canvas.create_image(300, 150, image=photos[0])
+
+    def blocking(i=0):
+        # 旧方式：主线程上全分辨率解码 + LANCZOS 缩放
+        image = Image.open(image_path)
+        show(image.resize((533, 300), Image.Resampling.LANCZOS))
+        if i + 1 < rounds:
+            root.after(100, blocking, i + 1)
+        else:
+            root.after(300, finish_blocking)
+
+    def finish_blocking():
+        print(f"主线程解码: {probe.get_stats()}")
+        probe.reset()
+        background()
+
+    def background(i=0):
+        # 新方式：后台线程 draft 解码 + 缩放，主线程只创建 PhotoImage
+        def work():
+            image = decode_preview(image_path, (600, 300))
+            root.after(0, show, image)
+        executor.submit(work)
+        if i + 1 < rounds:
+            root.after(100, background, i + 1)
+        else:
+            root.after(800, finish_background)
+
+    def finish_background():
+        print(f"后台线程解码: {probe.get_stats()}")
+        executor.shutdown()
+        root.destroy()
+        if generated:
+            os.remove(image_path)
+
+    probe.start()
+    root.after(300, blocking)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+动态壁纸预览帧存储 - 在固定内存预算内保存按画布尺寸缩小后的预览帧
+- 帧在提取时就缩放到能放进预览画布的尺寸，写入一块预分配的 uint8 NumPy 数组，不再保存原分辨率帧
+- 预算装不下全部采样帧时自适应降低采样率：按计划帧数与容量之比隔帧保存；
+  实际帧数超出计划而存满时丢弃一半帧（保留偶数位置）并把采样间隔加倍，帧仍均匀覆盖整段视频
+"""
+
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("frameStore")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("frameStore")
+    logger.propagate = False
+
+
+DEFAULT_BUDGET = 96 * 1024 * 1024  # 预览帧占用的内存上限（字节）
+
+
+def fit_frame_size(frame_size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """按比例缩放到能放进 box 的尺寸（不放大）"""
+    width, height = frame_size
+    scale = min(1.0, box[0] / width, box[1] / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class FrameStore:
+    """预分配的预览帧缓冲，支持 len() 和下标访问"""
+
+    def __init__(self, box: Tuple[int, int], expected_frames: int, budget: int = DEFAULT_BUDGET):
+        """
+        Args:
+            box: 预览画布尺寸 (宽, 高)，帧缩放到能放进该区域
+            expected_frames: 计划采样的帧数，用于决定预分配的容量
+            budget: 帧数据的内存上限（字节）
+        """
+        self.box = box
+        self.expected_frames = max(1, expected_frames)
+        self.budget = budget
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self.capacity = 0
+        self.stride = 1          # 每收到 stride 个采样帧保存一个
+        self.generation = 0      # 每次丢弃一半帧时加一，缓存了帧内容的使用方据此失效
+        self.source_indices: List[int] = []   # 每个已保存帧在原视频中的帧序号
+        self._block: Optional[np.ndarray] = None
+        self._received = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.source_indices)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if not 0 <= index < len(self.source_indices):
+            raise IndexError(index)
+        return self._block[index]
+
+    def _allocate(self, frame_shape: Tuple[int, ...]):
+        height, width = frame_shape[:2]
+        self.frame_size = fit_frame_size((width, height), self.box)
+        frame_bytes = self.frame_size[0] * self.frame_size[1] * 3
+        self.capacity = max(2, min(self.expected_frames, self.budget // frame_bytes))
+        self._block = np.empty((self.capacity, self.frame_size[1], self.frame_size[0], 3), dtype=np.uint8)
+        # 已知装不下全部计划帧时直接按比例降低采样率，存满后的减半只作为计划帧数不准时的兜底
+        self.stride = -(-self.expected_frames // self.capacity)
+        logger.info(f"预览帧存储: {self.frame_size[0]}x{self.frame_size[1]} x {self.capacity} 帧, "
+                    f"{self._block.nbytes / 1024 / 1024:.1f}MB")
+
+    def add(self, frame: np.ndarray, source_index: int) -> bool:
+        """
+        缩放并保存一帧 RGB 图像
+
+        Args:
+            frame: 原分辨率 RGB 帧 (高, 宽, 3)
+            source_index: 该帧在原视频中的帧序号
+
+        Returns:
+            是否被保存（降低采样率后部分帧会被跳过）
+        """
+        import cv2
+
+        with self._lock:
+            if self._block is None:
+                self._allocate(frame.shape)
+            received = self._received
+            self._received += 1
+            if received % self.stride:
+                return False
+            if len(self.source_indices) >= self.capacity:
+                self._decimate_locked()
+                if received % self.stride:
+                    return False
+            slot = len(self.source_indices)
+
+        # 缩放在锁外进行，直接写入预分配的槽位
+        if (frame.shape[1], frame.shape[0]) == self.frame_size:
+            self._block[slot] = frame
+        else:
+            cv2.resize(frame, self.frame_size, dst=self._block[slot], interpolation=cv2.INTER_AREA)
+        with self._lock:
+            self.source_indices.append(source_index)
+        return True
+
+    def _decimate_locked(self):
+        """存满时丢弃一半帧并把采样率减半"""
+        kept = len(self.source_indices[::2])
+        self._block[:kept] = self._block[:len(self.source_indices):2]
+        self.source_indices = self.source_indices[::2]
+        self.stride *= 2
+        self.generation += 1
+        logger.info(f"预览帧已达内存预算，采样间隔调整为原来的 {self.stride} 倍")
+
+    @property
+    def nbytes(self) -> int:
+        """已分配的帧缓冲字节数"""
+        return self._block.nbytes if self._block is not None else 0
+
+    @property
+    def used_bytes(self) -> int:
+        """已保存帧占用的字节数"""
+        if self._block is None:
+            return 0
+        return len(self.source_indices) * self._block[0].nbytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "frames": len(self.source_indices),
+            "capacity": self.capacity,
+            "frame_size": self.frame_size,
+            "stride": self.stride,
+            "allocated_bytes": self.nbytes,
+            "used_bytes": self.used_bytes,
+            "budget": self.budget,
+        }
+
+
+def main():
+    """
+    对比保存原分辨率帧与画布尺寸帧存储的内存占用: python frame_store.py [宽x高] [帧数]
+    """
+    size = tuple(int(v) for v in sys.argv[1].lower().split("x")) if len(sys.argv) > 1 else (1920, 1080)
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    store = FrameStore((600, 300), count)
+    for i in range(count):
+        store.add(frame, i)
+    full = count * frame.nbytes
+    print(f"{count} 帧 {size[0]}x{size[1]} 原分辨率: {full / 1024 / 1024:.0f}MB")
+    print(f"帧存储: {store.nbytes / 1024 / 1024:.1f}MB, {store.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
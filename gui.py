@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
 import os
+from concurrent.futures import ThreadPoolExecutor
 import sys
 from PIL import Image, ImageTk
 import requests
@@ -34,13 +35,122 @@ except ImportError:
     DYNAMIC_API_AVAILABLE = False
     print("动态壁纸API模块未找到，相关功能将不可用")
 
+# 导入后台预取队列
+try:
+    from prefetch import PrefetchQueue
+    PREFETCH_AVAILABLE = True
+except ImportError:
+    PREFETCH_AVAILABLE = False
+
+# 导入多源对冲下载
+try:
+    from hedged_fetch import fetch_image_hedged
+    from myAPI import API_URLS
+    HEDGED_FETCH_AVAILABLE = True
+except ImportError:
+    HEDGED_FETCH_AVAILABLE = False
+
+# 导入运行指标汇总
+try:
+    from metrics import register_metrics_source, export_metrics
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
+# 导入共享HTTP连接池
+try:
+    from http_session import http_get
+except ImportError:
+    http_get = requests.get
+
+# 导入容错层（重试、熔断与整体截止时间）
+try:
+    from resilience import resilient_get, action_deadline
+except ImportError:
+    from contextlib import nullcontext
+    resilient_get = http_get
+
+    def action_deadline(seconds):
+        return nullcontext()
+
+# 导入断点续传下载器
+try:
+    from downloader import download_segmented
+except ImportError:
+    def download_segmented(url, save_path, timeout=60, progress_callback=None):
+        response = resilient_get(url, timeout=timeout, stream=True)
+        response.raise_for_status()
+        total_size = int(response.headers.get('content-length', 0))
+        downloaded_size = 0
+        with open(save_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+                    downloaded_size += len(chunk)
+                    if progress_callback:
+                        progress_callback(downloaded_size, total_size)
+        return True
+
+# 导入内容寻址壁纸库
+try:
+    from wallpaper_store import get_store
+    STORE_AVAILABLE = True
+except ImportError:
+    STORE_AVAILABLE = False
+
+# 导入媒体目录（SQLite）
+try:
+    from catalog import get_catalog
+    CATALOG_AVAILABLE = True
+except ImportError:
+    CATALOG_AVAILABLE = False
+
+# 导入缩略图缓存
+try:
+    from thumbnail_cache import get_thumbnail_cache
+    THUMBNAIL_CACHE_AVAILABLE = True
+except ImportError:
+    THUMBNAIL_CACHE_AVAILABLE = False
+
+# 导入界面帧时间探针
+try:
+    from frame_probe import FrameTimeProbe
+    FRAME_PROBE_AVAILABLE = True
+except ImportError:
+    FRAME_PROBE_AVAILABLE = False
+
+try:
+    from video_preview import ProgressivePreview
+    from frame_store import FrameStore
+    VIDEO_PREVIEW_AVAILABLE = True
+except ImportError:
+    VIDEO_PREVIEW_AVAILABLE = False
+
+try:
+    from playback_clock import PlaybackClock, frame_timeline, delay_ms
+    PLAYBACK_CLOCK_AVAILABLE = True
+except ImportError:
+    PLAYBACK_CLOCK_AVAILABLE = False
+
+try:
+    from display_fit import get_display_resolutions, set_display_resolutions, get_display_fit_cache
+    DISPLAY_FIT_AVAILABLE = True
+except ImportError:
+    DISPLAY_FIT_AVAILABLE = False
+
+# 每次用户操作的整体截止时间（秒）
+IMAGE_ACTION_DEADLINE = 45
+VIDEO_ACTION_DEADLINE = 300
+# 动态预览每次事件循环最多创建的 PhotoImage 数量
+PHOTO_BATCH = 8
+
 # 导入原有的功能模块
 try:
     from myAPI import (
         set_wallpaper, 
         download_and_set_wallpaper, 
         count_files_in_directory,
-        get_image_format_from_url,
+        fetch_image,
         get_random_image_api,
         clear_image
     )
@@ -63,7 +173,7 @@ except ImportError:
 
     def download_and_set_wallpaper(image_url, save_path):
         try:
-            response = requests.get(image_url, timeout=30)
+            response = http_get(image_url, timeout=30)
             if response.status_code != 200:
                 return False
                 
@@ -98,25 +208,28 @@ except ImportError:
             print(f"Error counting files: {e}")
             return 0
 
-    def get_image_format_from_url(image_url):
-        try:
-            response = requests.get(image_url, stream=True, timeout=10)
-            content_type = response.headers.get('Content-Type', '')
-            mime_type = content_type.split(';')[0].strip().lower()
-            
-            mime_to_extension = {
-                'image/jpeg': 'jpg',
-                'image/png': 'png',
-                'image/gif': 'gif',
-                'image/bmp': 'bmp',
-                'image/webp': 'webp',
-                'image/svg+xml': 'svg'
-            }
-            
-            return mime_to_extension.get(mime_type, 'jpg')
-        except Exception as e:
-            print(f"Error getting image format: {e}")
-            return 'jpg'
+    def fetch_image(image_url, save_path, timeout=30):
+        response = http_get(image_url, timeout=timeout)
+        response.raise_for_status()
+
+        content = response.content
+        if content.startswith(b'\x89PNG'):
+            extension = 'png'
+        elif content[:3] == b'GIF':
+            extension = 'gif'
+        elif content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+            extension = 'webp'
+        elif content.startswith(b'BM'):
+            extension = 'bmp'
+        else:
+            extension = 'jpg'
+
+        stem, ext = os.path.splitext(save_path)
+        final_path = f"{stem if ext else save_path}.{extension}"
+        os.makedirs(os.path.dirname(final_path) or '.', exist_ok=True)
+        with open(final_path, 'wb') as f:
+            f.write(content)
+        return final_path
 
     def get_random_image_api(api_type):
         api_urls = {
@@ -139,7 +252,7 @@ except ImportError:
             print(f"Error getting random image API: {e}")
         return ''
 
-    def clear_image(save_path):
+    def clear_image(save_path, preview_box=None):
         try:
             image = Image.open(save_path)
             from PIL import ImageEnhance
@@ -166,6 +279,47 @@ class ImageRandomGUI:
         # 初始化变量
         self.is_downloading = False
         self.current_image_path = None
+        self.prefetcher = PrefetchQueue() if PREFETCH_AVAILABLE else None
+        if METRICS_AVAILABLE and self.prefetcher is not None:
+            register_metrics_source("prefetch", self.prefetcher.get_stats)
+        if METRICS_AVAILABLE and STORE_AVAILABLE:
+            register_metrics_source("wallpaper_store", lambda: get_store().get_stats())
+        if METRICS_AVAILABLE and THUMBNAIL_CACHE_AVAILABLE:
+            register_metrics_source("thumbnail_cache", lambda: get_thumbnail_cache().get_stats())
+        if METRICS_AVAILABLE and VIDEO_PREVIEW_AVAILABLE:
+            register_metrics_source("video_preview", lambda: getattr(self, 'dynamic_preview_stats', {}))
+        if DISPLAY_FIT_AVAILABLE:
+            # 无法自动检测显示器分辨率时使用 Tk 报告的屏幕尺寸
+            if not get_display_resolutions():
+                set_display_resolutions([(self.root.winfo_screenwidth(), self.root.winfo_screenheight())])
+            if METRICS_AVAILABLE:
+                register_metrics_source("display_fit", lambda: get_display_fit_cache().get_stats())
+
+        # 预览图在后台线程解码，主线程只创建 PhotoImage
+        self.preview_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview")
+        self.preview_tokens = {}
+        # 各预览画布最近一次的尺寸，供后台处理图片时顺带生成预览
+        self.preview_sizes = {}
+        # 动态预览的显示图片缓存：帧序号 -> PhotoImage，帧存储、帧存储代数或画布尺寸变化时整体失效
+        self.dynamic_photo_cache = {}
+        self.dynamic_photo_frames = None
+        self.dynamic_photo_key = None
+        self.dynamic_photo_pending = False
+        self.dynamic_frame_items = None
+        self.dynamic_resize_pending = None
+        # 动态预览播放时钟及其对应的帧序列状态 (帧序列, 帧数, 代数)
+        self.dynamic_clock = None
+        self.dynamic_clock_frames = None
+        self.dynamic_clock_state = None
+        self.dynamic_play_pending = None
+        if METRICS_AVAILABLE and PLAYBACK_CLOCK_AVAILABLE:
+            register_metrics_source("video_playback",
+                                    lambda: self.dynamic_clock.get_stats() if self.dynamic_clock else {})
+        self.frame_probe = FrameTimeProbe(self.root) if FRAME_PROBE_AVAILABLE else None
+        if self.frame_probe is not None:
+            self.frame_probe.start()
+            if METRICS_AVAILABLE:
+                register_metrics_source("frame_time", self.frame_probe.get_stats)
         
         # 更新图片计数
         self.update_image_count()
@@ -305,6 +459,7 @@ class ImageRandomGUI:
         # 预览画布
         self.preview_canvas = tk.Canvas(preview_frame, bg='white', height=200)
         self.preview_canvas.pack(fill='both', expand=True, pady=5)
+        self.bind_preview_resize(self.preview_canvas, 'current_image_path', self.update_preview)
         
         # 默认显示文字
         self.preview_canvas.create_text(300, 100, text="点击获取图片查看预览", 
@@ -382,6 +537,8 @@ class ImageRandomGUI:
         # 预览画布
         self.yuanmeng_preview_canvas = tk.Canvas(preview_frame, bg='white', height=300)
         self.yuanmeng_preview_canvas.pack(fill='both', expand=True, pady=5)
+        self.bind_preview_resize(self.yuanmeng_preview_canvas, 'yuanmeng_current_image_path',
+                                 self.update_yuanmeng_preview)
         
         # 默认显示文字
         self.yuanmeng_preview_canvas.create_text(300, 150, text="点击获取壁纸查看预览", 
@@ -445,7 +602,7 @@ class ImageRandomGUI:
         def test_api():
             try:
                 self.update_status("正在测试API...")
-                response = requests.get(api_url, timeout=10)
+                response = http_get(api_url, timeout=10)
                 if response.status_code == 200:
                     self.update_status("API测试成功")
                     messagebox.showinfo("成功", "API测试成功！")
@@ -470,9 +627,9 @@ class ImageRandomGUI:
                 self.update_status("正在获取图片...")
 
                 # 确定API地址
-                if self.custom_api_var.get().strip():
-                    image_url = self.custom_api_var.get().strip()
-                else:
+                custom_url = self.custom_api_var.get().strip()
+                api_type = None
+                if not custom_url:
                     # 从选择的API名称中获取对应的API代码
                     selected_api_name = self.api_var.get()
                     api_type = None
@@ -486,38 +643,34 @@ class ImageRandomGUI:
                     if api_type is None:
                         # 如果没有找到匹配的，使用默认的api2
                         api_type = 'api2'
-                    
-                    image_url = get_random_image_api(api_type)
 
-                if not image_url:
-                    raise Exception("无法获取API地址")
+                def produce(save_stem):
+                    # 随机模式下对多个图片源发起对冲请求，最先返回的有效图片胜出
+                    if not custom_url and api_type == 'random' and HEDGED_FETCH_AVAILABLE:
+                        path, winner = fetch_image_hedged(API_URLS.values(), save_stem, timeout=30)
+                        clear_image(path, self.preview_sizes.get('current_photo', (400, 200)))
+                        return path, {"source_api": "random", "url": winner}
 
-                # 获取图片格式
-                img_type = get_image_format_from_url(image_url)
-                
-                # 确保images目录存在
-                if not os.path.exists('images'):
-                    os.makedirs('images')
+                    image_url = custom_url or get_random_image_api(api_type)
+                    if not image_url:
+                        raise Exception("无法获取API地址")
 
-                # 生成保存路径
-                img_num = count_files_in_directory('images')
-                save_path = f"images/temp_preview.{img_type}"
-                
-                # 下载图片
-                response = requests.get(image_url, timeout=30)
-                if response.status_code != 200:
-                    raise Exception(f"下载失败，状态码: {response.status_code}")
+                    # 单次请求下载图片，扩展名由实际内容确定
+                    path = fetch_image(image_url, save_stem, timeout=30)
 
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
+                    # 图片清晰化处理，同时用同一份解码结果生成预览
+                    clear_image(path, self.preview_sizes.get('current_photo', (400, 200)))
+                    return path, {"source_api": "custom" if custom_url else api_type, "url": image_url}
 
-                # 图片清晰化处理
-                clear_image(save_path)
+                # 优先从预取队列中获取
+                save_path, source_info, prefetched = self.take_prefetched(
+                    ('random', custom_url or api_type), produce, "images/temp_preview")
 
                 # 更新预览
                 self.current_image_path = save_path
+                self.current_image_source = source_info
                 self.root.after(0, self.update_preview, save_path)
-                self.root.after(0, self.update_status, "图片获取成功")
+                self.root.after(0, self.update_status, "图片获取成功（预取）" if prefetched else "图片获取成功")
                 self.root.after(0, self.enable_action_buttons)
 
             except Exception as e:
@@ -529,42 +682,145 @@ class ImageRandomGUI:
 
         threading.Thread(target=download_image, daemon=True).start()
 
-    def update_preview(self, image_path):
-        """更新图片预览"""
-        try:
-            # 打开图片
-            image = Image.open(image_path)
-            
-            # 获取画布尺寸
-            canvas_width = self.preview_canvas.winfo_width()
-            canvas_height = self.preview_canvas.winfo_height()
-            
-            if canvas_width <= 1 or canvas_height <= 1:
-                canvas_width, canvas_height = 400, 200
-
-            # 计算缩放比例
+    def take_prefetched(self, key, producer, temp_stem):
+        """从预取队列取出壁纸并移动到临时预览路径，未命中时直接生成
+
+        Returns:
+            (文件路径, 附加信息, 是否命中预取)
+        """
+        entry = self.prefetcher.get(key, producer) if self.prefetcher else None
+        if entry is None:
+            with action_deadline(IMAGE_ACTION_DEADLINE):
+                path, info = producer(temp_stem)
+            return path, info, False
+
+        path, info = entry
+        final_path = temp_stem + os.path.splitext(path)[1]
+        os.replace(path, final_path)
+        return final_path, info, True
+
+    def store_wallpaper(self, source, prefix, process=None, metadata=None):
+        """将壁纸保存到images目录，相同内容只保存一份
+
+        Args:
+            source: 临时图片路径（不会被修改）
+            prefix: 文件名前缀，如 wallpaper / anime_wallpaper
+            process: 保存前对图片做的原地处理，如 clear_image
+            metadata: 写入媒体目录的来源信息（source_api / category / url）
+
+        Returns:
+            (保存路径, 是否为新图片, 相似的已有图片路径或None)
+        """
+        if STORE_AVAILABLE:
+            store = get_store()
+            if process is None:
+                result = store.add_file(source, prefix, metadata=metadata)
+            else:
+                # 处理结果保持原图格式；已清晰化过的临时图片不会再次处理
+                result = store.add_processed(source, prefix, process, process.__name__, metadata=metadata)
+            return result.path, result.is_new, result.near_duplicate_of
+
+        import shutil
+        os.makedirs('images', exist_ok=True)
+        save_path = f"images/{prefix}_{count_files_in_directory('images') + 1}.jpg"
+        shutil.copy2(source, save_path)
+        if process is not None:
+            process(save_path)
+        return save_path, True, None
+
+    @staticmethod
+    def describe_stored(save_path, is_new, similar):
+        """描述壁纸的保存结果，发现相似的已有图片时告知用户"""
+        if similar and not is_new:
+            return f"与已有壁纸相似，未重复保存，使用: {save_path}"
+        if similar:
+            return f"已保存到: {save_path}\n（与已有壁纸相似: {similar}）"
+        return f"{'已保存到' if is_new else '图片已存在'}: {save_path}"
+
+    def load_preview_image(self, image_path, canvas_width, canvas_height):
+        """加载缩放到画布大小的预览图，优先使用缩略图缓存"""
+        if THUMBNAIL_CACHE_AVAILABLE:
+            return get_thumbnail_cache().get(image_path, (canvas_width, canvas_height))
+
+        with Image.open(image_path) as image:
+            if image.format == 'JPEG':
+                # 按DCT缩放解码，不做全分辨率解码
+                image.draft(None, (canvas_width, canvas_height))
             img_width, img_height = image.size
             scale = min(canvas_width / img_width, canvas_height / img_height)
-            
-            # 缩放图片
             new_width = int(img_width * scale)
             new_height = int(img_height * scale)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 转换为PhotoImage
+            return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    def bind_preview_resize(self, canvas, path_attr, render):
+        """画布尺寸变化后重新渲染当前预览（合并连续的缩放事件）"""
+        pending = [None]
+        last_size = [None]
+
+        def on_configure(event):
+            size = (event.width, event.height)
+            if size == last_size[0]:
+                return
+            last_size[0] = size
+            if pending[0] is not None:
+                self.root.after_cancel(pending[0])
+
+            def rerender():
+                pending[0] = None
+                image_path = getattr(self, path_attr, None)
+                if image_path and os.path.exists(image_path):
+                    render(image_path)
+
+            pending[0] = self.root.after(150, rerender)
+
+        canvas.bind('<Configure>', on_configure)
+
+    def render_preview_async(self, canvas, image_path, default_size, photo_attr, error_pos):
+        """在后台线程解码并缩放预览图，主线程只负责创建 PhotoImage 并绘制
+
+        Args:
+            canvas: 目标画布
+            image_path: 图片路径
+            default_size: 画布尚未布局时使用的尺寸
+            photo_attr: 保存 PhotoImage 引用的属性名
+            error_pos: 错误提示的位置
+        """
+        canvas_width = canvas.winfo_width()
+        canvas_height = canvas.winfo_height()
+        if canvas_width <= 1 or canvas_height <= 1:
+            canvas_width, canvas_height = default_size
+        self.preview_sizes[photo_attr] = (canvas_width, canvas_height)
+
+        # 同一画布只显示最新一次请求的结果
+        token = object()
+        self.preview_tokens[photo_attr] = token
+
+        def show(image, error):
+            if self.preview_tokens.get(photo_attr) is not token:
+                return
+            canvas.delete("all")
+            if error is not None:
+                canvas.create_text(*error_pos, text=f"预览失败: {str(error)}",
+                                   font=('Arial', 10), fill='red')
+                return
             photo = ImageTk.PhotoImage(image)
-            
-            # 清除画布并显示图片
-            self.preview_canvas.delete("all")
-            self.preview_canvas.create_image(canvas_width//2, canvas_height//2, image=photo, anchor='center')
-            
+            canvas.create_image(canvas_width//2, canvas_height//2, image=photo, anchor='center')
             # 保持引用
-            self.current_photo = photo
-            
-        except Exception as e:
-            self.preview_canvas.delete("all")
-            self.preview_canvas.create_text(200, 100, text=f"预览失败: {str(e)}", 
-                                          font=('Arial', 10), fill='red')
+            setattr(self, photo_attr, photo)
+
+        def decode():
+            try:
+                image = self.load_preview_image(image_path, canvas_width, canvas_height)
+                image.load()
+                self.root.after(0, show, image, None)
+            except Exception as e:
+                self.root.after(0, show, None, e)
+
+        self.preview_executor.submit(decode)
+
+    def update_preview(self, image_path):
+        """更新图片预览（在后台线程解码）"""
+        self.render_preview_async(self.preview_canvas, image_path, (400, 200), 'current_photo', (200, 100))
 
     def set_as_wallpaper(self):
         """设置为壁纸"""
@@ -576,20 +832,9 @@ class ImageRandomGUI:
             try:
                 self.update_status("正在保存并设置壁纸...")
                 
-                # 确保images目录存在
-                if not os.path.exists('images'):
-                    os.makedirs('images')
-                
-                # 生成保存路径
-                img_num = count_files_in_directory('images')
-                save_path = f"images/wallpaper_{img_num + 1}.jpg"
-                
-                # 复制临时文件到永久保存位置
-                import shutil
-                shutil.copy2(self.current_image_path, save_path)
-                
-                # 图片清晰化处理
-                clear_image(save_path)
+                # 清晰化处理后保存到images目录（同一张图片只处理和保存一次）
+                save_path, is_new, similar = self.store_wallpaper(self.current_image_path, "wallpaper", clear_image,
+                                                         getattr(self, 'current_image_source', None))
                 
                 # 设置为壁纸
                 success = set_wallpaper(save_path)
@@ -597,7 +842,8 @@ class ImageRandomGUI:
                 # 检查返回值
                 if success:
                     self.root.after(0, self.update_status, "壁纸设置成功")
-                    self.root.after(0, messagebox.showinfo, "成功", f"壁纸设置成功！\n已保存到: {save_path}")
+                    saved_text = self.describe_stored(save_path, is_new, similar)
+                    self.root.after(0, messagebox.showinfo, "成功", f"壁纸设置成功！\n{saved_text}")
                     self.root.after(0, self.update_image_count)
                 else:
                     self.root.after(0, self.update_status, "壁纸设置失败")
@@ -696,35 +942,25 @@ class ImageRandomGUI:
                             category = key
                             break
 
-                # 获取壁纸信息
-                result = self.yuanmeng_api.get_random_wallpaper(category, "json")
-                
-                if "error" in result:
-                    raise Exception(result["error"])
-
-                # 获取图片数据
-                img_result = self.yuanmeng_api.get_random_wallpaper(category, "jpg")
-                
-                if "error" in img_result:
-                    raise Exception(img_result["error"])
-
-                # 确保images目录存在
-                if not os.path.exists('images'):
-                    os.makedirs('images')
+                def produce(save_stem):
+                    # 获取壁纸信息并将对应图片流式写入磁盘（元数据与图片一致）
+                    img_result = self.yuanmeng_api.fetch_wallpaper(category, save_path=save_stem)
+                    
+                    if "error" in img_result:
+                        raise Exception(img_result["error"])
+                    return img_result["image_path"], img_result["info"]
 
-                # 生成临时保存路径
-                save_path = "images/temp_yuanmeng_preview.jpg"
-                
-                # 保存图片
-                with open(save_path, 'wb') as f:
-                    f.write(img_result["image_data"])
+                # 优先从预取队列中获取
+                save_path, result, prefetched = self.take_prefetched(
+                    ('yuanmeng', category), produce, "images/temp_yuanmeng_preview")
 
                 # 更新预览
                 self.yuanmeng_current_image_path = save_path
                 self.yuanmeng_current_wallpaper_info = result
+                self.yuanmeng_current_source = {"source_api": "yuanmeng", "category": category}
                 
                 self.root.after(0, self.update_yuanmeng_preview, save_path)
-                self.root.after(0, self.update_yuanmeng_status, "壁纸获取成功")
+                self.root.after(0, self.update_yuanmeng_status, "壁纸获取成功（预取）" if prefetched else "壁纸获取成功")
                 self.root.after(0, self.enable_yuanmeng_action_buttons)
 
             except Exception as e:
@@ -737,41 +973,8 @@ class ImageRandomGUI:
         threading.Thread(target=download_wallpaper, daemon=True).start()
 
     def update_yuanmeng_preview(self, image_path):
-        """更新远梦API图片预览"""
-        try:
-            # 打开图片
-            image = Image.open(image_path)
-            
-            # 获取画布尺寸
-            canvas_width = self.yuanmeng_preview_canvas.winfo_width()
-            canvas_height = self.yuanmeng_preview_canvas.winfo_height()
-            
-            if canvas_width <= 1 or canvas_height <= 1:
-                canvas_width, canvas_height = 400, 300
-
-            # 计算缩放比例
-            img_width, img_height = image.size
-            scale = min(canvas_width / img_width, canvas_height / img_height)
-            
-            # 缩放图片
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 转换为PhotoImage
-            photo = ImageTk.PhotoImage(image)
-            
-            # 清除画布并显示图片
-            self.yuanmeng_preview_canvas.delete("all")
-            self.yuanmeng_preview_canvas.create_image(canvas_width//2, canvas_height//2, image=photo, anchor='center')
-            
-            # 保持引用
-            self.yuanmeng_current_photo = photo
-            
-        except Exception as e:
-            self.yuanmeng_preview_canvas.delete("all")
-            self.yuanmeng_preview_canvas.create_text(200, 150, text=f"预览失败: {str(e)}", 
-                                                   font=('Arial', 10), fill='red')
+        """更新远梦API图片预览（在后台线程解码）"""
+        self.render_preview_async(self.yuanmeng_preview_canvas, image_path, (400, 300), 'yuanmeng_current_photo', (200, 150))
 
     def set_yuanmeng_as_wallpaper(self):
         """设置远梦API壁纸为桌面壁纸"""
@@ -783,20 +986,9 @@ class ImageRandomGUI:
             try:
                 self.update_yuanmeng_status("正在保存并设置壁纸...")
                 
-                # 确保images目录存在
-                if not os.path.exists('images'):
-                    os.makedirs('images')
-                
-                # 生成保存路径
-                img_num = count_files_in_directory('images')
-                save_path = f"images/yuanmeng_wallpaper_{img_num + 1}.jpg"
-                
-                # 复制临时文件到永久保存位置
-                import shutil
-                shutil.copy2(self.yuanmeng_current_image_path, save_path)
-                
-                # 图片清晰化处理
-                clear_image(save_path)
+                # 清晰化处理后保存到images目录（同一张图片只处理和保存一次）
+                save_path, is_new, similar = self.store_wallpaper(self.yuanmeng_current_image_path, "yuanmeng_wallpaper",
+                                                         clear_image, getattr(self, 'yuanmeng_current_source', None))
                 
                 # 设置为壁纸
                 success = set_wallpaper(save_path)
@@ -804,7 +996,8 @@ class ImageRandomGUI:
                 # 检查返回值
                 if success:
                     self.root.after(0, self.update_yuanmeng_status, "壁纸设置成功")
-                    self.root.after(0, messagebox.showinfo, "成功", f"壁纸设置成功！\n已保存到: {save_path}")
+                    saved_text = self.describe_stored(save_path, is_new, similar)
+                    self.root.after(0, messagebox.showinfo, "成功", f"壁纸设置成功！\n{saved_text}")
                     self.root.after(0, self.update_yuanmeng_image_count)
                 else:
                     self.root.after(0, self.update_yuanmeng_status, "壁纸设置失败")
@@ -848,14 +1041,11 @@ class ImageRandomGUI:
         else:
             # 如果用户取消保存，可以选择自动保存到images文件夹
             try:
-                # 生成保存路径
-                img_num = count_files_in_directory('images')
-                auto_save_path = f"images/yuanmeng_wallpaper_{img_num + 1}.jpg"
-                
-                import shutil
-                shutil.copy2(self.yuanmeng_current_image_path, auto_save_path)
-                self.update_yuanmeng_status("壁纸已自动保存")
-                messagebox.showinfo("成功", f"壁纸已自动保存到: {auto_save_path}")
+                # 保存到images目录（相同内容只保存一份）
+                auto_save_path, is_new, similar = self.store_wallpaper(self.yuanmeng_current_image_path, "yuanmeng_wallpaper",
+                                                              metadata=getattr(self, 'yuanmeng_current_source', None))
+                self.update_yuanmeng_status("壁纸已自动保存" if is_new else "壁纸已存在，无需重复保存")
+                messagebox.showinfo("成功", f"壁纸已自动保存。\n{self.describe_stored(auto_save_path, is_new, similar)}")
                 self.update_yuanmeng_image_count()
             except Exception as e:
                 self.update_yuanmeng_status(f"自动保存失败: {str(e)}")
@@ -925,6 +1115,8 @@ class ImageRandomGUI:
         # 预览画布
         self.anime_preview_canvas = tk.Canvas(preview_frame, bg='white', height=300)
         self.anime_preview_canvas.pack(fill='both', expand=True, pady=5)
+        self.bind_preview_resize(self.anime_preview_canvas, 'anime_current_image_path',
+                                 self.update_anime_preview)
         
         # 默认显示文字
         self.anime_preview_canvas.create_text(300, 150, text="点击获取动漫壁纸查看预览", 
@@ -988,6 +1180,7 @@ class ImageRandomGUI:
         # 预览画布
         self.dynamic_preview_canvas = tk.Canvas(preview_frame, bg='white', height=300)
         self.dynamic_preview_canvas.pack(fill='both', expand=True, pady=5)
+        self.dynamic_preview_canvas.bind('<Configure>', self.on_dynamic_canvas_configure)
         
         # 视频控制按钮框架
         video_control_frame = ttk.Frame(preview_frame)
@@ -1181,7 +1374,22 @@ class ImageRandomGUI:
                 if os.path.exists(self.dynamic_current_preview_path) and 'temp_dynamic_preview' in self.dynamic_current_preview_path:
                     os.remove(self.dynamic_current_preview_path)
             
-            # 清理临时视频文件
+            # 导出本次运行的指标
+            if METRICS_AVAILABLE:
+                export_metrics()
+            
+            # 停止后台预取并清理预取缓存
+            if getattr(self, 'prefetcher', None) is not None:
+                self.prefetcher.shutdown(clear=True)
+            
+            # 停止预览解码线程与帧时间探针
+            if getattr(self, 'preview_executor', None) is not None:
+                self.preview_executor.shutdown(wait=False)
+            if getattr(self, 'frame_probe', None) is not None:
+                self.frame_probe.stop()
+            
+            # 停止渐进式预览，再清理临时视频文件
+            self.dynamic_preview_token = None
             temp_video_path = "videos/temp_dynamic_preview.mp4"
             if os.path.exists(temp_video_path):
                 os.remove(temp_video_path)
@@ -1194,6 +1402,8 @@ class ImageRandomGUI:
             # 清理视频帧数据
             if hasattr(self, 'dynamic_video_frames'):
                 delattr(self, 'dynamic_video_frames')
+            self.dynamic_photo_cache = {}
+            self.dynamic_photo_frames = None
             if hasattr(self, 'dynamic_video_info'):
                 delattr(self, 'dynamic_video_info')
             if hasattr(self, 'dynamic_is_playing'):
@@ -1220,45 +1430,38 @@ class ImageRandomGUI:
                     except:
                         pass
 
-                # 获取壁纸信息
-                result = self.anime_api.get_wallpaper_info_only()
-                
-                if "error" in result:
-                    raise Exception(result["error"])
-
-                # 检查图片状态
-                if result.get("Image_status") != "ok":
-                    raise Exception(f"图片状态异常: {result.get('Image_status')}")
+                def produce(save_stem):
+                    # 获取壁纸信息
+                    result = self.anime_api.get_wallpaper_info_only()
+                    
+                    if "error" in result:
+                        raise Exception(result["error"])
 
-                image_url = result.get("image_links")
-                if not image_url:
-                    raise Exception("未获取到图片链接")
+                    # 检查图片状态
+                    if result.get("Image_status") != "ok":
+                        raise Exception(f"图片状态异常: {result.get('Image_status')}")
 
-                # 确保images目录存在
-                if not os.path.exists('images'):
-                    os.makedirs('images')
+                    image_url = result.get("image_links")
+                    if not image_url:
+                        raise Exception("未获取到图片链接")
 
-                # 生成临时保存路径
-                img_format = get_image_format_from_url(image_url)
-                save_path = f"images/temp_anime_preview.{img_format}"
-                
-                # 下载图片
-                response = requests.get(image_url, timeout=30)
-                if response.status_code != 200:
-                    raise Exception(f"下载失败，状态码: {response.status_code}")
+                    # 单次请求下载图片，扩展名由实际内容确定
+                    path = fetch_image(image_url, save_stem, timeout=30)
 
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
+                    # 图片清晰化处理，同时用同一份解码结果生成预览
+                    clear_image(path, self.preview_sizes.get('anime_current_photo', (400, 300)))
+                    return path, result
 
-                # 图片清晰化处理
-                clear_image(save_path)
+                # 优先从预取队列中获取
+                save_path, result, prefetched = self.take_prefetched(
+                    ('anime',), produce, "images/temp_anime_preview")
 
                 # 更新预览
                 self.anime_current_image_path = save_path
                 self.anime_current_wallpaper_info = result
                 
                 self.root.after(0, self.update_anime_preview, save_path)
-                self.root.after(0, self.update_anime_status, "动漫壁纸获取成功")
+                self.root.after(0, self.update_anime_status, "动漫壁纸获取成功（预取）" if prefetched else "动漫壁纸获取成功")
                 self.root.after(0, self.enable_anime_action_buttons)
 
             except Exception as e:
@@ -1271,41 +1474,8 @@ class ImageRandomGUI:
         threading.Thread(target=download_wallpaper, daemon=True).start()
 
     def update_anime_preview(self, image_path):
-        """更新动漫壁纸预览"""
-        try:
-            # 打开图片
-            image = Image.open(image_path)
-            
-            # 获取画布尺寸
-            canvas_width = self.anime_preview_canvas.winfo_width()
-            canvas_height = self.anime_preview_canvas.winfo_height()
-            
-            if canvas_width <= 1 or canvas_height <= 1:
-                canvas_width, canvas_height = 400, 300
-
-            # 计算缩放比例
-            img_width, img_height = image.size
-            scale = min(canvas_width / img_width, canvas_height / img_height)
-            
-            # 缩放图片
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 转换为PhotoImage
-            photo = ImageTk.PhotoImage(image)
-            
-            # 清除画布并显示图片
-            self.anime_preview_canvas.delete("all")
-            self.anime_preview_canvas.create_image(canvas_width//2, canvas_height//2, image=photo, anchor='center')
-            
-            # 保持引用
-            self.anime_current_photo = photo
-            
-        except Exception as e:
-            self.anime_preview_canvas.delete("all")
-            self.anime_preview_canvas.create_text(200, 150, text=f"预览失败: {str(e)}", 
-                                               font=('Arial', 10), fill='red')
+        """更新动漫壁纸预览（在后台线程解码）"""
+        self.render_preview_async(self.anime_preview_canvas, image_path, (400, 300), 'anime_current_photo', (200, 150))
 
     def set_anime_as_wallpaper(self):
         """设置动漫壁纸为桌面壁纸"""
@@ -1317,20 +1487,9 @@ class ImageRandomGUI:
             try:
                 self.update_anime_status("正在保存并设置壁纸...")
                 
-                # 确保images目录存在
-                if not os.path.exists('images'):
-                    os.makedirs('images')
-                
-                # 生成保存路径
-                img_num = count_files_in_directory('images')
-                save_path = f"images/anime_wallpaper_{img_num + 1}.jpg"
-                
-                # 复制临时文件到永久保存位置
-                import shutil
-                shutil.copy2(self.anime_current_image_path, save_path)
-                
-                # 图片清晰化处理
-                clear_image(save_path)
+                # 清晰化处理后保存到images目录（同一张图片只处理和保存一次）
+                save_path, is_new, similar = self.store_wallpaper(self.anime_current_image_path, "anime_wallpaper",
+                                                         clear_image, self.anime_source_metadata())
                 
                 # 设置为壁纸
                 success = set_wallpaper(save_path)
@@ -1338,7 +1497,8 @@ class ImageRandomGUI:
                 # 检查返回值
                 if success:
                     self.root.after(0, self.update_anime_status, "壁纸设置成功")
-                    self.root.after(0, messagebox.showinfo, "成功", f"动漫壁纸设置成功！\n已保存到: {save_path}")
+                    saved_text = self.describe_stored(save_path, is_new, similar)
+                    self.root.after(0, messagebox.showinfo, "成功", f"动漫壁纸设置成功！\n{saved_text}")
                     self.root.after(0, self.update_anime_image_count)
                 else:
                     self.root.after(0, self.update_anime_status, "壁纸设置失败")
@@ -1382,19 +1542,21 @@ class ImageRandomGUI:
         else:
             # 如果用户取消保存，可以选择自动保存到images文件夹
             try:
-                # 生成保存路径
-                img_num = count_files_in_directory('images')
-                auto_save_path = f"images/anime_wallpaper_{img_num + 1}.jpg"
-                
-                import shutil
-                shutil.copy2(self.anime_current_image_path, auto_save_path)
-                self.update_anime_status("壁纸已自动保存")
-                messagebox.showinfo("成功", f"动漫壁纸已自动保存到: {auto_save_path}")
+                # 保存到images目录（相同内容只保存一份）
+                auto_save_path, is_new, similar = self.store_wallpaper(self.anime_current_image_path, "anime_wallpaper",
+                                                              metadata=self.anime_source_metadata())
+                self.update_anime_status("壁纸已自动保存" if is_new else "壁纸已存在，无需重复保存")
+                messagebox.showinfo("成功", f"动漫壁纸已自动保存。\n{self.describe_stored(auto_save_path, is_new, similar)}")
                 self.update_anime_image_count()
             except Exception as e:
                 self.update_anime_status(f"自动保存失败: {str(e)}")
                 messagebox.showerror("错误", f"自动保存动漫壁纸失败: {str(e)}")
 
+    def anime_source_metadata(self):
+        """当前动漫壁纸的来源信息"""
+        info = getattr(self, 'anime_current_wallpaper_info', None) or {}
+        return {"source_api": "anime", "url": info.get("image_links")}
+
     def enable_anime_action_buttons(self):
         """启用动漫壁纸操作按钮"""
         self.anime_set_btn.config(state='normal')
@@ -1421,27 +1583,29 @@ class ImageRandomGUI:
                 self.dynamic_get_btn.config(state='disabled')
                 self.update_dynamic_status("正在获取动态壁纸信息...")
 
-                # 获取动态壁纸信息
-                result = self.dynamic_api.get_wallpaper_info_only()
+                # 获取信息与生成预览共享同一个截止时间
+                with action_deadline(VIDEO_ACTION_DEADLINE):
+                    # 获取动态壁纸信息
+                    result = self.dynamic_api.get_wallpaper_info_only()
                 
-                if "error" in result:
-                    raise Exception(result["error"])
+                    if "error" in result:
+                        raise Exception(result["error"])
 
-                # 检查请求状态
-                if not result.get("success", False):
-                    raise Exception(f"API返回失败: {result.get('message', '未知错误')}")
+                    # 检查请求状态
+                    if not result.get("success", False):
+                        raise Exception(f"API返回失败: {result.get('message', '未知错误')}")
 
-                video_url = result.get("video_url")
-                if not video_url:
-                    raise Exception("未获取到视频链接")
+                    video_url = result.get("video_url")
+                    if not video_url:
+                        raise Exception("未获取到视频链接")
 
-                # 更新信息显示
-                self.dynamic_current_wallpaper_info = result
-                self.dynamic_current_video_url = video_url
+                    # 更新信息显示
+                    self.dynamic_current_wallpaper_info = result
+                    self.dynamic_current_video_url = video_url
                 
-                # 生成视频预览
-                self.root.after(0, self.update_dynamic_status, "正在生成视频预览...")
-                preview_success = self.generate_video_preview(video_url)
+                    # 生成视频预览
+                    self.root.after(0, self.update_dynamic_status, "正在生成视频预览...")
+                    preview_success = self.generate_video_preview(video_url)
                 
                 if preview_success:
                     self.root.after(0, self.update_dynamic_status, "动态壁纸信息获取成功")
@@ -1471,18 +1635,17 @@ class ImageRandomGUI:
             # 生成临时视频文件路径
             temp_video_path = "videos/temp_dynamic_preview.mp4"
             
-            # 先清理之前的临时文件
+            # 停止上一次仍在进行的渐进式预览，再清理之前的临时文件
+            self.dynamic_preview_token = None
             if os.path.exists(temp_video_path):
                 os.remove(temp_video_path)
+
+            if VIDEO_PREVIEW_AVAILABLE:
+                return self.generate_video_preview_progressive(video_url, temp_video_path)
             
-            # 下载完整的视频文件
-            response = requests.get(video_url, timeout=60, stream=True)
-            response.raise_for_status()
-            
-            with open(temp_video_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # 下载完整的视频文件（多连接分段下载，支持断点续传）
+            if not download_segmented(video_url, temp_video_path, timeout=60):
+                return False
             
             # 检查文件是否下载成功
             if not os.path.exists(temp_video_path) or os.path.getsize(temp_video_path) == 0:
@@ -1525,6 +1688,7 @@ class ImageRandomGUI:
                 else:  # 更长的视频，每秒提取10帧
                     frame_interval = max(1, int(fps / 10))
                     max_frames = min(150, frame_count)  # 最多150帧
+                self.dynamic_video_info['frame_interval'] = frame_interval
                 
                 for i in range(max_frames):
                     cap.set(cv2.CAP_PROP_POS_FRAMES, i * frame_interval)
@@ -1568,6 +1732,131 @@ class ImageRandomGUI:
             print(f"下载视频预览失败: {e}")
             return False
 
+    def generate_video_preview_progressive(self, video_url, temp_video_path):
+        """边下载边提取预览帧，首帧到达即显示，后续帧陆续加入播放列表"""
+        try:
+            import cv2  # noqa: F401
+        except ImportError:
+            self.root.after(0, self.show_opencv_warning)
+            return False
+
+        # 新的预览开始或程序退出时令牌失效，下载和解码随之停止
+        token = object()
+        self.dynamic_preview_token = token
+        self.dynamic_video_frames = []
+        self.dynamic_current_frame = 0
+        self.dynamic_is_playing = False
+        # 帧在提取时即缩放到画布尺寸，存入固定内存预算的帧存储
+        box = self.preview_sizes.get('dynamic_current_photo', (600, 300))
+        store = [None]
+
+        def on_info(info):
+            self.dynamic_video_info = info
+            store[0] = FrameStore(box, len(info['sample_frames']))
+            self.dynamic_video_frames = store[0]
+
+        def on_frame(index, frame):
+            store[0].add(frame, self.dynamic_video_info['sample_frames'][index])
+            if index == 0:
+                stats = preview.stats
+                self.root.after(0, self.show_video_frame, 0)
+                self.root.after(0, self.enable_video_controls)
+                self.root.after(0, self.reset_video_controls)
+                self.root.after(0, self.update_dynamic_status,
+                                f"首帧 {stats['time_to_first_frame']:.2f}s"
+                                f"（已下载 {stats['first_frame_bytes'] / 1024:.0f}KB），继续加载预览...")
+
+        preview = ProgressivePreview(video_url, temp_video_path, on_frame, on_info, timeout=60,
+                                     should_stop=lambda: self.dynamic_preview_token is not token)
+        try:
+            success = preview.run()
+        except Exception as e:
+            print(f"生成视频预览失败: {e}")
+            return False
+        self.dynamic_preview_stats = dict(preview.stats)
+        if store[0] is not None:
+            self.dynamic_preview_stats['frame_store'] = store[0].get_stats()
+        return success
+
+    def on_dynamic_canvas_configure(self, event):
+        """记录动态预览画布尺寸（下一次提取的预览帧按该尺寸缩放），并让已缓存的显示图片失效"""
+        if event.width <= 1 or event.height <= 1:
+            return
+        if self.preview_sizes.get('dynamic_current_photo') == (event.width, event.height):
+            return
+        self.preview_sizes['dynamic_current_photo'] = (event.width, event.height)
+        self.dynamic_photo_key = None
+        self.dynamic_photo_cache = {}
+        if self.dynamic_resize_pending is not None:
+            self.root.after_cancel(self.dynamic_resize_pending)
+
+        def rerender():
+            # 播放中下一次刷新会自动按新尺寸重建，暂停时重绘当前帧
+            self.dynamic_resize_pending = None
+            if getattr(self, 'dynamic_video_frames', None) and not getattr(self, 'dynamic_is_playing', False):
+                self.show_video_frame(getattr(self, 'dynamic_current_frame', 0))
+
+        self.dynamic_resize_pending = self.root.after(150, rerender)
+
+    @staticmethod
+    def render_video_frame(frame, size):
+        """把一帧RGB数据缩放成能放进 size 的图片（可在后台线程调用）"""
+        from PIL import Image
+        image = Image.fromarray(frame)
+        scale = min(size[0] / image.width, size[1] / image.height)
+        target = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        if target != image.size:
+            image = image.resize(target, Image.Resampling.LANCZOS)
+        return image
+
+    def get_dynamic_frame_photo(self, frame_index, size):
+        """获取某一帧的显示图片，未缓存时当场生成一次，并在后台准备其余帧"""
+        frames = self.dynamic_video_frames
+        key = (getattr(frames, 'generation', 0), size)
+        if self.dynamic_photo_frames is not frames or self.dynamic_photo_key != key:
+            self.dynamic_photo_frames = frames
+            self.dynamic_photo_key = key
+            self.dynamic_photo_cache = {}
+        photo = self.dynamic_photo_cache.get(frame_index)
+        if photo is None:
+            photo = ImageTk.PhotoImage(self.render_video_frame(frames[frame_index], size))
+            self.dynamic_photo_cache[frame_index] = photo
+        if len(self.dynamic_photo_cache) < len(frames) and not self.dynamic_photo_pending:
+            self.prepare_dynamic_frames(frames, key)
+        return photo
+
+    def prepare_dynamic_frames(self, frames, key):
+        """在后台线程缩放尚未缓存的帧，主线程分批创建 PhotoImage"""
+        missing = [i for i in range(len(frames)) if i not in self.dynamic_photo_cache]
+        self.dynamic_photo_pending = True
+
+        def current():
+            return (self.dynamic_photo_frames is frames and self.dynamic_photo_key == key
+                    and getattr(frames, 'generation', 0) == key[0])
+
+        def install(images, done):
+            if current():
+                for index, image in images:
+                    if index not in self.dynamic_photo_cache:
+                        self.dynamic_photo_cache[index] = ImageTk.PhotoImage(image)
+            if done:
+                self.dynamic_photo_pending = False
+
+        def work():
+            batch = []
+            try:
+                for index in missing:
+                    if not current():
+                        break
+                    batch.append((index, self.render_video_frame(frames[index], key[1])))
+                    if len(batch) >= PHOTO_BATCH:
+                        self.root.after(0, install, batch, False)
+                        batch = []
+            finally:
+                self.root.after(0, install, batch, True)
+
+        self.preview_executor.submit(work)
+
     def show_opencv_warning(self):
         """显示OpenCV缺失警告"""
         self.dynamic_preview_canvas.delete("all")
@@ -1609,34 +1898,32 @@ class ImageRandomGUI:
             if canvas_width <= 1 or canvas_height <= 1:
                 canvas_width, canvas_height = 400, 300
             
-            # 获取帧数据
-            frame = self.dynamic_video_frames[frame_index]
-            
-            # 转换为PIL图像
-            from PIL import Image
-            pil_image = Image.fromarray(frame)
-            
-            # 计算缩放比例
-            img_width, img_height = pil_image.size
-            scale = min(canvas_width / img_width, canvas_height / img_height)
-            
-            # 缩放图片
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 转换为PhotoImage
-            photo = ImageTk.PhotoImage(pil_image)
-            
-            # 清除画布并显示图片
-            self.dynamic_preview_canvas.delete("all")
-            self.dynamic_preview_canvas.create_image(canvas_width//2, canvas_height//2, image=photo, anchor='center')
-            
+            # 播放时只切换缓存好的图片，不再逐帧缩放和创建 PhotoImage
+            photo = self.get_dynamic_frame_photo(frame_index, (canvas_width, canvas_height))
+
+            # 复用画布上的图片和文字项，只更新内容
+            canvas = self.dynamic_preview_canvas
+            items = self.dynamic_frame_items
+            if items is None or canvas.type(items[0]) != 'image':
+                canvas.delete("all")
+                items = (canvas.create_image(0, 0, anchor='center'),
+                         canvas.create_text(0, 0, font=('Arial', 10), fill='black'))
+                self.dynamic_frame_items = items
+            canvas.coords(items[0], canvas_width//2, canvas_height//2)
+            canvas.coords(items[1], canvas_width//2, canvas_height-20)
+            canvas.itemconfig(items[0], image=photo)
+
             # 添加帧信息
             frame_info = f"帧 {frame_index + 1}/{len(self.dynamic_video_frames)}"
-            self.dynamic_preview_canvas.create_text(canvas_width//2, canvas_height-20, 
-                                                   text=frame_info, 
-                                                   font=('Arial', 10), fill='black')
+            if VIDEO_PREVIEW_AVAILABLE and isinstance(self.dynamic_video_frames, FrameStore):
+                store = self.dynamic_video_frames
+                frame_info += (f"  ·  预览内存 {store.used_bytes / 1024 / 1024:.1f}MB"
+                               f" / {store.budget / 1024 / 1024:.0f}MB")
+            if getattr(self, 'dynamic_is_playing', False) and self.dynamic_clock is not None:
+                stats = self.dynamic_clock.get_stats()
+                frame_info += (f"  ·  {stats['achieved_fps']:.1f}/{stats['target_fps']:.1f}fps"
+                               f"  丢帧 {stats['dropped']}")
+            canvas.itemconfig(items[1], text=frame_info)
             
             # 保持引用
             self.dynamic_current_photo = photo
@@ -1666,39 +1953,68 @@ class ImageRandomGUI:
         if not hasattr(self, 'dynamic_video_frames') or not self.dynamic_video_frames:
             return
         
+        # 取消尚未执行的下一帧，避免快速切换时出现两个播放循环
+        if self.dynamic_play_pending is not None:
+            self.root.after_cancel(self.dynamic_play_pending)
+            self.dynamic_play_pending = None
+
         if hasattr(self, 'dynamic_is_playing') and self.dynamic_is_playing:
             # 暂停播放
             self.dynamic_is_playing = False
             self.video_play_btn.config(text="▶️ 播放")
         else:
-            # 开始播放
+            # 开始播放，从当前帧继续
             self.dynamic_is_playing = True
             self.video_play_btn.config(text="⏸️ 暂停")
+            if PLAYBACK_CLOCK_AVAILABLE:
+                self.sync_dynamic_clock()
+                self.dynamic_clock.start(getattr(self, 'dynamic_current_frame', 0))
             self.play_video_animation()
 
+    def sync_dynamic_clock(self):
+        """按当前的预览帧更新播放时间轴（渐进加载新增帧或帧存储抽稀后）"""
+        frames = self.dynamic_video_frames
+        state = (len(frames), getattr(frames, 'generation', 0))
+        if self.dynamic_clock is not None and self.dynamic_clock_frames is frames \
+                and self.dynamic_clock_state == state:
+            return
+        timestamps, duration = frame_timeline(frames, getattr(self, 'dynamic_video_info', None))
+        if self.dynamic_clock is None or self.dynamic_clock_frames is not frames:
+            self.dynamic_clock = PlaybackClock(timestamps, duration)
+        else:
+            self.dynamic_clock.set_timeline(timestamps, duration)
+        self.dynamic_clock_frames = frames
+        self.dynamic_clock_state = state
+
     def play_video_animation(self):
-        """播放视频动画"""
+        """播放视频动画：按原视频时间显示此刻应显示的帧，渲染跟不上时丢帧而不是放慢"""
+        self.dynamic_play_pending = None
         if not hasattr(self, 'dynamic_is_playing') or not self.dynamic_is_playing:
             return
         
         if not hasattr(self, 'dynamic_video_frames') or not self.dynamic_video_frames:
             return
         
-        # 显示当前帧
-        self.show_video_frame(self.dynamic_current_frame)
-        
-        # 移动到下一帧
-        self.dynamic_current_frame = (self.dynamic_current_frame + 1) % len(self.dynamic_video_frames)
-        
-        # 计算下一帧的延迟时间（约12fps，更流畅）
-        delay = int(1000 / 12)  # 约83ms
+        if not PLAYBACK_CLOCK_AVAILABLE:
+            # 没有播放时钟时按固定间隔（约12fps）逐帧播放
+            self.show_video_frame(self.dynamic_current_frame)
+            self.dynamic_current_frame = (self.dynamic_current_frame + 1) % len(self.dynamic_video_frames)
+            self.dynamic_play_pending = self.root.after(int(1000 / 12), self.play_video_animation)
+            return
+
+        self.sync_dynamic_clock()
+        self.show_video_frame(self.dynamic_clock.tick())
         
-        # 安排下一帧
-        self.root.after(delay, self.play_video_animation)
+        # 按渲染完成后的时刻计算到下一帧的等待时间，渲染耗时不会累积成漂移
+        self.dynamic_play_pending = self.root.after(delay_ms(self.dynamic_clock.next_delay()),
+                                                    self.play_video_animation)
 
     def stop_video_playback(self):
         """停止视频播放"""
         self.dynamic_is_playing = False
+        if self.dynamic_play_pending is not None:
+            self.root.after_cancel(self.dynamic_play_pending)
+            self.dynamic_play_pending = None
         self.video_play_btn.config(text="▶️ 播放")
         self.dynamic_current_frame = 0
         self.video_progress['value'] = 0
@@ -1726,31 +2042,33 @@ class ImageRandomGUI:
                 if not os.path.exists('videos'):
                     os.makedirs('videos')
                 
-                # 生成保存路径
-                video_num = self.count_video_files_in_directory('videos')
-                save_path = f"videos/dynamic_wallpaper_{video_num + 1}.mp4"
-                
-                # 下载视频
-                response = requests.get(video_url, timeout=60, stream=True)
-                response.raise_for_status()
-                
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded_size = 0
+                # 生成保存路径（按视频URL预留，中断后再次下载得到同一路径，可从 .part 续传）
+                if CATALOG_AVAILABLE:
+                    save_path = get_catalog().allocate_path('videos', 'dynamic_wallpaper', 'mp4', key=video_url)
+                else:
+                    video_num = self.count_video_files_in_directory('videos')
+                    save_path = f"videos/dynamic_wallpaper_{video_num + 1}.mp4"
                 
-                with open(save_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
-                            
-                            # 更新进度（如果有总大小信息）
-                            if total_size > 0:
-                                progress = (downloaded_size / total_size) * 100
-                                self.root.after(0, self.update_dynamic_status, 
-                                              f"正在下载动态壁纸视频... {progress:.1f}%")
+                last_progress = [-1.0]
+
+                def report_progress(downloaded_size, total_size):
+                    # 更新进度（如果有总大小信息），每变化0.5%刷新一次
+                    if total_size > 0:
+                        progress = (downloaded_size / total_size) * 100
+                        if progress - last_progress[0] >= 0.5 or downloaded_size == total_size:
+                            last_progress[0] = progress
+                            self.root.after(0, self.update_dynamic_status, 
+                                          f"正在下载动态壁纸视频... {progress:.1f}%")
+
+                # 下载视频（中断后再次点击会从 .part 文件续传）
+                with action_deadline(VIDEO_ACTION_DEADLINE):
+                    success = download_segmented(video_url, save_path, timeout=60,
+                                                 progress_callback=report_progress)
                 
                 # 检查下载是否成功
-                if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+                if success and os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+                    if CATALOG_AVAILABLE:
+                        get_catalog().add(save_path, kind="video", source_api="dynamic", url=video_url)
                     self.root.after(0, self.update_dynamic_status, "动态壁纸视频下载成功")
                     self.root.after(0, messagebox.showinfo, "成功", f"动态壁纸视频下载成功！\n已保存到: {save_path}")
                     self.root.after(0, self.update_dynamic_video_count)
@@ -1779,6 +2097,8 @@ class ImageRandomGUI:
         try:
             if not os.path.exists(directory_path):
                 return 0
+            if CATALOG_AVAILABLE:
+                return get_catalog().count(directory_path, "video")
                 
             file_count = 0
             for item in os.listdir(directory_path):
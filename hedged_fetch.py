@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对冲请求 - "随机"模式下同时/延迟向多个图片源发起请求
+最先返回有效图片的请求胜出，其余请求被取消，只有胜出结果保留在磁盘上
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Iterable, Optional, Tuple
+import logging
+
+from resilience import resilient_get, current_deadline, CircuitOpenError
+from endpoint_scoreboard import get_scoreboard
+from image_ingest import stream_response_to_file, resolve_image_path, IngestCancelled
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("hedgedFetch")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("hedgedFetch")
+    logger.propagate = False
+
+
+class HedgedFetcher:
+    """多源对冲下载器"""
+
+    def __init__(self, initial_fanout: int = 1, max_parallel: int = 3,
+                 hedge_percentile: float = 0.9, default_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.3, max_hedge_delay: float = 10.0,
+                 history_size: int = 50):
+        """
+        Args:
+            initial_fanout: 一开始就同时发起的请求数
+            max_parallel: 最多同时进行的请求数（含对冲请求）
+            hedge_percentile: 以历史延迟的该分位数作为对冲阈值
+            default_hedge_delay: 没有历史数据时的对冲阈值（秒）
+            min_hedge_delay: 对冲阈值下限（秒）
+            max_hedge_delay: 对冲阈值上限（秒）
+            history_size: 参与分位数计算的最近成功请求数
+        """
+        self.initial_fanout = max(1, initial_fanout)
+        self.max_parallel = max(self.initial_fanout, max_parallel)
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self._latencies = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self.stats = {"races": 0, "hedges": 0, "failures": 0}
+
+    def hedge_delay(self) -> float:
+        """根据观测到的延迟分位数计算对冲阈值"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 5:
+            return self.default_hedge_delay
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, samples[index]))
+
+    def record_latency(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _attempt(self, url: str, temp_path: str, timeout: float, cancel: threading.Event,
+                 results: queue.Queue):
+        start = time.perf_counter()
+        try:
+            # 对冲本身负责故障切换，这里不再重试，但仍受熔断器保护
+            response = resilient_get(url, retry=False, timeout=timeout, stream=True)
+            try:
+                response.raise_for_status()
+            except Exception:
+                response.close()
+                raise
+            # 每个请求流式写入各自的临时文件，被取消时临时文件会被删除
+            result = stream_response_to_file(response, temp_path, require_image=True,
+                                             should_stop=cancel.is_set)
+            elapsed = time.perf_counter() - start
+            get_scoreboard().record_success(url, elapsed, result.size)
+            results.put(("ok", url, (result, elapsed)))
+        except IngestCancelled:
+            results.put(("cancelled", url, None))
+        except Exception as e:
+            # 熔断器直接拒绝的请求没有真正发出，不计入评分板
+            if not cancel.is_set() and not isinstance(e, CircuitOpenError):
+                get_scoreboard().record_failure(url, time.perf_counter() - start)
+            results.put(("error", url, e))
+
+    @staticmethod
+    def _discard_losers(results: queue.Queue, pending: int):
+        """等待其余请求结束，删除在胜出者确定后才完成的下载"""
+        for _ in range(pending):
+            status, _, payload = results.get()
+            if status == "ok":
+                try:
+                    os.remove(payload[0].path)
+                except OSError:
+                    pass
+
+    def fetch(self, urls: Iterable[str], save_path: str, timeout: float = 30) -> Tuple[str, str]:
+        """
+        对多个图片源发起对冲请求，保存最先返回的有效图片
+
+        Args:
+            urls: 候选图片源地址
+            save_path: 保存路径（扩展名按实际格式确定）
+            timeout: 整体超时时间（秒），不超过当前操作剩余的截止时间
+
+        Returns:
+            (实际保存路径, 胜出的图片源地址)
+        """
+        # 按评分板权重排序，表现好的图片源优先，其余作为对冲/备用
+        candidates = get_scoreboard().order(urls)
+        if not candidates:
+            raise ValueError("没有可用的图片源")
+
+        action = current_deadline()
+        if action is not None:
+            timeout = max(0.0, min(timeout, action.remaining()))
+
+        cancel = threading.Event()
+        results: queue.Queue = queue.Queue()
+        deadline = time.monotonic() + timeout
+        delay = self.hedge_delay()
+        pending = 0
+        launched = 0
+        last_error: Optional[Exception] = None
+
+        def launch(is_hedge: bool = False):
+            nonlocal pending, launched
+            url = candidates.pop(0)
+            pending += 1
+            launched += 1
+            temp_path = f"{save_path}.race-{launched}"
+            if is_hedge:
+                with self._lock:
+                    self.stats["hedges"] += 1
+                logger.info(f"超过对冲阈值 {delay:.2f}s，发起对冲请求: {url}")
+            else:
+                logger.info(f"发起请求: {url}")
+            threading.Thread(target=self._attempt, args=(url, temp_path, timeout, cancel, results),
+                             daemon=True).start()
+
+        with self._lock:
+            self.stats["races"] += 1
+        for _ in range(min(self.initial_fanout, len(candidates))):
+            launch()
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = candidates and pending < self.max_parallel
+            try:
+                status, url, payload = results.get(timeout=min(delay, remaining) if can_hedge else remaining)
+            except queue.Empty:
+                if can_hedge:
+                    launch(is_hedge=True)
+                continue
+
+            pending -= 1
+            if status == "ok":
+                cancel.set()
+                result, elapsed = payload
+                self.record_latency(elapsed)
+                logger.info(f"图片源胜出: {url} ({elapsed:.2f}s)，取消其余 {pending} 个请求")
+                if pending:
+                    threading.Thread(target=self._discard_losers, args=(results, pending),
+                                     daemon=True).start()
+                final_path = resolve_image_path(save_path, result.extension)
+                os.replace(result.path, final_path)
+                return final_path, url
+
+            if status == "error":
+                last_error = payload
+                logger.error(f"图片源请求失败: {url}: {payload}")
+            # 失败时立即改用下一个图片源，无需等待对冲阈值
+            if candidates and pending < self.max_parallel:
+                launch()
+
+        cancel.set()
+        # 超时后仍在进行的请求可能晚些写完临时文件，同样交给后台清理
+        if pending:
+            threading.Thread(target=self._discard_losers, args=(results, pending),
+                             daemon=True).start()
+        with self._lock:
+            self.stats["failures"] += 1
+        raise Exception(f"所有图片源均获取失败: {last_error}" if last_error else "所有图片源均超时")
+
+
+# 全局共享的对冲下载器（保留延迟历史）
+_fetcher = HedgedFetcher()
+
+
+def fetch_image_hedged(urls: Iterable[str], save_path: str, timeout: float = 30) -> Tuple[str, str]:
+    """使用全局对冲下载器获取图片，返回(实际保存路径, 胜出的图片源地址)"""
+    return _fetcher.fetch(urls, save_path, timeout=timeout)
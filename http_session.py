@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享HTTP连接池 - 所有壁纸API共用的传输层
+按主机维护保持长连接的 requests.Session，避免每次请求重新进行TCP+TLS握手
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("httpSession")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("httpSession")
+    logger.propagate = False
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) RandomWallpaper/2.0",
+    "Connection": "keep-alive",
+}
+
+
+class SessionPool:
+    """按主机划分的 requests.Session 连接池"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 8):
+        """
+        Args:
+            pool_connections: 每个Session缓存的连接池数量
+            pool_maxsize: 每个连接池保持的最大连接数
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        """提取 scheme://host:port 作为连接池键"""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self, url: str) -> requests.Session:
+        """获取指定URL所属主机的Session（不存在则创建）"""
+        key = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session()
+                self._sessions[key] = session
+                self._stats[key] = {
+                    "requests": 0,
+                    "new_connections": 0,
+                    "reused_connections": 0,
+                    "errors": 0,
+                    "total_time": 0.0,
+                }
+                logger.info(f"创建连接池: {key} (pool_maxsize={self.pool_maxsize})")
+            return session
+
+    def _count_connections(self, key: str) -> int:
+        """统计该主机连接池中已建立的连接总数"""
+        session = self._sessions.get(key)
+        if session is None:
+            return 0
+        total = 0
+        for adapter in set(session.adapters.values()):
+            manager = getattr(adapter, "poolmanager", None)
+            if manager is None:
+                continue
+            for pool_key in list(manager.pools.keys()):
+                pool = manager.pools.get(pool_key)
+                total += getattr(pool, "num_connections", 0) if pool is not None else 0
+        return total
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        通过连接池发送请求
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            **kwargs: 透传给 requests.Session.request 的参数
+
+        Returns:
+            requests.Response
+        """
+        session = self.get_session(url)
+        key = self._host_key(url)
+        before = self._count_connections(key)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._stats[key]["requests"] += 1
+                self._stats[key]["errors"] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        after = self._count_connections(key)
+        with self._lock:
+            stats = self._stats[key]
+            stats["requests"] += 1
+            stats["total_time"] += elapsed
+            if after > before:
+                stats["new_connections"] += after - before
+            else:
+                stats["reused_connections"] += 1
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def configure(self, pool_connections: Optional[int] = None,
+                  pool_maxsize: Optional[int] = None):
+        """调整连接池大小，已创建的Session会被关闭并在下次请求时重建"""
+        with self._lock:
+            if pool_connections is not None:
+                self.pool_connections = pool_connections
+            if pool_maxsize is not None:
+                self.pool_maxsize = pool_maxsize
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        logger.info(f"连接池已重新配置: pool_connections={self.pool_connections}, "
+                    f"pool_maxsize={self.pool_maxsize}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取每个主机的连接复用统计"""
+        with self._lock:
+            result = {}
+            for key, stats in self._stats.items():
+                item = dict(stats)
+                item["reuse_rate"] = (stats["reused_connections"] / stats["requests"]
+                                      if stats["requests"] else 0.0)
+                item["avg_time"] = (stats["total_time"] / stats["requests"]
+                                    if stats["requests"] else 0.0)
+                result[key] = item
+            return result
+
+    def close(self):
+        """关闭所有Session"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# 全局共享连接池
+_pool = SessionPool()
+
+
+def get_pool() -> SessionPool:
+    """获取全局共享连接池"""
+    return _pool
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """通过全局连接池发送GET请求，参数与 requests.get 一致"""
+    return _pool.get(url, **kwargs)
+
+
+def http_head(url: str, **kwargs) -> requests.Response:
+    """通过全局连接池发送HEAD请求，参数与 requests.head 一致"""
+    return _pool.head(url, **kwargs)
+
+
+def configure_pool(pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None):
+    """配置全局连接池大小"""
+    _pool.configure(pool_connections, pool_maxsize)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取全局连接池的按主机复用统计"""
+    return _pool.get_stats()
+
+
+def print_pool_stats():
+    """打印连接复用统计"""
+    stats = get_pool_stats()
+    if not stats:
+        print("连接池暂无请求记录")
+        return
+    print("连接池统计:")
+    for host, item in stats.items():
+        print(f"  {host}: 请求 {item['requests']} 次, 新建连接 {item['new_connections']}, "
+              f"复用 {item['reused_connections']} ({item['reuse_rate']:.0%}), "
+              f"错误 {item['errors']}, 平均耗时 {item['avg_time'] * 1000:.0f}ms")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片流式入库 - 边下载边写入磁盘，同时计算SHA-256并根据文件头识别格式
+不再把整张图片缓存在内存中（response.content），大尺寸4K/8K壁纸的内存占用保持平稳
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+import logging
+
+import requests
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("imageIngest")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("imageIngest")
+    logger.propagate = False
+
+
+CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_BYTES = 50 * 1024 * 1024  # 单张图片的大小上限
+SNIFF_BYTES = 16
+
+# 常见图片MIME类型映射
+MIME_TO_EXTENSION = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/bmp': 'bmp',
+    'image/webp': 'webp',
+    'image/svg+xml': 'svg'
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg')
+
+
+# 流式下载时算出的哈希按文件身份(设备、inode、大小、修改时间)缓存，
+# 文件被重命名/移动后仍能命中，入库时无需再次读取整个文件
+_HASH_CACHE_SIZE = 256
+_hash_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_hash_cache_lock = threading.Lock()
+
+
+class ImageTooLargeError(Exception):
+    """图片超过大小上限"""
+
+
+class IngestCancelled(Exception):
+    """下载被调用方取消"""
+
+
+class IngestResult(NamedTuple):
+    """流式入库结果"""
+    path: str        # 实际保存路径
+    sha256: str      # 内容的SHA-256（十六进制）
+    size: int        # 字节数
+    extension: str   # 识别出的格式
+
+
+# 根据文件头(magic bytes)识别图片格式，无法识别时返回None
+def sniff_image_format(header_bytes):
+    if not header_bytes:
+        return None
+    if header_bytes.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if header_bytes.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header_bytes[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header_bytes[:4] == b'RIFF' and header_bytes[8:12] == b'WEBP':
+        return 'webp'
+    if header_bytes.startswith(b'BM'):
+        return 'bmp'
+    return None
+
+
+# 根据文件头(magic bytes)和Content-Type判断图片格式
+def detect_image_format(header_bytes, content_type=''):
+    extension = sniff_image_format(header_bytes)
+    if extension:
+        return extension
+
+    # 文件头无法识别时退回到Content-Type（处理可能的附加参数如charset）
+    mime_type = (content_type or '').split(';')[0].strip().lower()
+    return MIME_TO_EXTENSION.get(mime_type, 'jpg')  # 默认使用jpg
+
+
+# 按识别出的格式确定最终保存路径，save_path 的图片扩展名会被替换
+def resolve_image_path(save_path, extension):
+    stem, ext = os.path.splitext(save_path)
+    if ext.lower() not in IMAGE_EXTENSIONS:
+        stem = save_path
+    return f"{stem}.{extension}"
+
+
+def _file_identity(path):
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def remember_sha256(path, sha256):
+    """记录文件内容的SHA-256，供 file_sha256 直接复用"""
+    try:
+        key = _file_identity(path)
+    except OSError:
+        return
+    with _hash_cache_lock:
+        _hash_cache[key] = sha256
+        _hash_cache.move_to_end(key)
+        while len(_hash_cache) > _HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+
+
+def file_sha256(path):
+    """获取文件内容的SHA-256，文件未变化且已知哈希时不读取文件"""
+    key = _file_identity(path)
+    with _hash_cache_lock:
+        cached = _hash_cache.get(key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    remember_sha256(path, sha256)
+    return sha256
+
+
+def stream_response_to_file(response: requests.Response, save_path: str,
+                            max_bytes: int = MAX_IMAGE_BYTES, require_image: bool = False,
+                            should_stop: Optional[Callable[[], bool]] = None) -> IngestResult:
+    """
+    将流式响应边下载边写入磁盘
+
+    数据先写入同目录下的临时文件，过程中计算SHA-256并用前几个字节识别格式，
+    完成后按识别出的扩展名原子重命名。任何失败都会删除临时文件。
+
+    Args:
+        response: 以 stream=True 发起的响应
+        save_path: 保存路径（扩展名按实际格式确定）
+        max_bytes: 大小上限，超过时抛出 ImageTooLargeError
+        require_image: 为True时文件头无法识别为图片则抛出 ValueError
+        should_stop: 返回True时中止下载并抛出 IngestCancelled
+
+    Returns:
+        IngestResult
+    """
+    content_length = int(response.headers.get('Content-Length', 0) or 0)
+    if content_length > max_bytes:
+        raise ImageTooLargeError(f"图片过大: {content_length} 字节 (上限 {max_bytes})")
+
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{save_path}.{uuid.uuid4().hex}.tmp"
+
+    digest = hashlib.sha256()
+    header = b''
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if should_stop is not None and should_stop():
+                    raise IngestCancelled("下载已取消")
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageTooLargeError(f"图片过大: 超过 {max_bytes} 字节")
+                if len(header) < SNIFF_BYTES:
+                    header += chunk[:SNIFF_BYTES - len(header)]
+                digest.update(chunk)
+                f.write(chunk)
+
+        if require_image and sniff_image_format(header) is None:
+            raise ValueError("响应内容不是有效图片")
+        extension = detect_image_format(header, response.headers.get('Content-Type', ''))
+        final_path = resolve_image_path(save_path, extension)
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        response.close()
+
+    sha256 = digest.hexdigest()
+    remember_sha256(final_path, sha256)
+    logger.info(f"Image saved to: {final_path} ({size} bytes, format: {extension})")
+    return IngestResult(final_path, sha256, size, extension)
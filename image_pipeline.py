@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片处理流水线 - 只解码一次，按声明的操作链处理，再从同一份解码结果生成预览和最终文件
+每个文件已应用过的操作按内容哈希记录，同一张图片不会被重复增强、重复编码
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+
+from PIL import Image
+
+from encode_profiles import save_options as profile_save_options
+from image_filters import Operation, apply_operations, is_supported
+from image_ingest import file_sha256
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("imagePipeline")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("imagePipeline")
+    logger.propagate = False
+
+
+DATA_DIR = Path(__file__).parent / "data"
+REGISTRY_FILE = DATA_DIR / "processing.jsonl"
+
+# clear_image 的操作链：1.2倍对比度增强
+CLEAR_IMAGE_CHAIN: Tuple[Operation, ...] = (("contrast", 1.2),)
+
+
+def operation_key(operation: Operation) -> str:
+    """操作的唯一标识，如 contrast(1.2)"""
+    name, param = operation
+    return f"{name}({param})"
+
+
+class ProcessingRegistry:
+    """按内容哈希记录图片已应用的操作（追加写入的 JSON Lines 日志，超过上限两倍时整体重写）"""
+
+    def __init__(self, path: Optional[Path] = REGISTRY_FILE, max_entries: int = 5000):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self._entries: Dict[str, List[str]] = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        legacy = self.path.with_suffix(".json")
+        migrated = False
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        entry = json.loads(line)
+                        self._entries.pop(entry["sha"], None)
+                        self._entries[entry["sha"]] = entry["ops"]
+                        self._lines += 1
+            elif legacy.exists():
+                # 旧版整体保存的 processing.json，转换为日志
+                with open(legacy, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+                migrated = True
+        except Exception as e:
+            logger.error(f"加载处理记录失败: {e}")
+        with self._lock:
+            self._trim_locked()
+            # 被覆盖或淘汰的旧行超过有效记录数时整体重写
+            if migrated or self._lines > len(self._entries) * 2:
+                self._compact_locked()
+            if migrated and self.path.exists():
+                legacy.unlink()
+
+    def _trim_locked(self):
+        # 只保留最近的记录（dict按插入顺序）
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+
+    def _compact_locked(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for sha256, operations in self._entries.items():
+                    f.write(json.dumps({"sha": sha256, "ops": operations}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._lines = len(self._entries)
+        except Exception as e:
+            logger.error(f"保存处理记录失败: {e}")
+
+    def _append_locked(self, sha256: str, operations: List[str]):
+        if not self.path:
+            return
+        if self._lines >= self.max_entries * 2:
+            self._compact_locked()
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"sha": sha256, "ops": operations}, ensure_ascii=False) + "\n")
+            self._lines += 1
+        except Exception as e:
+            logger.error(f"保存处理记录失败: {e}")
+
+    def applied(self, sha256: str) -> List[str]:
+        with self._lock:
+            return list(self._entries.get(sha256, []))
+
+    def record(self, sha256: str, operations: Iterable[str]):
+        with self._lock:
+            operations = list(operations)
+            self._entries.pop(sha256, None)
+            self._entries[sha256] = operations
+            self._trim_locked()
+            self._append_locked(sha256, operations)
+
+
+_registry: Optional[ProcessingRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ProcessingRegistry:
+    """获取全局处理记录"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProcessingRegistry()
+        return _registry
+
+
+class PipelineResult(NamedTuple):
+    """处理结果"""
+    path: str                  # 输出文件路径
+    sha256: str                # 输出内容的哈希
+    applied: Tuple[str, ...]   # 本次实际应用的操作
+    skipped: Tuple[str, ...]   # 之前已应用过而跳过的操作
+
+
+class ImagePipeline:
+    """单次解码的图片处理流水线"""
+
+    def __init__(self, operations: Sequence[Operation] = CLEAR_IMAGE_CHAIN, destination: str = "library",
+                 save_options: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            operations: 按顺序应用的操作链，如 (("contrast", 1.2),)，点运算会融合为一次查表（见 image_filters）
+            destination: 输出文件的写入目标，按 encode_profiles 中该目标的配置编码
+            save_options: 直接指定传给 Image.save 的编码参数，优先于 destination
+        """
+        for name, _ in operations:
+            if not is_supported(name):
+                raise ValueError(f"未知的图片操作: {name}")
+        self.operations = tuple(operations)
+        self.destination = destination
+        self.save_options = save_options
+
+    def process_file(self, path: str, output_path: Optional[str] = None,
+                     preview_box: Optional[Tuple[int, int]] = None) -> PipelineResult:
+        """
+        处理图片文件
+
+        Args:
+            path: 输入文件
+            output_path: 输出文件，None表示原地处理
+            preview_box: 指定时用同一份解码结果生成该尺寸的预览并写入缩略图缓存
+
+        Returns:
+            PipelineResult
+        """
+        output_path = output_path or path
+        registry = get_registry()
+        source_sha = file_sha256(path)
+        done = registry.applied(source_sha)
+        remaining = [op for op in self.operations if operation_key(op) not in done]
+        skipped = tuple(operation_key(op) for op in self.operations if operation_key(op) in done)
+
+        if not remaining and preview_box is None:
+            if output_path != path:
+                _copy_file(path, output_path)
+            if skipped:
+                logger.info(f"操作已应用过，跳过处理: {', '.join(skipped)}")
+            return PipelineResult(output_path, source_sha, (), skipped)
+
+        # 只解码一次
+        with Image.open(path) as source:
+            source.load()
+            image_format = source.format
+            image = apply_operations(source, remaining) if remaining else source
+
+            if remaining:
+                _encode(image, output_path, image_format, self.destination, self.save_options)
+                sha256 = file_sha256(output_path)
+                applied = tuple(operation_key(op) for op in remaining)
+                registry.record(sha256, done + list(applied))
+                logger.info(f"图片处理完成: {output_path} ({', '.join(applied)})")
+            else:
+                if output_path != path:
+                    _copy_file(path, output_path)
+                sha256 = source_sha
+                applied = ()
+
+            if preview_box is not None:
+                _cache_preview(sha256, preview_box, image)
+
+        return PipelineResult(output_path, sha256, applied, skipped)
+
+
+def _copy_file(source: str, target: str):
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def _encode(image: Image.Image, output_path: str, image_format: Optional[str], destination: str,
+            save_options: Optional[Dict[str, Any]]):
+    """编码到临时文件后原子替换，失败时不破坏原文件；格式由输出扩展名决定，未知时沿用原图格式"""
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    image_format = Image.registered_extensions().get(os.path.splitext(output_path)[1].lower()) or image_format or "JPEG"
+    if save_options is None:
+        save_options = profile_save_options(image_format, destination)
+    try:
+        image.save(tmp_path, format=image_format, **save_options)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _cache_preview(sha256: str, box: Tuple[int, int], image: Image.Image):
+    try:
+        from thumbnail_cache import get_thumbnail_cache
+        get_thumbnail_cache().put(sha256, box, image)
+    except Exception as e:
+        logger.error(f"生成预览失败: {e}")
+
+
+_default_pipeline = ImagePipeline()
+
+
+def process_image(path: str, preview_box: Optional[Tuple[int, int]] = None) -> PipelineResult:
+    """用默认操作链（清晰化）原地处理图片，已处理过的图片不会重复处理"""
+    return _default_pipeline.process_file(path, preview_box=preview_box)
+
+
+def main():
+    """
+    对比旧流程与单次解码流水线: python image_pipeline.py [图片路径]
+    旧流程：清晰化时解码+编码，预览时再次解码，设为壁纸时又解码+增强+编码一次
+    处理记录和缩略图缓存写入临时目录，不影响 data/processing.jsonl 与 images/.thumbs
+    """
+    global _registry
+    import tempfile
+    from PIL import ImageEnhance as Enhance
+    import thumbnail_cache
+
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    work_dir = tempfile.mkdtemp()
+    saved_registry, saved_cache = _registry, thumbnail_cache._cache
+    _registry = ProcessingRegistry(Path(work_dir) / "processing.jsonl")
+    thumbnail_cache._cache = thumbnail_cache.ThumbnailCache(os.path.join(work_dir, "thumbs"))
+    try:
+        if source is None:
+            import numpy as np
+            source = os.path.join(work_dir, "source.jpg")
+            noise = (np.random.default_rng(0).random((1080, 1920, 3)) * 255).astype("uint8")
+            Image.fromarray(noise).save(source, quality=90)
+        box = (600, 300)
+
+        def legacy_clear(path):
+            image = Image.open(path)
+            image = Enhance.Contrast(image).enhance(1.2)
+            image.save(path, quality=95, dpi=(500, 500), optimize=True)
+
+        legacy_path = os.path.join(work_dir, "legacy" + os.path.splitext(source)[1])
+        shutil.copyfile(source, legacy_path)
+        start = time.perf_counter()
+        legacy_clear(legacy_path)
+        with Image.open(legacy_path) as preview:
+            preview.thumbnail(box)
+        saved_path = os.path.join(work_dir, "legacy_saved" + os.path.splitext(source)[1])
+        shutil.copyfile(legacy_path, saved_path)
+        legacy_clear(saved_path)
+        legacy_time = time.perf_counter() - start
+
+        pipeline = ImagePipeline()
+        pipeline_path = os.path.join(work_dir, "pipeline" + os.path.splitext(source)[1])
+        shutil.copyfile(source, pipeline_path)
+        start = time.perf_counter()
+        first = pipeline.process_file(pipeline_path, preview_box=box)
+        second = pipeline.process_file(pipeline_path,
+                                       os.path.join(work_dir, "pipeline_saved" + os.path.splitext(source)[1]))
+        pipeline_time = time.perf_counter() - start
+
+        print(f"旧流程（解码3次、编码2次、对比度增强2次）: {legacy_time * 1000:.0f}ms")
+        print(f"流水线（解码1次、编码1次）: {pipeline_time * 1000:.0f}ms")
+        print(f"  第一次: 应用 {list(first.applied)}")
+        print(f"  第二次: 应用 {list(second.applied)}，跳过 {list(second.skipped)}")
+    finally:
+        _registry, thumbnail_cache._cache = saved_registry, saved_cache
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标汇总 - 收集各模块的统计信息并导出为JSON
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+import logging
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("metrics")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("metrics")
+    logger.propagate = False
+
+
+METRICS_FILE = Path(__file__).parent / "data" / "metrics.json"
+
+_sources: Dict[str, Callable[[], Any]] = {}
+
+
+def register_metrics_source(name: str, collector: Callable[[], Any]):
+    """注册一个指标来源，collector 返回可序列化为JSON的数据"""
+    _sources[name] = collector
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """收集所有已注册来源的指标"""
+    result: Dict[str, Any] = {"timestamp": time.time()}
+    for name, collector in list(_sources.items()):
+        try:
+            result[name] = collector()
+        except Exception as e:
+            logger.error(f"收集指标失败: {name}: {e}")
+            result[name] = {"error": str(e)}
+    return result
+
+
+def export_metrics(path: Path = METRICS_FILE) -> Path:
+    """将当前指标导出到JSON文件"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(collect_metrics(), f, ensure_ascii=False, indent=2)
+    logger.info(f"指标已导出到: {path}")
+    return path
+
+
+def _register_builtin_sources():
+    try:
+        from http_session import get_pool_stats
+        register_metrics_source("http_pool", get_pool_stats)
+    except ImportError:
+        pass
+    try:
+        from endpoint_scoreboard import get_scoreboard
+        register_metrics_source("endpoint_scores", lambda: get_scoreboard().snapshot())
+    except ImportError:
+        pass
+
+
+_register_builtin_sources()
+
+
+def main():
+    """命令行导出指标: python metrics.py [输出路径]"""
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else METRICS_FILE
+    export_metrics(path)
+    print(f"指标已导出到: {path}")
+
+
+if __name__ == "__main__":
+    main()
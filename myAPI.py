@@ -1,9 +1,16 @@
 import ctypes
 import os
-import random
+import time
+import uuid
 import requests
 import logging
-from PIL import Image, ImageEnhance
+from http_session import http_get
+from resilience import resilient_get
+from endpoint_scoreboard import get_scoreboard
+from catalog import get_catalog
+from display_fit import fit_to_display
+from image_pipeline import process_image
+from image_ingest import MAX_IMAGE_BYTES, detect_image_format, stream_response_to_file
 
 try:
     from logging_config import get_logger
@@ -16,6 +23,22 @@ except Exception:
 
 
 def set_wallpaper(image_path):
+    # 交给桌面的是适配到显示器分辨率的版本，原图保持不变
+    try:
+        desktop_path = fit_to_display(image_path)
+    except Exception as e:
+        logger.error(f"Error fitting wallpaper to display: {e}")
+        desktop_path = image_path
+    success = _set_desktop_wallpaper(desktop_path)
+    if success:
+        try:
+            get_catalog().mark_set(image_path)
+        except Exception as e:
+            logger.error(f"Error updating catalog: {e}")
+    return success
+
+
+def _set_desktop_wallpaper(image_path):
     try:
         # 确保路径是绝对路径
         abs_path = os.path.abspath(image_path)
@@ -52,24 +75,15 @@ def set_wallpaper(image_path):
     return False
 
 
-def download_and_set_wallpaper(image_url, save_path):
+# save_path 为 None 时下载后按实际格式在 images 目录原子分配编号
+def download_and_set_wallpaper(image_url, save_path=None):
     try:
-        # 从API下载图片
+        # 从API下载图片（单次请求，按实际内容确定扩展名）
         logger.info(f"Downloading image from: {image_url}")
-        response = requests.get(image_url, timeout=30)
-        if response.status_code != 200:
-            logger.error(f"Failed to download image from {image_url}, status code: {response.status_code}")
-            return False
-            
-        # 确保images目录存在
-        if not os.path.exists('images'):
-            os.makedirs('images')
-            logger.info("Created images directory")
-
-        # 保存图片
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-        logger.info(f"Image saved to: {save_path}")
+        if save_path is None:
+            save_path = download_to_allocated_path(image_url, 'images', 'img')
+        else:
+            save_path = fetch_image(image_url, save_path, timeout=30)
 
         # 图片清晰化处理
         # image = Image.open(save_path)
@@ -80,6 +94,7 @@ def download_and_set_wallpaper(image_url, save_path):
         if not os.path.exists(save_path):
             logger.error(f"Saved file does not exist: {save_path}")
             return False
+        get_catalog().add(save_path, url=image_url)
 
         # 设置壁纸
         set_wallpaper(save_path)
@@ -92,18 +107,14 @@ def download_and_set_wallpaper(image_url, save_path):
         logger.error(f"Error in download_and_set_wallpaper: {e}")
         return False
 
-# 统计images目录下的文件数量
+# 统计images目录下的文件数量（查询媒体目录，不遍历文件系统）
 def count_files_in_directory(directory_path):
     try:
         if not os.path.exists(directory_path):
             logger.info(f"Directory {directory_path} does not exist")
             return 0
             
-        file_count = 0
-        for item in os.listdir(directory_path):
-            item_path = os.path.join(directory_path, item)
-            if os.path.isfile(item_path) and item.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')):
-                file_count += 1
+        file_count = get_catalog().count(directory_path, "image")
         logger.info(f"Found {file_count} image files in {directory_path}")
         return file_count
     except Exception as e:
@@ -111,43 +122,80 @@ def count_files_in_directory(directory_path):
         return 0
 
 
+# 单次请求流式下载图片，边写入磁盘边计算哈希并识别格式
+def download_image(image_url, save_path, timeout=30, max_bytes=MAX_IMAGE_BYTES):
+    """
+    save_path 可以不带扩展名，也可以带扩展名（会被替换为实际检测到的格式）。
+    返回 IngestResult(path, sha256, size, extension)，
+    网络错误或状态码异常时抛出 requests 异常，超过大小上限时抛出 ImageTooLargeError。
+    """
+    # 内置图片源的请求结果计入评分板
+    track = image_url in API_URLS.values()
+    start = time.perf_counter()
+    try:
+        response = resilient_get(image_url, timeout=timeout, stream=True)
+        response.raise_for_status()
+        result = stream_response_to_file(response, save_path, max_bytes=max_bytes)
+    except requests.exceptions.RequestException:
+        if track:
+            get_scoreboard().record_failure(image_url, time.perf_counter() - start)
+        raise
+    if track:
+        get_scoreboard().record_success(image_url, time.perf_counter() - start, result.size)
+    return result
+
+
+# 单次请求下载图片，按实际格式确定扩展名并保存，返回实际保存的文件路径
+def fetch_image(image_url, save_path, timeout=30):
+    return download_image(image_url, save_path, timeout=timeout).path
+
+
+# 先下载到临时文件确定格式，再按实际扩展名原子分配编号（O_EXCL 占位）并移入，返回保存路径
+def download_to_allocated_path(image_url, directory, prefix, timeout=30):
+    result = download_image(image_url, os.path.join(directory, f"temp_{uuid.uuid4().hex}"), timeout=timeout)
+    save_path = None
+    try:
+        save_path = get_catalog().allocate_path(directory, prefix, result.extension)
+        os.replace(result.path, save_path)
+    except Exception:
+        if save_path is not None:
+            get_catalog().release_path(save_path)
+        if os.path.exists(result.path):
+            os.remove(result.path)
+        raise
+    return save_path
+
+
 # 获取图片格式
 def get_image_format_from_url(image_url):
     try:
-        response = requests.get(image_url, stream=True, timeout=10)
+        response = http_get(image_url, stream=True, timeout=10)
         content_type = response.headers.get('Content-Type', '')
+        # 只读取响应头，释放连接回连接池
+        response.close()
 
-        # 处理可能的附加参数如charset
-        mime_type = content_type.split(';')[0].strip().lower()
-
-        # 常见图片MIME类型映射
-        mime_to_extension = {
-            'image/jpeg': 'jpg',
-            'image/png': 'png',
-            'image/gif': 'gif',
-            'image/bmp': 'bmp',
-            'image/webp': 'webp',
-            'image/svg+xml': 'svg'
-        }
-
-        extension = mime_to_extension.get(mime_type, 'jpg')  # 默认使用jpg
-        logger.info(f"Detected MIME type: {mime_type}, using extension: {extension}")
+        extension = detect_image_format(b'', content_type)
+        logger.info(f"Detected Content-Type: {content_type}, using extension: {extension}")
         return extension
         
     except Exception as e:
         logger.error(f"Error getting image format: {e}")
         return 'jpg'  # 默认返回jpg
 
+# 内置随机图片api
+API_URLS = {
+    'api1': 'https://api.btstu.cn/sjbz/api.php',        # 随机各类壁纸
+    'api2': 'https://api.paugram.com/wallpaper/',    # 随机动漫壁纸
+    'api3': 'https://cdn.seovx.com/d/?mom=302',      # 随机二次元
+    'api4': 'https://cdn.seovx.com/?mom=302',        # 随机美图
+    'api5': 'https://cdn.seovx.com/ha/?mom=302',     # 随机古风
+    'api6': 'https://www.dmoe.cc/random.php',        # 樱花二次元
+}
+
+
 # 获取随机图片api的随机地址
 def get_random_image_api(api_type):
-    api_urls = {
-        'api1': 'https://api.btstu.cn/sjbz/api.php',        # 随机各类壁纸
-        'api2': 'https://api.paugram.com/wallpaper/',    # 随机动漫壁纸
-        'api3': 'https://cdn.seovx.com/d/?mom=302',      # 随机二次元
-        'api4': 'https://cdn.seovx.com/?mom=302',        # 随机美图
-        'api5': 'https://cdn.seovx.com/ha/?mom=302',     # 随机古风
-        'api6': 'https://www.dmoe.cc/random.php',        # 樱花二次元
-    }
+    api_urls = API_URLS
 
     try:
         # 如果api_type在预定义的API列表中，直接返回对应的URL
@@ -155,9 +203,9 @@ def get_random_image_api(api_type):
             api_url = api_urls[api_type]
             logger.info(f"用户指定系统中的api：{api_url}")
             return api_url
-        # 如果api_type是'random'，随机选择一个API
+        # 如果api_type是'random'，按评分板权重随机选择一个API（慢或故障的源被选中的概率更低）
         elif api_type == 'random':
-            api_url = random.choice(list(api_urls.values()))
+            api_url = get_scoreboard().choose(api_urls.values())
             logger.info(f"用户选择随机api：{api_url}")
             return api_url
         # 其他情况，使用默认的api2
@@ -172,24 +220,15 @@ def get_random_image_api(api_type):
 
 
 # 将api获取的【随机图片】进行清晰化处理
-def clear_image(save_path):
-    logger.info("Clearing image...")
-    # 打开图片
-    image = Image.open(save_path)
-
-    # 调整对比度
-    contrast = ImageEnhance.Contrast(image)
-    image = contrast.enhance(1.2)  # 1.5倍对比度增强
-
-    # # 调整亮度
-    # brightness = ImageEnhance.Brightness(image)
-    # image = brightness.enhance(1.2)  # 1.2倍亮度增强
-    #
-    # # 锐化处理
-    # sharpness = ImageEnhance.Sharpness(image)
-    # image = sharpness.enhance(2.0)  # 2.0倍锐化
+def clear_image(save_path, preview_box=None):
+    """
+    图片清晰化处理（1.2倍对比度增强），原地覆盖
 
-    image.save(save_path, quality=95, dpi=(500, 500), optimize=True)
+    处理由 image_pipeline 完成：只解码一次，已清晰化过的图片不会再次增强和重新编码；
+    指定 preview_box 时用同一份解码结果生成预览缩略图。
+    """
+    logger.info("Clearing image...")
+    return process_image(save_path, preview_box=preview_box)
 
 # 使用示例
 if __name__ == '__main__':
@@ -202,8 +241,7 @@ if __name__ == '__main__':
         api_url = ''
         api_type = 'api2'
 
-        img_num = count_files_in_directory('images')
-        logger.info(f"Found {img_num} existing images")
+        logger.info(f"Found {count_files_in_directory('images')} existing images")
 
         if api_url:
             image_url = api_url
@@ -212,13 +250,8 @@ if __name__ == '__main__':
             image_url = get_random_image_api(api_type)  # 随机API端点
             logger.info(f"用户未指定api，应用默认随机api：{image_url}")
         
-        img_type = get_image_format_from_url(image_url)
-        logger.info(f"Detected image type: {img_type}")
-        
-        save_path = f"images/img_{img_num + 1}.{img_type}"  # 替换为您想保存的路径
-        logger.info(f"Save path: {save_path}")
-        
-        success = download_and_set_wallpaper(image_url, save_path)
+        # 不指定保存路径时按下载内容的实际格式原子分配编号，如 images/img_12.png
+        success = download_and_set_wallpaper(image_url)
         if success:
             logger.info("Wallpaper set successfully!")
             print("壁纸设置成功！")
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+感知哈希近似重复索引 - 识别重新编码/缩放过的同一张图片
+- dHash：灰度缩小到 9x8 后用NumPy比较相邻像素，得到64位哈希
+- 多索引哈希表：64位哈希切成4段(各16位)分别建表，由抽屉原理，汉明距离不超过 r 的
+  哈希至少有一段距离不超过 r//4，查询时只需枚举每段的少量邻近值并校验少量候选
+- 索引以追加写入的JSON Lines持久化，批量建立索引时使用多进程利用所有CPU核心
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+from PIL import Image
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("perceptualHash")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("perceptualHash")
+    logger.propagate = False
+
+
+DATA_DIR = Path(__file__).parent / "data"
+INDEX_FILE = DATA_DIR / "phash_index.jsonl"
+
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+DEFAULT_MAX_DISTANCE = 6  # 汉明距离不超过该值视为近似重复
+DEFAULT_CHUNKS = 4
+
+if hasattr(int, "bit_count"):
+    def hamming(a: int, b: int) -> int:
+        return (a ^ b).bit_count()
+else:
+    def hamming(a: int, b: int) -> int:
+        return bin(a ^ b).count("1")
+
+
+def dhash(image, hash_size: int = HASH_SIZE) -> int:
+    """
+    计算图片的差值哈希(dHash)
+
+    Args:
+        image: 图片路径或 PIL.Image
+        hash_size: 哈希边长，结果为 hash_size*hash_size 位
+
+    Returns:
+        整数形式的哈希值
+    """
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as img:
+            # JPEG在解码阶段直接按DCT缩小，大图无需完整解码
+            img.draft("L", (hash_size * 8, hash_size * 8))
+            return dhash(img, hash_size)
+
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _hash_file(path: str) -> Tuple[str, Optional[str], Optional[int]]:
+    """子进程中计算 (路径, 内容SHA-256, dHash)，失败时后两项为None"""
+    try:
+        from image_ingest import file_sha256
+        return path, file_sha256(path), dhash(path)
+    except Exception:
+        return path, None, None
+
+
+def hash_files(paths: Iterable[str], workers: Optional[int] = None) -> List[Tuple[str, Optional[str], Optional[int]]]:
+    """使用多进程批量计算图片的内容哈希与感知哈希"""
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) < 2:
+        return [_hash_file(p) for p in paths]
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hash_file, paths, chunksize=chunksize))
+
+
+class MultiIndexHash:
+    """多索引哈希表，支持按汉明距离查询"""
+
+    def __init__(self, bits: int = HASH_BITS, max_distance: int = DEFAULT_MAX_DISTANCE,
+                 chunks: int = DEFAULT_CHUNKS):
+        """
+        Args:
+            bits: 哈希位数
+            max_distance: 支持查询的最大汉明距离
+            chunks: 哈希切分的段数，段越宽桶越稀疏，但每段需要枚举的邻近值越多
+        """
+        self.bits = bits
+        self.max_distance = max_distance
+        self._segments = []
+        offset = 0
+        for i in range(chunks):
+            width = bits // chunks + (1 if i < bits % chunks else 0)
+            self._segments.append((offset, (1 << width) - 1))
+            offset += width
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in self._segments]
+        self._hashes: Dict[str, int] = {}
+        # 每段需要枚举的翻转位组合（段内距离不超过 max_distance // chunks）
+        self._flips = []
+        for _, mask in self._segments:
+            width = mask.bit_length()
+            masks = [0]
+            for radius in range(1, max_distance // chunks + 1):
+                for positions in combinations(range(width), radius):
+                    masks.append(sum(1 << p for p in positions))
+            self._flips.append(masks)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._hashes
+
+    def add(self, key: str, value: int):
+        if key in self._hashes:
+            self.remove(key)
+        self._hashes[key] = value
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            table.setdefault((value >> shift) & mask, []).append(key)
+
+    def remove(self, key: str):
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            bucket = table.get((value >> shift) & mask)
+            if bucket and key in bucket:
+                bucket.remove(key)
+
+    def query(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, str]]:
+        """返回汉明距离不超过 max_distance 的 (距离, 键)，按距离升序"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        seen = set()
+        matches = []
+        for table, (shift, mask), flips in zip(self._tables, self._segments, self._flips):
+            segment = (value >> shift) & mask
+            for flip in flips:
+                for key in table.get(segment ^ flip, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    distance = hamming(value, self._hashes[key])
+                    if distance <= max_distance:
+                        matches.append((distance, key))
+        matches.sort()
+        return matches
+
+
+class PerceptualIndex:
+    """持久化的近似重复索引，键为图片内容的SHA-256"""
+
+    def __init__(self, path: Optional[Path] = INDEX_FILE, max_distance: int = DEFAULT_MAX_DISTANCE):
+        """
+        Args:
+            path: 持久化文件路径，None表示不持久化
+            max_distance: 视为近似重复的最大汉明距离
+        """
+        self.path = Path(path) if path else None
+        self.max_distance = max_distance
+        self._table = MultiIndexHash(max_distance=max_distance)
+        self._names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry.get("removed"):
+                        self._table.remove(entry["id"])
+                        self._names.pop(entry["id"], None)
+                    else:
+                        self._table.add(entry["id"], int(entry["hash"], 16))
+                        self._names[entry["id"]] = entry.get("name", "")
+            logger.info(f"已加载感知哈希索引: {len(self._table)} 张图片")
+        except Exception as e:
+            logger.error(f"加载感知哈希索引失败: {e}")
+
+    def _append_locked(self, entry: Dict):
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.error(f"保存感知哈希索引失败: {e}")
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def add(self, key: str, value: int, name: str = ""):
+        with self._lock:
+            if key in self._table:
+                return
+            self._table.add(key, value)
+            self._names[key] = name
+            self._append_locked({"id": key, "hash": f"{value:016x}", "name": name})
+
+    def remove(self, key: str):
+        with self._lock:
+            if key not in self._table:
+                return
+            self._table.remove(key)
+            self._names.pop(key, None)
+            self._append_locked({"id": key, "removed": True})
+
+    def find_similar(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, str, str]]:
+        """查找近似重复，返回 (汉明距离, 内容哈希, 名称)"""
+        with self._lock:
+            return [(d, k, self._names.get(k, "")) for d, k in self._table.query(value, max_distance)]
+
+    def compact(self):
+        """重写持久化文件，去掉已删除的记录"""
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, value in self._table._hashes.items():
+                    entry = {"id": key, "hash": f"{value:016x}", "name": self._names.get(key, "")}
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+
+
+# 全局共享索引
+_index: Optional[PerceptualIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_perceptual_index() -> PerceptualIndex:
+    """获取全局近似重复索引（首次调用时从磁盘加载）"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PerceptualIndex()
+        return _index
+
+
+def scan_library(directory: str = "images", workers: Optional[int] = None):
+    """为已有图片库批量建立索引，并列出近似重复的图片"""
+    paths = [entry.path for entry in os.scandir(directory)
+             if entry.is_file() and entry.name.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"))]
+    start = time.perf_counter()
+    results = hash_files(paths, workers)
+    elapsed = time.perf_counter() - start
+    print(f"已计算 {len(paths)} 张图片的哈希，耗时 {elapsed:.2f}s（{workers or os.cpu_count()} 个进程）")
+
+    index = get_perceptual_index()
+    for path, sha256, value in results:
+        if value is None:
+            print(f"  无法读取: {path}")
+            continue
+        similar = [m for m in index.find_similar(value) if m[1] != sha256]
+        if similar:
+            distance, _, name = similar[0]
+            print(f"  近似重复: {os.path.basename(path)} ~ {name} (距离 {distance})")
+        index.add(sha256, value, os.path.basename(path))
+
+
+def benchmark(size: int = 100_000, queries: int = 1000):
+    """随机哈希上的查询性能测试"""
+    table = MultiIndexHash()
+    rng = random.Random(0)
+    values = [rng.getrandbits(HASH_BITS) for _ in range(size)]
+    start = time.perf_counter()
+    for i, value in enumerate(values):
+        table.add(str(i), value)
+    build = time.perf_counter() - start
+
+    probes = []
+    for value in rng.sample(values, queries):
+        for bit in rng.sample(range(HASH_BITS), DEFAULT_MAX_DISTANCE):
+            value ^= 1 << bit
+        probes.append(value)
+    start = time.perf_counter()
+    found = sum(1 for value in probes if table.query(value))
+    per_query = (time.perf_counter() - start) / queries
+    print(f"建立 {size} 条索引: {build:.2f}s")
+    print(f"查询 {queries} 次（距离 {DEFAULT_MAX_DISTANCE}）: 平均 {per_query * 1e6:.0f}µs，命中 {found}/{queries}")
+
+
+def main():
+    """命令行: python perceptual_hash.py scan [目录] | bench [条数]"""
+    args = sys.argv[1:]
+    if args and args[0] == "bench":
+        benchmark(int(args[1]) if len(args) > 1 else 100_000)
+    elif args and args[0] == "scan":
+        scan_library(args[1] if len(args) > 1 else "images")
+    else:
+        print(main.__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+动态预览播放时钟 - 按预览帧在原视频中的时间戳播放，而不是固定间隔逐帧前进
+- 以单调时钟为时间轴：任意时刻应显示的帧由 (当前时间 - 起点) 在循环时长内的位置决定，
+  渲染耗时和定时器误差不会累积成漂移
+- 渲染跟不上时直接跳到当前时刻对应的帧，被跳过的帧计入丢帧数，播放速度不变
+- 统计实际显示帧率、目标帧率和丢帧数
+"""
+
+import bisect
+import math
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("playbackClock")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("playbackClock")
+    logger.propagate = False
+
+
+LEGACY_FPS = 12          # 缺少视频信息时的播放帧率（原固定间隔）
+FPS_WINDOW = 2.0         # 统计实际帧率的时间窗口（秒）
+
+
+def frame_timeline(frames: Sequence, info: Optional[Dict[str, Any]]) -> Tuple[List[float], float]:
+    """
+    计算预览帧的时间轴
+
+    Args:
+        frames: 预览帧序列；带 source_indices 属性（FrameStore）时按各帧的原视频帧序号计算
+        info: 视频信息 (fps、sample_frames 或 frame_interval)
+
+    Returns:
+        (每帧相对第一帧的时间戳列表, 循环一遍的时长)，时长包含最后一帧的显示时间
+    """
+    count = len(frames)
+    if count == 0:
+        return [], 0.0
+    info = info or {}
+    fps = info.get("fps") or 0
+    indices = getattr(frames, "source_indices", None)
+    if indices is None:
+        sample_frames = info.get("sample_frames")
+        if sample_frames is not None and len(sample_frames) >= count:
+            indices = sample_frames[:count]
+        elif info.get("frame_interval"):
+            indices = [i * info["frame_interval"] for i in range(count)]
+    indices = list(indices[:count]) if indices is not None else []
+
+    if fps > 0 and len(indices) == count:
+        start = indices[0]
+        timestamps = [(index - start) / fps for index in indices]
+        spacing = timestamps[-1] / (count - 1) if count > 1 else 1 / fps
+    else:
+        spacing = 1 / LEGACY_FPS
+        timestamps = [i * spacing for i in range(count)]
+    return timestamps, timestamps[-1] + max(spacing, 1e-3)
+
+
+class PlaybackClock:
+    """循环播放的时间轴"""
+
+    def __init__(self, timestamps: List[float], duration: float):
+        """
+        Args:
+            timestamps: 每帧的时间戳（秒，递增，第一帧为0）
+            duration: 循环一遍的时长（秒）
+        """
+        self._lock = threading.Lock()
+        self.timestamps = timestamps
+        self.duration = duration
+        self._origin: Optional[float] = None   # 第一帧对应的单调时钟时刻
+        self._last_index: Optional[int] = None
+        self._shown_times: deque = deque()
+        self._stats = {"shown": 0, "dropped": 0}
+
+    def _position(self, now: float) -> float:
+        return (now - self._origin) % self.duration
+
+    def _index_at(self, position: float) -> int:
+        return max(0, bisect.bisect_right(self.timestamps, position) - 1)
+
+    def start(self, index: int = 0, now: Optional[float] = None):
+        """从第 index 帧开始计时"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            index = min(index, len(self.timestamps) - 1)
+            self._origin = now - self.timestamps[index]
+            self._last_index = None
+            self._shown_times.clear()
+
+    def set_timeline(self, timestamps: List[float], duration: float, now: Optional[float] = None):
+        """更换时间轴（预览帧增加或被抽稀时），保持当前播放到的视频时间不变"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            position = self._position(now) if self._origin is not None else 0.0
+            self.timestamps = timestamps
+            self.duration = duration
+            self._origin = now - min(position, duration)
+            # 帧序号已变化，下一帧不计入丢帧
+            self._last_index = None
+
+    def tick(self, now: Optional[float] = None) -> int:
+        """返回此刻应显示的帧序号，并记录显示与丢帧情况"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._origin is None:
+                self._origin = now
+            index = self._index_at(self._position(now))
+            if self._last_index is not None and index != self._last_index:
+                skipped = (index - self._last_index) % len(self.timestamps) - 1
+                self._stats["dropped"] += max(0, skipped)
+            if index != self._last_index:
+                self._stats["shown"] += 1
+                self._shown_times.append(now)
+            self._last_index = index
+            while self._shown_times and now - self._shown_times[0] > FPS_WINDOW:
+                self._shown_times.popleft()
+            return index
+
+    def next_delay(self, now: Optional[float] = None) -> float:
+        """距离下一帧开始显示还有多少秒（按渲染完成后的时刻计算，渲染耗时不会累积）"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._origin is None:
+                return 0.0
+            position = self._position(now)
+            following = bisect.bisect_right(self.timestamps, position)
+            boundary = self.timestamps[following] if following < len(self.timestamps) else self.duration
+            return max(0.0, boundary - position)
+
+    @property
+    def target_fps(self) -> float:
+        return len(self.timestamps) / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def achieved_fps(self) -> float:
+        """最近 FPS_WINDOW 秒内实际显示的帧率"""
+        with self._lock:
+            times = self._shown_times
+            if len(times) < 2 or times[-1] <= times[0]:
+                return 0.0
+            return (len(times) - 1) / (times[-1] - times[0])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取播放统计信息"""
+        achieved = self.achieved_fps
+        with self._lock:
+            return {
+                **self._stats,
+                "frames": len(self.timestamps),
+                "target_fps": round(self.target_fps, 2),
+                "achieved_fps": round(achieved, 2),
+            }
+
+
+def delay_ms(seconds: float) -> int:
+    """换算成 Tk 定时器的毫秒数：向上取整，保证醒来时已到下一帧，且至少等待 1ms"""
+    return max(1, math.ceil(seconds * 1000))
+
+
+def _simulate(timestamps: List[float], duration: float, render_cost: float, seconds: float) -> Dict[str, Any]:
+    """用虚拟时钟模拟播放：每帧渲染耗时 render_cost 秒，再按 next_delay 等待"""
+    clock = PlaybackClock(timestamps, duration)
+    now = 0.0
+    clock.start(0, now)
+    while now < seconds:
+        clock.tick(now)
+        now += render_cost
+        now += delay_ms(clock.next_delay(now)) / 1000
+    return {**clock.get_stats(), "media_position": round((now - clock._origin) % duration, 3)}
+
+
+def main():
+    """
+    模拟播放: python playback_clock.py [渲染耗时ms]
+    对比固定 83ms 间隔与播放时钟在 30fps 原视频、每 2 帧采样一帧时的实际速度
+    """
+    render_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    info = {"fps": 30.0, "sample_frames": [i * 2 for i in range(150)]}
+    timestamps, duration = frame_timeline(range(150), info)
+    print(f"150 帧，原视频 {duration:.1f}s，目标 {150 / duration:.1f}fps，每帧渲染 {render_ms:.0f}ms")
+
+    # 原实现：显示一帧后固定等待 83ms，渲染耗时叠加在间隔上
+    legacy_period = (render_ms + int(1000 / 12)) / 1000
+    print(f"固定间隔: {1 / legacy_period:.1f}fps，播放一遍需 {150 * legacy_period:.1f}s")
+
+    stats = _simulate(timestamps, duration, render_ms / 1000, duration * 3)
+    print(f"播放时钟: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台预取队列 - 为每个来源/分类预先准备好已下载并处理完成的壁纸
+点击"获取"时直接从队列中取出，同时在后台补充队列
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("prefetch")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("prefetch")
+    logger.propagate = False
+
+
+DEFAULT_CACHE_DIR = os.path.join("images", ".prefetch")
+DEFAULT_DEPTH = 2                       # 每个来源/分类预取的壁纸数量
+DEFAULT_DISK_BUDGET = 200 * 1024 * 1024  # 预取缓存占用的磁盘上限（字节）
+DEFAULT_MAX_AGE = 30 * 60               # 预取条目的最长保留时间（秒）
+
+# producer(save_stem) -> (实际保存路径, 附加信息)
+Producer = Callable[[str], Tuple[str, Any]]
+
+
+class PrefetchQueue:
+    """按来源/分类维护的有界预取队列"""
+
+    def __init__(self, depth: int = DEFAULT_DEPTH,
+                 disk_budget: int = DEFAULT_DISK_BUDGET,
+                 max_age: float = DEFAULT_MAX_AGE,
+                 cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Args:
+            depth: 每个键最多预取的条目数
+            disk_budget: 所有预取文件的总字节上限
+            max_age: 条目过期时间（秒），过期条目会被淘汰
+            cache_dir: 预取文件存放目录
+        """
+        self.depth = depth
+        self.disk_budget = disk_budget
+        self.max_age = max_age
+        self.cache_dir = cache_dir
+
+        self._queues: Dict[Hashable, deque] = {}
+        self._producers: Dict[Hashable, Producer] = {}
+        self._filling: set = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"hits": 0, "misses": 0, "produced": 0, "failures": 0, "evicted": 0}
+
+    def get(self, key: Hashable, producer: Producer) -> Optional[Tuple[str, Any]]:
+        """
+        取出一个预取好的条目，并在后台补充该键的队列
+
+        Args:
+            key: 来源/分类键
+            producer: 生成条目的函数，接收不含扩展名的保存路径，返回(路径, 附加信息)
+
+        Returns:
+            (文件路径, 附加信息)，队列为空时返回None（未命中）
+        """
+        entry = None
+        with self._lock:
+            self._producers[key] = producer
+            queue = self._queues.setdefault(key, deque())
+            self._evict_stale_locked(queue)
+            if queue:
+                _, path, info, _ = queue.popleft()
+                entry = (path, info)
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        self.refill(key)
+        if entry:
+            logger.info(f"预取命中: {key} -> {entry[0]}")
+        else:
+            logger.info(f"预取未命中: {key}")
+        return entry
+
+    def refill(self, key: Hashable):
+        """在后台线程中将指定键的队列补充到设定深度"""
+        with self._lock:
+            if self._closed or key in self._filling or key not in self._producers:
+                return
+            self._filling.add(key)
+        threading.Thread(target=self._fill, args=(key,), daemon=True).start()
+
+    def _fill(self, key: Hashable):
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        return
+                    queue = self._queues.setdefault(key, deque())
+                    self._evict_stale_locked(queue)
+                    if len(queue) >= self.depth:
+                        return
+                    if self._disk_usage_locked() >= self.disk_budget:
+                        self._evict_oldest_locked()
+                        if self._disk_usage_locked() >= self.disk_budget:
+                            logger.info("预取缓存已达磁盘上限，暂停补充")
+                            return
+                    producer = self._producers[key]
+
+                os.makedirs(self.cache_dir, exist_ok=True)
+                stem = os.path.join(self.cache_dir, uuid.uuid4().hex)
+                try:
+                    path, info = producer(stem)
+                except Exception as e:
+                    logger.error(f"预取失败: {key}: {e}")
+                    with self._lock:
+                        self._stats["failures"] += 1
+                    return
+
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                with self._lock:
+                    if self._closed:
+                        self._remove_file(path)
+                        return
+                    self._queues[key].append((time.time(), path, info, size))
+                    self._stats["produced"] += 1
+                logger.info(f"预取完成: {key} -> {path}")
+        finally:
+            with self._lock:
+                self._filling.discard(key)
+
+    def _evict_stale_locked(self, queue: deque):
+        now = time.time()
+        while queue and now - queue[0][0] > self.max_age:
+            _, path, _, _ = queue.popleft()
+            self._remove_file(path)
+            self._stats["evicted"] += 1
+
+    def _evict_oldest_locked(self):
+        oldest_key = None
+        oldest_time = None
+        for key, queue in self._queues.items():
+            if queue and (oldest_time is None or queue[0][0] < oldest_time):
+                oldest_key, oldest_time = key, queue[0][0]
+        if oldest_key is not None:
+            _, path, _, _ = self._queues[oldest_key].popleft()
+            self._remove_file(path)
+            self._stats["evicted"] += 1
+
+    def _disk_usage_locked(self) -> int:
+        return sum(entry[3] for queue in self._queues.values() for entry in queue)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.error(f"删除预取文件失败: {path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中/未命中等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            total = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / total if total else 0.0
+            stats["queued"] = {str(key): len(queue) for key, queue in self._queues.items()}
+            stats["disk_usage"] = self._disk_usage_locked()
+            return stats
+
+    def shutdown(self, clear: bool = True):
+        """停止后台补充，并可选地删除所有预取文件"""
+        with self._lock:
+            self._closed = True
+            self._queues.clear()
+        if clear and os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+容错层 - 所有API共用的重试、熔断与整体截止时间
+- 重试：对瞬时错误（连接失败、超时、5xx/429）使用带抖动的指数退避
+- 熔断：按主机维护 closed/open/half_open 三态熔断器，故障主机快速失败
+- 截止时间：每次用户操作设置一个总时限，所有请求共享剩余时间
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import logging
+
+import requests
+
+from http_session import http_get
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("resilience")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("resilience")
+    logger.propagate = False
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """本次操作的整体截止时间已到"""
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def is_transient_error(error: Exception) -> bool:
+        return isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout,
+                                  requests.exceptions.ChunkedEncodingError))
+
+    @staticmethod
+    def is_transient_status(status_code: int) -> bool:
+        return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker:
+    """单个主机的熔断器"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后打开熔断器
+            reset_timeout: 打开后多久进入半开状态，允许一次试探请求（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否允许发起请求"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """未实际发出请求时归还半开状态的试探名额"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        """熔断器打开时距离半开还剩多少秒"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+class Deadline:
+    """一次用户操作的整体截止时间"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_local = threading.local()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+default_retry_policy = RetryPolicy()
+
+
+@contextmanager
+def action_deadline(seconds: float):
+    """为当前线程中的一次用户操作设置整体截止时间"""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = Deadline(seconds)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+def current_deadline() -> Optional[Deadline]:
+    return getattr(_local, "deadline", None)
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """获取URL所属主机的熔断器"""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}".lower()
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[key] = breaker
+        return breaker
+
+
+def get_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """获取所有熔断器的状态"""
+    with _breakers_lock:
+        return {key: {"state": b.state, "failures": b.failures, "retry_after": round(b.retry_after(), 1)}
+                for key, b in _breakers.items()}
+
+
+def resilient_get(url: str, retry: bool = True, policy: Optional[RetryPolicy] = None,
+                  **kwargs) -> requests.Response:
+    """
+    带重试、熔断与截止时间的GET请求，参数与 requests.get 一致
+
+    5xx/429 响应在重试用尽后原样返回，由调用方决定如何处理；
+    熔断器打开时抛出 CircuitOpenError，截止时间用尽时抛出 DeadlineExceeded，
+    二者均为 requests.exceptions.RequestException 的子类。
+    """
+    policy = policy or default_retry_policy
+    max_attempts = policy.max_attempts if retry else 1
+    breaker = get_breaker(url)
+    deadline = current_deadline()
+    timeout = kwargs.pop("timeout", None)
+
+    for attempt in range(max_attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"熔断器已打开，{breaker.retry_after():.0f}秒内跳过: {url}")
+
+        attempt_timeout = timeout
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                breaker.release()
+                raise DeadlineExceeded(f"操作已超时: {url}")
+            attempt_timeout = remaining if timeout is None else min(timeout, remaining)
+
+        last_attempt = attempt == max_attempts - 1
+        try:
+            response = http_get(url, timeout=attempt_timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if not policy.is_transient_error(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            if last_attempt:
+                raise
+            logger.info(f"请求失败，准备重试({attempt + 1}/{max_attempts}): {url}: {e}")
+        else:
+            if not policy.is_transient_status(response.status_code):
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if last_attempt:
+                return response
+            logger.info(f"服务器返回 {response.status_code}，准备重试({attempt + 1}/{max_attempts}): {url}")
+            response.close()
+
+        delay = policy.backoff(attempt)
+        if deadline is not None and delay >= deadline.remaining():
+            raise DeadlineExceeded(f"操作已超时，放弃重试: {url}")
+        time.sleep(delay)
+
+    # max_attempts 至少为1，最后一次尝试总会返回或抛出
+    raise AssertionError("unreachable")
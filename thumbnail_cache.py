@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图缓存 - 预览画布使用的预缩放图片，按 (内容哈希, 目标尺寸) 持久化到磁盘
+- 目标尺寸按 64 像素分档，窗口小幅缩放时仍能命中缓存，只需对小图做一次廉价缩放
+- 在字节预算内按最近使用(LRU)淘汰，命中时更新文件修改时间以便重启后保留顺序
+- 未命中时JPEG用 draft 在解码阶段直接按 1/2、1/4、1/8 缩小，其他格式用 reduce 整数倍缩小，
+  最后只对小图做一次高质量缩放
+"""
+
+import os
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from PIL import Image
+
+from encode_profiles import save_options
+from image_ingest import file_sha256
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("thumbnailCache")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("thumbnailCache")
+    logger.propagate = False
+
+
+DEFAULT_CACHE_DIR = os.path.join("images", ".thumbs")
+DEFAULT_BUDGET = 64 * 1024 * 1024  # 缩略图缓存占用的磁盘上限（字节）
+SIZE_STEP = 64                     # 目标尺寸分档（像素）
+
+
+def _bucket(size: Tuple[int, int]) -> Tuple[int, int]:
+    """将目标尺寸向上取整到分档"""
+    return tuple(max(SIZE_STEP, -(-v // SIZE_STEP) * SIZE_STEP) for v in size)
+
+
+def fit_size(image_size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """按比例缩放到能放进 box 的最大尺寸"""
+    img_width, img_height = image_size
+    scale = min(box[0] / img_width, box[1] / img_height)
+    return max(1, int(img_width * scale)), max(1, int(img_height * scale))
+
+
+def decode_preview(image_path: str, box: Tuple[int, int]) -> Image.Image:
+    """解码图片并缩放到能放进 box 的尺寸，大图不做全分辨率解码"""
+    with Image.open(image_path) as image:
+        target = fit_size(image.size, box)
+        if image.format == "JPEG":
+            # 按DCT缩放解码，得到不小于目标尺寸的最小 1/2^n 图像
+            image.draft(None, target)
+        image.load()
+        return scale_preview(image, target)
+
+
+def scale_preview(image: Image.Image, target: Tuple[int, int]) -> Image.Image:
+    """将已解码的图片缩放到 target：先 reduce 整数倍缩小，再对小图做一次高质量缩放"""
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(target, Image.Resampling.LANCZOS)
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, budget: int = DEFAULT_BUDGET):
+        """
+        Args:
+            cache_dir: 缩略图存放目录
+            budget: 缓存总字节上限
+        """
+        self.cache_dir = cache_dir
+        self.budget = budget
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # 文件名 -> 字节数，按最近使用排序
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        logger.info(f"已加载缩略图缓存: {len(self._entries)} 个, {self._bytes / 1024 / 1024:.1f}MB")
+
+    def _evict_locked(self):
+        while self._bytes > self.budget and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._stats["evicted"] += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def get(self, image_path: str, box: Tuple[int, int]) -> Image.Image:
+        """
+        获取能放进 box 的预览图
+
+        Args:
+            image_path: 原图路径
+            box: 目标区域 (宽, 高)
+
+        Returns:
+            已缩放到目标尺寸的 PIL.Image
+        """
+        bucket = _bucket(box)
+        prefix = f"{file_sha256(image_path)}_{bucket[0]}x{bucket[1]}"
+
+        with self._lock:
+            name = next((n for n in (prefix + ".jpg", prefix + ".png") if n in self._entries), None)
+            if name is not None:
+                self._entries.move_to_end(name)
+                self._stats["hits"] += 1
+
+        if name is not None:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                os.utime(path)
+                with Image.open(path) as cached:
+                    cached.load()
+                    return self._fit(cached, box)
+            except OSError:
+                # 缓存文件被外部删除，按未命中处理
+                with self._lock:
+                    self._bytes -= self._entries.pop(name, 0)
+                    self._stats["hits"] -= 1
+
+        with self._lock:
+            self._stats["misses"] += 1
+        thumbnail = decode_preview(image_path, bucket)
+        self._store(prefix, thumbnail)
+        return self._fit(thumbnail, box)
+
+    def put(self, sha256: str, box: Tuple[int, int], image: Image.Image):
+        """
+        用调用方已解码的图片生成缩略图并写入缓存，之后按内容哈希 get 时直接命中
+
+        Args:
+            sha256: 图片文件内容的哈希
+            box: 目标区域 (宽, 高)
+            image: 与该文件内容一致的已解码图片
+        """
+        bucket = _bucket(box)
+        self._store(f"{sha256}_{bucket[0]}x{bucket[1]}", scale_preview(image, fit_size(image.size, bucket)))
+
+    @staticmethod
+    def _fit(image: Image.Image, box: Tuple[int, int]) -> Image.Image:
+        size = fit_size(image.size, box)
+        if size == image.size:
+            return image.copy()
+        return image.resize(size, Image.Resampling.LANCZOS)
+
+    def _store(self, prefix: str, thumbnail: Image.Image):
+        name = prefix + (".png" if thumbnail.mode == "RGBA" else ".jpg")
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            image_format = "PNG" if name.endswith(".png") else "JPEG"
+            thumbnail.save(tmp_path, format=image_format, **save_options(image_format, "preview"))
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logger.error(f"写入缩略图缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict_locked()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息（含命中率）"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget": self.budget,
+            }
+
+    def clear(self):
+        with self._lock:
+            for name in self._entries:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._bytes = 0
+
+
+# 全局共享缓存
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """获取全局缩略图缓存（首次调用时扫描缓存目录）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache()
+        return _cache
+
+
+def main():
+    """命令行查看缩略图缓存: python thumbnail_cache.py [--clear]"""
+    cache = get_thumbnail_cache()
+    if "--clear" in sys.argv[1:]:
+        cache.clear()
+        print("缩略图缓存已清空")
+    for key, value in cache.get_stats().items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
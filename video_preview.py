@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+动态壁纸渐进式预览 - 视频边下载边解码，不必等整个文件下载完成
+- 单连接顺序下载到预览文件，下载线程通过条件变量通知读取方已写入的字节数
+- 解析MP4顶层box：moov（索引）位于mdat（数据）之前时，拿到索引和第一个GOP即可解码首帧；
+  moov在文件末尾时无法提前解码，等待下载完成后再解码
+- 读到已下载部分的末尾时等待更多数据，再重新打开文件从当前帧继续
+- 统计首帧时间（从开始下载到首帧解码完成）及此时已下载的字节数
+- 采样帧按顺序读取：用 grab() 跳过不需要的帧、只对采样帧 retrieve()，不再每帧都定位到关键帧后重新解码；
+  长视频读取MP4同步样本表(stss)，只提取均匀分布在整个视频上的关键帧
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+import requests
+
+from resilience import resilient_get
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("videoPreview")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("videoPreview")
+    logger.propagate = False
+
+
+CHUNK_SIZE = 64 * 1024
+# 读到已下载部分末尾后，至少再写入这么多字节才重新打开文件
+REOPEN_BYTES = 256 * 1024
+# 无法识别容器布局时，下载这么多字节后尝试打开
+PROBE_BYTES = 512 * 1024
+
+# 超过该时长（秒）的视频只提取关键帧
+LONG_CLIP_SECONDS = 60
+# 关键帧模式最多提取的帧数
+MAX_KEYFRAMES = 150
+# OpenCV 定位时会从目标之前若干帧开始解码，一次定位约等于顺序 grab 30 帧的开销
+SEEK_GRAB_LIMIT = 30
+
+# on_frame(序号, RGB帧)
+FrameCallback = Callable[[int, Any], None]
+
+
+class GrowingFile:
+    """正在下载的文件：记录已写入磁盘的字节数，读取方可等待更多数据"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self.total = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    def advance(self, size: int, total: int):
+        with self._cond:
+            self.size = size
+            self.total = total
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def wait_for(self, min_size: int, timeout: Optional[float] = None) -> int:
+        """等待已写入字节数达到 min_size 或下载结束，返回当前字节数"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.size >= min_size or self.done, timeout)
+            return self.size
+
+
+def stream_download(url: str, growing: GrowingFile, timeout: float = 60,
+                    should_stop: Optional[Callable[[], bool]] = None):
+    """顺序下载到 growing.path，每写入一块就刷新到磁盘并通知读取方"""
+    error = None
+    try:
+        response = resilient_get(url, timeout=timeout, stream=True)
+        try:
+            response.raise_for_status()
+            total = int(response.headers.get("Content-Length", 0) or 0)
+            written = 0
+            with open(growing.path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if should_stop and should_stop():
+                        raise InterruptedError("预览已取消")
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    f.flush()
+                    written += len(chunk)
+                    growing.advance(written, total)
+            if total and written < total:
+                raise requests.exceptions.ChunkedEncodingError(f"连接提前关闭: {written}/{total}")
+        finally:
+            response.close()
+    except BaseException as e:
+        error = e
+        logger.error(f"预览视频下载失败: {e}")
+    finally:
+        growing.finish(error)
+
+
+def mp4_layout(path: str, size: int) -> Optional[str]:
+    """
+    根据已下载的前 size 字节判断MP4布局
+
+    Returns:
+        "faststart"（moov在mdat之前）、"moov_at_end"、"unknown"（不是MP4），
+        已下载部分还不足以判断时返回None
+    """
+    offset = 0
+    try:
+        with open(path, "rb") as f:
+            while offset + 8 <= size:
+                f.seek(offset)
+                box_size, box_type = struct.unpack(">I4s", f.read(8))
+                if offset == 0 and box_type != b"ftyp":
+                    return "unknown"
+                if box_type == b"moov":
+                    # 整个moov下载完才能解析索引
+                    return "faststart" if offset + box_size <= size else None
+                if box_type == b"mdat":
+                    return "moov_at_end"
+                if box_size == 1:
+                    if offset + 16 > size:
+                        return None
+                    box_size = struct.unpack(">Q", f.read(8))[0]
+                elif box_size == 0:
+                    return "moov_at_end"
+                if box_size < 8:
+                    return "unknown"
+                offset += box_size
+    except OSError:
+        return None
+    return None
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    """遍历 data[start:end] 中的 box，产生 (偏移, 大小, 类型, 头长度)"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield offset, size, box_type, header
+        offset += size
+
+
+def _child(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    """查找子box，返回其内容的 (起始, 结束)"""
+    for offset, size, found, header in _iter_boxes(data, start, end):
+        if found == box_type:
+            return offset + header, offset + size
+    return None
+
+
+def mp4_keyframes(path: str) -> Optional[List[int]]:
+    """
+    读取视频轨的同步样本表(stss)
+
+    Returns:
+        关键帧序号（从0开始，升序）；没有stss（所有帧都是关键帧）或无法解析时返回None
+    """
+    try:
+        with open(path, "rb") as f:
+            offset = 0
+            while True:
+                header = f.read(16)
+                if len(header) < 8:
+                    return None
+                size, box_type = struct.unpack(">I4s", header[:8])
+                if size == 1:
+                    size = struct.unpack(">Q", header[8:16])[0]
+                if box_type == b"moov":
+                    f.seek(offset)
+                    moov = f.read(size)
+                    break
+                if size < 8:
+                    return None
+                offset += size
+                f.seek(offset)
+    except OSError:
+        return None
+
+    for offset, size, box_type, header in _iter_boxes(moov, 8, len(moov)):
+        if box_type != b"trak":
+            continue
+        mdia = _child(moov, offset + header, offset + size, b"mdia")
+        if not mdia:
+            continue
+        hdlr = _child(moov, mdia[0], mdia[1], b"hdlr")
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        minf = _child(moov, mdia[0], mdia[1], b"minf")
+        stbl = minf and _child(moov, minf[0], minf[1], b"stbl")
+        stss = stbl and _child(moov, stbl[0], stbl[1], b"stss")
+        if not stss:
+            return None
+        count = struct.unpack(">I", moov[stss[0] + 4:stss[0] + 8])[0]
+        samples = struct.unpack(f">{count}I", moov[stss[0] + 8:stss[0] + 8 + 4 * count])
+        return [s - 1 for s in samples]
+    return None
+
+
+def choose_sampling(fps: float, frame_count: int) -> Tuple[int, int]:
+    """按视频时长决定 (帧间隔, 最多提取帧数)，尽量还原原视频"""
+    duration = frame_count / fps if fps > 0 else 0
+    if duration <= 5:  # 5秒以内的视频，每秒提取15帧
+        return max(1, int(fps / 15)), min(75, frame_count)
+    if duration <= 10:  # 10秒以内的视频，每秒提取12帧
+        return max(1, int(fps / 12)), min(120, frame_count)
+    # 更长的视频，每秒提取10帧
+    return max(1, int(fps / 10)), min(150, frame_count)
+
+
+def plan_samples(fps: float, frame_count: int,
+                 keyframes: Optional[List[int]] = None) -> Tuple[str, List[int]]:
+    """
+    决定要提取的帧
+
+    Returns:
+        (模式, 升序的帧序号列表)：长视频且已知关键帧时为 "keyframe"，否则为 "sequential"
+    """
+    duration = frame_count / fps if fps > 0 else 0
+    if duration > LONG_CLIP_SECONDS and keyframes:
+        step = len(keyframes) / min(MAX_KEYFRAMES, len(keyframes))
+        targets = sorted({keyframes[int(i * step)] for i in range(min(MAX_KEYFRAMES, len(keyframes)))})
+        return "keyframe", [t for t in targets if t < frame_count]
+    frame_interval, max_frames = choose_sampling(fps, frame_count)
+    return "sequential", [i * frame_interval for i in range(max_frames)]
+
+
+class FrameSampler:
+    """按升序帧序号从 VideoCapture 读取帧：顺序 grab 跳过不需要的帧，只对采样帧 retrieve"""
+
+    def __init__(self, cap, max_skip: int = SEEK_GRAB_LIMIT):
+        """
+        Args:
+            cap: 已打开的 cv2.VideoCapture
+            max_skip: 与下一个目标相隔超过该帧数时改为定位（关键帧模式下目标相隔较远）
+        """
+        self.cap = cap
+        self.max_skip = max_skip
+        self.position: Optional[int] = None  # 下一次 grab 得到的帧序号，未知时为None
+        self.seeks = 0
+        self.grabs = 0
+
+    def read(self, target: int):
+        """读取第 target 帧（BGR），读不到时返回None"""
+        import cv2
+
+        if self.position is None or target < self.position or target - self.position > self.max_skip:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            self.position = target
+            self.seeks += 1
+        while self.position <= target:
+            if not self.cap.grab():
+                self.position = None
+                return None
+            self.position += 1
+            self.grabs += 1
+        ret, frame = self.cap.retrieve()
+        return frame if ret else None
+
+
+def _video_info(cap, path: str) -> Dict[str, Any]:
+    import cv2
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    mode, targets = plan_samples(fps, frame_count, mp4_keyframes(path))
+    return {
+        "fps": fps,
+        "frame_count": frame_count,
+        "duration": frame_count / fps if fps > 0 else 0,
+        "video_path": path,
+        "sample_mode": mode,
+        "sample_frames": targets,
+    }
+
+
+def extract_frames(path: str, on_frame: FrameCallback,
+                   on_info: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   should_stop: Optional[Callable[[], bool]] = None) -> int:
+    """从本地视频文件提取预览帧，返回提取的帧数"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return 0
+        info = _video_info(cap, path)
+        if on_info:
+            on_info(info)
+        sampler = FrameSampler(cap)
+        index = 0
+        for target in info["sample_frames"]:
+            if should_stop and should_stop():
+                break
+            frame = sampler.read(target)
+            if frame is None:
+                break
+            on_frame(index, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            index += 1
+        return index
+    finally:
+        cap.release()
+
+
+class ProgressivePreview:
+    """边下载边提取预览帧"""
+
+    def __init__(self, url: str, path: str, on_frame: FrameCallback,
+                 on_info: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 timeout: float = 60, should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            url: 视频地址
+            path: 预览视频的本地路径
+            on_frame: 每提取一帧调用一次（在调用 run 的线程中）
+            on_info: 读到视频信息（fps、帧数等）时调用一次
+            timeout: 下载请求超时（秒）
+            should_stop: 返回True时停止下载和解码
+        """
+        self.url = url
+        self.path = path
+        self.on_frame = on_frame
+        self.on_info = on_info
+        self.timeout = timeout
+        self.should_stop = should_stop or (lambda: False)
+        self._data_start = 0
+        self.stats: Dict[str, Any] = {
+            "layout": None,
+            "time_to_first_frame": None,   # 秒
+            "first_frame_bytes": None,     # 首帧解码时已下载的字节数
+            "total_bytes": 0,
+            "frames": 0,
+            "reopens": 0,
+        }
+
+    def run(self) -> bool:
+        """下载并提取预览帧，返回是否至少得到一帧"""
+        import cv2
+
+        start = time.perf_counter()
+        growing = GrowingFile(self.path)
+        downloader = threading.Thread(target=stream_download, args=(self.url, growing, self.timeout,
+                                                                    self.should_stop), daemon=True)
+        downloader.start()
+
+        layout = self._wait_for_header(growing)
+        self.stats["layout"] = layout
+        self._data_start = growing.size
+        if layout == "moov_at_end":
+            logger.info("视频索引位于文件末尾，等待下载完成后再解码")
+            downloader.join()
+        if growing.error is not None or self.should_stop():
+            downloader.join()
+            return False
+
+        info = None
+        cap = None
+        sampler = None
+        opened_size = 0
+        index = 0
+        try:
+            while not self.should_stop():
+                if cap is None:
+                    opened_size = growing.size
+                    cap = cv2.VideoCapture(self.path)
+                    if not cap.isOpened():
+                        cap.release()
+                        cap = None
+                        if growing.done:
+                            return False
+                        growing.wait_for(opened_size + REOPEN_BYTES)
+                        continue
+                    if info is None:
+                        info = _video_info(cap, self.path)
+                        if self.on_info:
+                            self.on_info(info)
+                    sampler = FrameSampler(cap)
+
+                if index >= len(info["sample_frames"]):
+                    break
+                target = info["sample_frames"][index]
+                needed = self._bytes_needed(growing, target, info["frame_count"])
+                if needed > growing.size:
+                    # 按帧在mdat中大致线性分布估计目标帧所需的字节数，避免解码出残缺的帧
+                    growing.wait_for(needed)
+                    continue
+                frame = sampler.read(target)
+                if frame is not None:
+                    if index == 0:
+                        self.stats["time_to_first_frame"] = time.perf_counter() - start
+                        self.stats["first_frame_bytes"] = growing.size
+                        logger.info(f"首帧耗时 {self.stats['time_to_first_frame']:.2f}s，"
+                                    f"已下载 {growing.size / 1024:.0f}KB")
+                    self.on_frame(index, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                    index += 1
+                    continue
+
+                # 读到已下载部分的末尾：等待更多数据后重新打开
+                cap.release()
+                cap = None
+                if growing.done and opened_size >= growing.size:
+                    break
+                growing.wait_for(opened_size + REOPEN_BYTES)
+                self.stats["reopens"] += 1
+        finally:
+            if cap is not None:
+                cap.release()
+            self.stats["frames"] = index
+            downloader.join()
+            self.stats["total_bytes"] = growing.size
+        return index > 0
+
+    def _bytes_needed(self, growing: GrowingFile, frame: int, frame_count: int) -> int:
+        """估计解码第 frame 帧需要已下载的字节数，总大小未知或已下载完成时返回0"""
+        if growing.done or not growing.total or frame_count <= 0:
+            return 0
+        per_frame = (growing.total - self._data_start) / frame_count
+        # 关键帧比平均帧大得多，多留几帧的余量
+        estimate = self._data_start + (frame + 1) * per_frame + max(REOPEN_BYTES, 8 * per_frame)
+        return min(growing.total, int(estimate))
+
+    def _wait_for_header(self, growing: GrowingFile) -> str:
+        """等待足够的字节以判断容器布局"""
+        size = 0
+        while True:
+            size = growing.wait_for(size + 1)
+            layout = mp4_layout(self.path, size)
+            if layout is not None:
+                if layout == "unknown":
+                    growing.wait_for(PROBE_BYTES)
+                return layout
+            if growing.done:
+                return "unknown"
+
+
+def _make_test_video(path: str, size: Tuple[int, int], fps: int, seconds: float):
+    """生成带移动图案和帧号的测试视频（mp4v编码）"""
+    import cv2
+    import numpy as np
+
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    y, x = np.mgrid[0:height, 0:width]
+    base = ((x // 8 + y // 8) % 2 * 60).astype(np.uint8)
+    for i in range(int(fps * seconds)):
+        frame = np.empty((height, width, 3), np.uint8)
+        frame[..., 0] = (x + i * 4) % 256
+        frame[..., 1] = (y + i * 2) % 256
+        frame[..., 2] = base + i % 196
+        cv2.putText(frame, str(i), (width // 3, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                    height / 120, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def _extract_seek_per_frame(path: str) -> Tuple[int, int]:
+    """旧实现：每个采样帧都 set(CAP_PROP_POS_FRAMES) 后 read，返回 (帧数, 最后一帧序号)"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_interval, max_frames = choose_sampling(fps, frame_count)
+    count = last = 0
+    for i in range(max_frames):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, i * frame_interval)
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            break
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        count, last = count + 1, i * frame_interval
+    cap.release()
+    return count, last
+
+
+def benchmark():
+    """在本地生成的测试视频上对比逐帧定位与顺序采样的提取耗时"""
+    import shutil
+    import tempfile
+
+    cases = [
+        ("5s 1080p30", (1920, 1080), 30, 5),
+        ("10s 720p30", (1280, 720), 30, 10),
+        ("30s 720p60", (1280, 720), 60, 30),
+        ("120s 480p30", (854, 480), 30, 120),
+    ]
+    work_dir = tempfile.mkdtemp()
+    try:
+        for label, size, fps, seconds in cases:
+            path = os.path.join(work_dir, f"{label.replace(' ', '_')}.mp4")
+            _make_test_video(path, size, fps, seconds)
+
+            start = time.perf_counter()
+            old_count, old_last = _extract_seek_per_frame(path)
+            old_time = time.perf_counter() - start
+
+            info = {}
+            last = [0]
+            start = time.perf_counter()
+            count = extract_frames(path, lambda i, frame: None, on_info=info.update)
+            new_time = time.perf_counter() - start
+            if count:
+                last[0] = info["sample_frames"][count - 1]
+
+            print(f"{label}: 逐帧定位 {old_time * 1000:.0f}ms（{old_count} 帧，覆盖到 {old_last / fps:.1f}s）"
+                  f" -> {info.get('sample_mode')} {new_time * 1000:.0f}ms（{count} 帧，覆盖到 {last[0] / fps:.1f}s）"
+                  f"，{old_time / new_time:.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """
+    命令行: python video_preview.py 视频地址 [保存路径] | bench
+    边下载边提取预览帧，输出首帧时间与总耗时；bench 在本地生成的测试视频上对比帧提取方式
+    """
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        return
+    if sys.argv[1] == "bench":
+        benchmark()
+        return
+    path = sys.argv[2] if len(sys.argv) > 2 else "temp_video_preview.mp4"
+    start = time.perf_counter()
+    preview = ProgressivePreview(sys.argv[1], path, lambda i, frame: None,
+                                 on_info=lambda info: print(f"视频信息: { {k: v for k, v in info.items() if k != 'sample_frames'} }"))
+    ok = preview.run()
+    print(f"完成: {ok}，总耗时 {time.perf_counter() - start:.2f}s")
+    for key, value in preview.stats.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址壁纸库 - 按SHA-256存储图片，相同内容只保存一份
+- 图片本体保存在 images/.store/objects/<前两位>/<sha256>.<扩展名>
+- images/ 下的 wallpaper_N.jpg 等友好名称是指向本体的硬链接（不支持硬链接时退回复制）
+- 已保存过的图片再次保存时直接返回已有名称，不产生任何写入
+- 清晰化等处理结果按 (原图哈希, 处理名称) 记录，重复处理同一张图片同样是 O(1)
+- 索引以追加写入的 JSON Lines 日志保存，每次入库只追加几行，清理时再整体重写
+- 重新编码/缩放过的同一张图片通过感知哈希识别，默认照常保存并标记，结果中注明相似的已有图片
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional
+import logging
+
+from image_ingest import file_sha256
+from catalog import get_catalog
+
+# 感知哈希依赖NumPy，缺失时只做精确去重
+try:
+    from perceptual_hash import dhash, get_perceptual_index
+    PHASH_AVAILABLE = True
+except ImportError:
+    PHASH_AVAILABLE = False
+
+# 配置日志
+try:
+    from logging_config import get_logger
+    logger = get_logger("wallpaperStore")
+    logger.propagate = False
+except Exception:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("wallpaperStore")
+    logger.propagate = False
+
+
+IMAGES_DIR = Path("images")
+STORE_DIR_NAME = ".store"
+
+
+class StoreResult(NamedTuple):
+    """入库结果"""
+    path: str       # 友好名称路径（images/ 下）
+    sha256: str     # 内容哈希
+    is_new: bool    # 是否为新内容（False表示重复，未产生写入）
+    near_duplicate_of: Optional[str] = None  # 相似的已有图片路径（发现近似重复时）
+
+
+class WallpaperStore:
+    """内容寻址壁纸库"""
+
+    def __init__(self, images_dir: Path = IMAGES_DIR, near_duplicates: str = "flag"):
+        """
+        Args:
+            images_dir: 图片目录
+            near_duplicates: 近似重复的处理方式，"flag" 照常保存并在索引中标记，
+                             "reject" 不保存并返回已有图片；两种方式的结果中都注明相似图片
+        """
+        self.images_dir = Path(images_dir)
+        self.near_duplicates = near_duplicates
+        self.store_dir = self.images_dir / STORE_DIR_NAME
+        self.objects_dir = self.store_dir / "objects"
+        self.index_path = self.store_dir / "index.jsonl"
+        self.legacy_index_path = self.store_dir / "index.json"
+        # objects: sha256 -> {"ext", "size", "names"}；derived: "原图哈希:处理名称" -> 结果哈希
+        self._index: Dict[str, Dict[str, Any]] = {"objects": {}, "derived": {}}
+        self._lock = threading.RLock()
+        self.stats = {"added": 0, "duplicates": 0, "near_duplicates": 0, "bytes_saved": 0}
+        self._load()
+
+    def _load(self):
+        if self.legacy_index_path.exists() and not self.index_path.exists():
+            self._load_legacy()
+            return
+        if not self.index_path.exists():
+            return
+        objects, derived = self._index["objects"], self._index["derived"]
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    op = entry["op"]
+                    if op == "object":
+                        objects[entry["sha"]] = {"ext": entry["ext"], "size": entry["size"], "names": []}
+                    elif op == "name" and entry["sha"] in objects:
+                        objects[entry["sha"]]["names"].append(entry["name"])
+                    elif op == "near" and entry["sha"] in objects:
+                        objects[entry["sha"]]["near_duplicate_of"] = entry["of"]
+                    elif op == "derived":
+                        derived[entry["key"]] = entry["sha"]
+            logger.info(f"已加载壁纸库索引: {len(objects)} 张图片")
+        except Exception as e:
+            logger.error(f"加载壁纸库索引失败: {e}")
+
+    def _load_legacy(self):
+        """读取旧版整体保存的 index.json，并转换为追加日志"""
+        try:
+            with open(self.legacy_index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._index["objects"] = data.get("objects", {})
+            self._index["derived"] = data.get("derived", {})
+            with self._lock:
+                self._compact_locked()
+            self.legacy_index_path.unlink()
+            logger.info(f"已转换旧版壁纸库索引: {len(self._index['objects'])} 张图片")
+        except Exception as e:
+            logger.error(f"加载壁纸库索引失败: {e}")
+
+    @staticmethod
+    def _object_entries(sha256: str, item: Dict[str, Any]):
+        yield {"op": "object", "sha": sha256, "ext": item["ext"], "size": item["size"]}
+        for name in item["names"]:
+            yield {"op": "name", "sha": sha256, "name": name}
+        if "near_duplicate_of" in item:
+            yield {"op": "near", "sha": sha256, "of": item["near_duplicate_of"]}
+
+    def _append_locked(self, *entries: Dict[str, Any]):
+        """向索引日志追加记录，写入量只与本次变更有关"""
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+        except Exception as e:
+            logger.error(f"保存壁纸库索引失败: {e}")
+
+    def _compact_locked(self):
+        """按当前索引重写日志，去掉已删除和已失效的记录"""
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for sha256, item in self._index["objects"].items():
+                    for entry in self._object_entries(sha256, item):
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                for key, sha256 in self._index["derived"].items():
+                    f.write(json.dumps({"op": "derived", "key": key, "sha": sha256}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"保存壁纸库索引失败: {e}")
+
+    def object_path(self, sha256: str, extension: str) -> Path:
+        return self.objects_dir / sha256[:2] / f"{sha256}.{extension}"
+
+    def _existing_name_locked(self, sha256: str) -> Optional[str]:
+        """返回该内容仍然存在的友好名称，本体或名称已被删除时返回None"""
+        item = self._index["objects"].get(sha256)
+        if not item or not self.object_path(sha256, item["ext"]).exists():
+            return None
+        names = [n for n in item["names"] if (self.images_dir / n).exists()]
+        if names != item["names"]:
+            item["names"] = names
+        return names[0] if names else None
+
+    def lookup(self, sha256: str) -> Optional[str]:
+        """按内容哈希查找已保存的图片路径"""
+        with self._lock:
+            name = self._existing_name_locked(sha256)
+            return str(self.images_dir / name) if name else None
+
+    @staticmethod
+    def perceptual_hash(path: str) -> Optional[int]:
+        """计算感知哈希，不可用或无法解码时返回None"""
+        if not PHASH_AVAILABLE:
+            return None
+        try:
+            return dhash(path)
+        except Exception as e:
+            logger.info(f"无法计算感知哈希: {path}: {e}")
+            return None
+
+    def _find_near_duplicate_locked(self, phash: Optional[int], sha256: str) -> Optional[str]:
+        """查找仍然存在的近似重复图片，返回其内容哈希"""
+        if phash is None:
+            return None
+        for distance, match_sha, _ in get_perceptual_index().find_similar(phash):
+            if match_sha != sha256 and self._existing_name_locked(match_sha):
+                logger.info(f"发现近似重复图片: {match_sha[:12]} (距离 {distance})")
+                return match_sha
+        return None
+
+    def _reject_near_duplicate_locked(self, match_sha: str) -> StoreResult:
+        self.stats["near_duplicates"] += 1
+        self.stats["bytes_saved"] += self._index["objects"][match_sha]["size"]
+        existing = self._existing_name_locked(match_sha)
+        logger.info(f"近似重复图片不再保存，使用已有图片: {existing}")
+        path = str(self.images_dir / existing)
+        return StoreResult(path, match_sha, False, path)
+
+    def _duplicate_locked(self, sha256: str, existing: str) -> StoreResult:
+        self.stats["duplicates"] += 1
+        self.stats["bytes_saved"] += self._index["objects"][sha256]["size"]
+        logger.info(f"图片已存在于壁纸库，跳过保存: {existing}")
+        return StoreResult(str(self.images_dir / existing), sha256, False)
+
+    @staticmethod
+    def _link_or_copy(source: Path, target: Path):
+        """在临时名称上建立硬链接后原子替换到目标路径（目标可能是预留的占位文件）"""
+        tmp_path = target.with_name(f".{uuid.uuid4().hex}.tmp")
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            # 文件系统不支持硬链接时退回复制，仍然保留去重效果
+            shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+
+    def add_file(self, source: str, prefix: str = "wallpaper", sha256: Optional[str] = None,
+                 move: bool = False, phash: Optional[int] = None,
+                 metadata: Optional[Dict[str, Any]] = None) -> StoreResult:
+        """
+        将图片加入壁纸库
+
+        Args:
+            source: 图片文件路径
+            prefix: 友好名称前缀，如 wallpaper / anime_wallpaper
+            sha256: 已知的内容哈希（流式下载时已计算），None时自动获取
+            move: 为True时新内容直接移动进库，否则复制；重复内容时源文件保持不变
+            phash: 已知的感知哈希，None时自动计算
+            metadata: 写入媒体目录的来源信息（source_api / category / url）
+
+        Returns:
+            StoreResult
+        """
+        source_path = Path(source)
+        sha256 = sha256 or file_sha256(source_path)
+        extension = source_path.suffix.lstrip(".").lower() or "jpg"
+
+        with self._lock:
+            existing = self._existing_name_locked(sha256)
+            if existing:
+                return self._duplicate_locked(sha256, existing)
+
+        if phash is None:
+            phash = self.perceptual_hash(str(source_path))
+
+        with self._lock:
+            # 计算感知哈希期间其他线程可能已保存了相同内容，加锁后再检查一次
+            existing = self._existing_name_locked(sha256)
+            if existing:
+                return self._duplicate_locked(sha256, existing)
+
+            match_sha = self._find_near_duplicate_locked(phash, sha256)
+            if match_sha and self.near_duplicates == "reject":
+                return self._reject_near_duplicate_locked(match_sha)
+
+            entries = []
+            item = self._index["objects"].get(sha256)
+            if item is None or not self.object_path(sha256, item["ext"]).exists():
+                item = {"ext": extension, "size": source_path.stat().st_size, "names": []}
+                entries.append({"op": "object", "sha": sha256, "ext": extension, "size": item["size"]})
+                object_path = self.object_path(sha256, extension)
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                if move:
+                    os.replace(source_path, object_path)
+                else:
+                    tmp_path = object_path.with_name(f".{uuid.uuid4().hex}.tmp")
+                    shutil.copy2(source_path, tmp_path)
+                    os.replace(tmp_path, object_path)
+                self._index["objects"][sha256] = item
+            object_path = self.object_path(sha256, item["ext"])
+            similar = None
+            if match_sha:
+                similar = str(self.images_dir / self._existing_name_locked(match_sha))
+                item["near_duplicate_of"] = match_sha
+                entries.append({"op": "near", "sha": sha256, "of": match_sha})
+
+            # 编号由媒体目录原子分配，并发保存不会互相覆盖
+            target = get_catalog().allocate_path(str(self.images_dir), prefix, item["ext"])
+            try:
+                self._link_or_copy(object_path, Path(target))
+            except Exception:
+                get_catalog().release_path(target)
+                raise
+            name = os.path.basename(target)
+            item["names"].append(name)
+            entries.append({"op": "name", "sha": sha256, "name": name})
+            if phash is not None:
+                get_perceptual_index().add(sha256, phash, name)
+            get_catalog().add(str(self.images_dir / name), kind="image", sha256=sha256, **(metadata or {}))
+            self.stats["added"] += 1
+            self._append_locked(*entries)
+
+        logger.info(f"图片已加入壁纸库: {name} ({sha256[:12]})")
+        return StoreResult(str(self.images_dir / name), sha256, True, similar)
+
+    def add_processed(self, source: str, prefix: str, process: Callable[[str], Any],
+                      operation: str, extension: Optional[str] = None,
+                      metadata: Optional[Dict[str, Any]] = None) -> StoreResult:
+        """
+        对图片做处理（如清晰化）后加入壁纸库
+
+        同一张原图已用同一处理保存过时，直接返回已有结果，不重复解码、处理和写入。
+
+        Args:
+            source: 原图路径（不会被修改）
+            prefix: 友好名称前缀
+            process: 原地处理图片文件的函数，如 clear_image
+            operation: 处理名称，作为去重键的一部分
+            extension: 处理结果的格式，None表示与原图一致
+            metadata: 写入媒体目录的来源信息
+
+        Returns:
+            StoreResult
+        """
+        source_sha = file_sha256(source)
+        key = f"{source_sha}:{operation}"
+
+        with self._lock:
+            derived_sha = self._index["derived"].get(key)
+            if derived_sha:
+                existing = self._existing_name_locked(derived_sha)
+                if existing:
+                    self.stats["duplicates"] += 1
+                    self.stats["bytes_saved"] += self._index["objects"][derived_sha]["size"]
+                    logger.info(f"处理结果已存在于壁纸库，跳过处理: {existing}")
+                    return StoreResult(str(self.images_dir / existing), derived_sha, False)
+
+        # 处理前先按原图判断近似重复，被拒绝时无需解码和处理
+        phash = self.perceptual_hash(source)
+        with self._lock:
+            match_sha = self._find_near_duplicate_locked(phash, source_sha)
+            if match_sha and self.near_duplicates == "reject":
+                return self._reject_near_duplicate_locked(match_sha)
+
+        extension = extension or Path(source).suffix.lstrip(".").lower() or "jpg"
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        work_path = self.store_dir / f".{uuid.uuid4().hex}.{extension}"
+        try:
+            shutil.copyfile(source, work_path)
+            process(str(work_path))
+            result = self.add_file(str(work_path), prefix, move=True, phash=phash, metadata=metadata)
+        finally:
+            if work_path.exists():
+                work_path.unlink()
+
+        with self._lock:
+            if self._index["derived"].get(key) != result.sha256:
+                self._index["derived"][key] = result.sha256
+                self._append_locked({"op": "derived", "key": key, "sha": result.sha256})
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取壁纸库统计信息"""
+        with self._lock:
+            objects = self._index["objects"]
+            return {
+                **self.stats,
+                "objects": len(objects),
+                "names": sum(len(item["names"]) for item in objects.values()),
+                "stored_bytes": sum(item["size"] for item in objects.values()),
+            }
+
+    def gc(self) -> int:
+        """删除已没有任何友好名称引用的图片本体，返回删除数量"""
+        removed = 0
+        with self._lock:
+            for sha256 in list(self._index["objects"]):
+                item = self._index["objects"][sha256]
+                if self._existing_name_locked(sha256):
+                    continue
+                try:
+                    self.object_path(sha256, item["ext"]).unlink()
+                except FileNotFoundError:
+                    pass
+                del self._index["objects"][sha256]
+                if PHASH_AVAILABLE:
+                    get_perceptual_index().remove(sha256)
+                removed += 1
+            valid = self._index["objects"]
+            self._index["derived"] = {k: v for k, v in self._index["derived"].items() if v in valid}
+            self._compact_locked()
+        logger.info(f"壁纸库清理完成，删除 {removed} 张未引用的图片")
+        return removed
+
+
+# 全局共享壁纸库
+_store: Optional[WallpaperStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> WallpaperStore:
+    """获取全局壁纸库（首次调用时加载索引）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WallpaperStore()
+        return _store
+
+
+def main():
+    """命令行查看壁纸库: python wallpaper_store.py [--gc]"""
+    store = get_store()
+    if "--gc" in sys.argv[1:]:
+        print(f"已删除 {store.gc()} 张未引用的图片")
+    for key, value in store.get_stats().items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,14 @@
 import requests
 import json
 import os
+import tempfile
+import uuid
 from typing import Optional, Dict, Any
 import logging
 from myAPI import count_files_in_directory, get_image_format_from_url
+from resilience import resilient_get
+from image_ingest import stream_response_to_file
+from catalog import get_catalog
 
 # 配置日志
 try:
@@ -39,17 +44,25 @@ class WallpaperAPI:
             "cartoon": "动漫壁纸"
         }
     
+    @staticmethod
+    def _temp_image_stem() -> str:
+        """未指定保存路径时图片写入的临时路径（不含扩展名，每次调用不同）"""
+        return os.path.join(tempfile.gettempdir(), f"yuanmeng_{uuid.uuid4().hex}")
+
     def get_random_wallpaper(self, category: Optional[str] = None, 
-                           response_type: str = "json") -> Dict[str, Any]:
+                           response_type: str = "json",
+                           save_path: Optional[str] = None) -> Dict[str, Any]:
         """
         获取随机壁纸
         
         Args:
             category: 壁纸分类，可选值见self.categories
             response_type: 返回类型，"json"或"jpg"
+            save_path: 返回类型为"jpg"时图片流式写入的路径（扩展名按实际格式确定），
+                       未指定时写入临时目录，由调用方负责删除
             
         Returns:
-            API响应数据
+            API响应数据；返回类型为"jpg"时包含 image_path、sha256、content_type
         """
         try:
             # 构建请求参数
@@ -59,13 +72,21 @@ class WallpaperAPI:
             
             # 发送请求
             logger.info(f"正在获取{self.categories.get(category, '随机')}壁纸...")
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
+            stream = response_type != "json"
+            response = resilient_get(self.base_url, params=params, timeout=10 if not stream else 30,
+                                     stream=stream)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.RequestException:
+                response.close()
+                raise
             
-            if response_type == "json":
+            if not stream:
                 return response.json()
-            else:
-                return {"image_data": response.content, "content_type": response.headers.get("content-type")}
+            # 流式写入磁盘，不在内存中缓存整张图片
+            ingest = stream_response_to_file(response, save_path or self._temp_image_stem())
+            return {"image_path": ingest.path, "sha256": ingest.sha256,
+                    "content_type": response.headers.get("content-type")}
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"API请求失败: {e}")
@@ -77,36 +98,107 @@ class WallpaperAPI:
             logger.error(f"未知错误: {e}")
             return {"error": f"未知错误: {str(e)}"}
     
+    @staticmethod
+    def _extract_image_url(data: Any) -> Optional[str]:
+        """从JSON响应中提取图片地址（兼容 url/img/imgurl 等字段及 data 嵌套）"""
+        if isinstance(data, str):
+            return data if data.startswith(("http://", "https://")) else None
+        if isinstance(data, dict):
+            for key in ("url", "img", "imgurl", "image", "image_url", "pic"):
+                value = data.get(key)
+                if isinstance(value, str) and value.startswith(("http://", "https://")):
+                    return value
+            for key in ("data", "result"):
+                if key in data:
+                    found = WallpaperAPI._extract_image_url(data[key])
+                    if found:
+                        return found
+        if isinstance(data, list) and data:
+            return WallpaperAPI._extract_image_url(data[0])
+        return None
+
+    def fetch_wallpaper(self, category: Optional[str] = None,
+                        save_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取随机壁纸信息及图片数据（一次API请求）
+        
+        先请求JSON得到图片地址，再通过连接池下载该图片，
+        保证返回的元数据与图片数据属于同一张壁纸
+        
+        Args:
+            category: 壁纸分类，可选值见self.categories
+            save_path: 图片流式写入的路径（扩展名按实际格式确定），不在内存中缓存图片数据；
+                       未指定时写入临时目录，由调用方负责删除
+            
+        Returns:
+            包含以下字段的字典，失败时包含error字段：
+            - info: API返回的JSON元数据
+            - image_url: 图片地址
+            - image_path: 实际保存路径
+            - sha256: 图片内容的SHA-256
+            - content_type: 图片的Content-Type
+        """
+        info = self.get_random_wallpaper(category, "json")
+        if "error" in info:
+            return info
+
+        image_url = self._extract_image_url(info)
+        if not image_url:
+            logger.error(f"JSON中未找到图片地址: {info}")
+            return {"error": "未获取到图片链接", "info": info}
+
+        try:
+            logger.info(f"正在下载壁纸图片: {image_url}")
+            response = resilient_get(image_url, timeout=30, stream=True)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.RequestException:
+                response.close()
+                raise
+            ingest = stream_response_to_file(response, save_path or self._temp_image_stem())
+            return {
+                "info": info,
+                "image_url": image_url,
+                "image_path": ingest.path,
+                "sha256": ingest.sha256,
+                "content_type": response.headers.get("content-type"),
+            }
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            logger.error(f"图片下载失败: {e}")
+            return {"error": f"图片下载失败: {str(e)}", "info": info}
+
     def download_wallpaper(self, category: Optional[str] = None, 
-                          save_path: str = "images/wallpaper.jpg") -> bool:
+                          save_path: str = "images/wallpaper.jpg") -> Optional[str]:
         """
         下载壁纸到本地
         
         Args:
             category: 壁纸分类
-            save_path: 保存路径
+            save_path: 保存路径（扩展名按实际格式确定，如PNG图片保存为 .png）
             
         Returns:
-            是否下载成功
+            实际保存路径，失败时返回None
         """
         try:
-            # 获取图片数据
-            result = self.get_random_wallpaper(category, "jpg")
-            
-            if "error" in result:
-                logger.error(f"获取壁纸失败: {result['error']}")
-                return False
-            
-            # 保存图片
-            with open(save_path, "wb") as f:
-                f.write(result["image_data"])
-            
-            logger.info(f"壁纸已保存到: {save_path}")
-            return True
+            params = {"type": "jpg"}
+            if category and category in self.categories:
+                params["category"] = category
+
+            # 流式写入磁盘，不在内存中缓存整张图片
+            response = resilient_get(self.base_url, params=params, timeout=30, stream=True)
+            if response.status_code != 200:
+                response.close()
+                logger.error(f"获取壁纸失败: HTTP {response.status_code}")
+                return None
+
+            result = stream_response_to_file(response, save_path)
+            get_catalog().add(result.path, source_api="yuanmeng", category=category, sha256=result.sha256)
+            logger.info(f"壁纸已保存到: {result.path}")
+            return result.path
             
         except Exception as e:
             logger.error(f"下载壁纸失败: {e}")
-            return False
+            return None
     
     def get_categories(self) -> Dict[str, str]:
         """获取所有可用的壁纸分类"""
@@ -153,16 +245,18 @@ def main():
     
     # 示例3: 下载风景壁纸
     print("3. 下载风景壁纸:")
-    if api.download_wallpaper("landscape", f"images/landscape_wallpaper_{img_num + 1}.jpg"):
-        print("风景壁纸下载成功!")
+    path = api.download_wallpaper("landscape", f"images/landscape_wallpaper_{img_num + 1}.jpg")
+    if path:
+        print(f"风景壁纸下载成功: {path}")
     else:
         print("风景壁纸下载失败!")
     print()
     
     # 示例4: 下载4K壁纸
     print("4. 下载4K壁纸:")
-    if api.download_wallpaper("4k", f"images/4k_wallpaper_{img_num + 1}.jpg"):
-        print("4K壁纸下载成功!")
+    path = api.download_wallpaper("4k", f"images/4k_wallpaper_{img_num + 1}.jpg")
+    if path:
+        print(f"4K壁纸下载成功: {path}")
     else:
         print("4K壁纸下载失败!")
 